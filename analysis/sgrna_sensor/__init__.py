@@ -9,3 +9,4 @@ from .designs import *
 from .usage import *
 from .latex import *
 from .qpcr import *
+from .library import *
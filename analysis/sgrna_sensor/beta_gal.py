@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+"""\
+Calculate β-galactosidase activities (in Miller units) from kinetic plate
+reader measurements.
+
+Each plate is described by a TOML layout file (see `plate.load_plate()`),
+which can specify the following keys for any well, row, column, or the whole
+plate:
+
+'sgrna' [string]
+    The name of the sgRNA, e.g. 'on', 'off', 'rxb 11,1', 'mhf 30', etc.
+
+'spacer' [string]
+    The name of the target sequence, e.g. 'lz', 'li', 'la', 'lo', 'lp'.
+
+'ligand' [bool]
+    Whether or not theophylline was present in the reaction.
+
+'blank' [string]
+    The name of the well (e.g. 'A1') to use as a blank.  All of the absorbance
+    values for this well (e.g. OD600 and A420) will have the corresponding
+    values from their blank well subtracted from them.  You can also specify
+    just a row ('A') or just a column ('1'), in which case the unspecified
+    value will be taken from the well itself.
+
+'od600_blank' [string]
+    Like 'blank', but only for OD600.
+
+'a420_blank' [string]
+    Like 'blank', but only for A420.
+
+'min_time' [number, default: 0]
+    When making linear fits, ignore any data points before the given time (in
+    minutes).
+
+'max_time' [number]
+    When making linear fits, ignore any data points after the given time (in
+    minutes).
+
+'max_a420' [number, default: 1.9]
+    When making linear fits, ignore any data points with A420 values larger
+    than the given maximum.
+
+'culture_volume_uL' [number, default: 100]
+    The volume of cells (in µL) added to the reaction.
+
+The plate reader data is read from the path given by 'xlsx_path' (or 'path'),
+relative to the layout or template file that gives it, or from an XLSX file
+with the same name as the layout file.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from .cache import default_cache_dir, file_fingerprint, key_path, load_pickle, save_pickle
+from . import plate
+
+PATH_CM = 0.25
+DEFAULTS = dict(
+        culture_volume_uL=100,
+        min_time=0,
+        max_a420=1.9,
+)
+
+class BetaGalPlate:
+    """
+    The layout, data, and (once `fit_plates()` has been called) linear fits
+    for one plate.
+
+    The A420 traces are stored as a data frame with one row per timepoint and
+    one column per well, and the OD600 reads as a series indexed by well.
+    Both have already had any blanks subtracted; the raw values are kept in
+    the `raw_a420` and `raw_od600` attributes.
+    """
+
+    def __init__(self, toml_path):
+        from .plate_reader import BiotekExperiment
+
+        self.toml_path = Path(toml_path).resolve()
+        self.name = self.toml_path.stem
+        self.layout = plate.load_layout(self.toml_path)
+        self.xlsx_path = find_xlsx_path(self.toml_path, self.layout)
+        plate.print_notes(toml_path, self.layout)
+
+        self.wells = plate.compile_layout(self.layout)
+        for key, default in DEFAULTS.items():
+            if key in self.wells:
+                self.wells[key] = self.wells[key].fillna(default)
+            else:
+                self.wells[key] = default
+
+        data = BiotekExperiment(str(self.xlsx_path))
+        kinetic = data.kinetic[420]
+        self.date = getattr(data, 'date', None)
+
+        # Keep every well until the blanks have been subtracted, because the 
+        # blank wells don't have to be part of the layout.
+        a420 = kinetic\
+                .pivot(index='minutes', columns='well', values='read')\
+                .astype(float)
+        od600 = pd.Series(data.reads.get(600, {}), dtype=float)
+
+        self.minutes = a420.index.values
+        self.raw_a420 = a420\
+                .reset_index(drop=True)\
+                .reindex(columns=self.wells.index)
+        self.raw_od600 = od600.reindex(self.wells.index)
+
+        self.a420 = subtract_blanks(a420.reset_index(drop=True), self.wells, 'a420')
+        self.od600 = subtract_blanks(od600, self.wells, 'od600')
+        self.fits = None
+
+    def __repr__(self):
+        return f'<BetaGalPlate {self.name}>'
+
+
+def load_plates(toml_paths, cache=True):
+    """
+    Load and fit all the given plates.
+
+    Plates that have been analyzed before are loaded from a cache (kept in
+    ``~/.cache/sgrna_sensor/beta_gal`` by default; pass a directory to use a
+    different location, or ``cache=False`` to disable caching).  A cached
+    plate is only used if neither its layout files, its data file, nor this
+    module have changed since it was analyzed.  All the other plates are
+    fitted together in one batch.
+    """
+    if cache is True:
+        cache = default_cache_dir('beta_gal')
+
+    plates = {}
+    fingerprints = {}
+
+    for toml_path in toml_paths:
+        toml_path = Path(toml_path).resolve()
+        if cache:
+            fingerprints[toml_path] = fingerprint(toml_path)
+            plates[toml_path] = load_pickle(
+                    cache_path(cache, toml_path), fingerprints[toml_path])
+        if plates.get(toml_path) is None:
+            plates[toml_path] = BetaGalPlate(toml_path)
+
+    unfitted = {k: v for k, v in plates.items() if v.fits is None}
+    fit_plates(list(unfitted.values()))
+
+    if cache:
+        for toml_path, p in unfitted.items():
+            save_pickle(cache_path(cache, toml_path), fingerprints[toml_path], p)
+
+    return list(plates.values())
+
+def fit_plates(plates):
+    """
+    Fit a line to the A420 trace from every well in the given plates, and use
+    the slopes to calculate Miller units.
+
+    All the traces are padded to the same length and stacked into a single
+    (wells × timepoints) array, so that the fit windows and the least-squares
+    fits for every well of every plate are calculated in one step.  The
+    results are stored in the `fits` attribute of each plate.
+    """
+    if not plates:
+        return
+
+    num_wells = [len(p.wells) for p in plates]
+    num_times = max(len(p.minutes) for p in plates)
+
+    def stack(arrays):
+        stacked = np.full((sum(num_wells), num_times), np.nan)
+        i = 0
+        for n, array in zip(num_wells, arrays):
+            stacked[i:i+n, :array.shape[1]] = array
+            i += n
+        return stacked
+
+    wells = pd.concat([p.wells for p in plates], sort=False)
+    t = stack(np.tile(p.minutes, (len(p.wells), 1)) for p in plates)
+    y = stack(p.a420.values.T for p in plates)
+
+    min_time = wells['min_time'].values.astype(float)
+    max_a420 = wells['max_a420'].values.astype(float)
+    max_time = wells['max_time'].values.astype(float) \
+            if 'max_time' in wells else np.full(len(wells), np.nan)
+
+    i_min, i_max = find_fit_windows(t, y, min_time, max_time, max_a420)
+
+    k = np.arange(num_times)
+    mask = (k >= i_min[:,None]) & (k < i_max[:,None]) & np.isfinite(y)
+    slope, intercept = fit_lines(t, y, mask)
+
+    od600 = np.concatenate([p.od600.values for p in plates])
+    vol_mL = wells['culture_volume_uL'].values.astype(float) / 1000
+    miller = 1000 * slope * PATH_CM / (od600 * vol_mL)
+
+    fits = pd.DataFrame({
+            'i_min': i_min,
+            'i_max': i_max,
+            'slope': slope,
+            'intercept': intercept,
+            'od600': od600,
+            'vol_mL': vol_mL,
+            'miller': miller,
+    }, index=wells.index)
+
+    i = 0
+    for n, p in zip(num_wells, plates):
+        p.fits = fits.iloc[i:i+n]
+        i += n
+
+def find_fit_windows(t, y, min_time, max_time, max_a420):
+    """
+    Decide which timepoints to fit for each trace.
+
+    Some traces curve upwards in the early timepoints, perhaps as cell lysis
+    continues, so the window starts at the timepoint closest to `min_time`.
+    Some traces curve downwards once A420 gets too high, presumably as the
+    substrate begins to be limiting, so the window ends at the timepoint
+    closest to either `max_a420` or `max_time` (whichever comes first).  Every
+    window includes at least two timepoints.  The windows are returned as
+    arrays of start (inclusive) and end (exclusive) indices.
+    """
+    k = np.arange(t.shape[1])
+    last_t = np.nanmax(t, axis=1)
+    max_time = np.where(np.isnan(max_time), last_t, max_time)
+
+    def closest(x, target, start=0):
+        # Like `idxmin()`, ignore NaNs and break ties with the first index.
+        dist = np.abs(x - target[:,None])
+        dist[np.isnan(dist) | (k < np.reshape(start, (-1, 1)))] = np.inf
+        return np.argmin(dist, axis=1)
+
+    i_min = closest(t, min_time)
+    i_max = np.maximum(i_min + 2, np.minimum(
+            closest(y, max_a420, i_min),
+            closest(t, max_time, i_min),
+    ))
+    return i_min, i_max
+
+def fit_lines(x, y, mask):
+    """
+    Fit a line to each row of the given arrays, using only the points where
+    `mask` is true.  Returns arrays of slopes and intercepts, which are NaN for
+    any row with fewer than two points (or no spread in x).
+    """
+    w = mask.astype(float)
+    x = np.where(mask, x, 0)
+    y = np.where(mask, y, 0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = w.sum(axis=1)
+        x_mean = (w * x).sum(axis=1) / n
+        y_mean = (w * y).sum(axis=1) / n
+        dx = w * (x - x_mean[:,None])
+        dy = y - y_mean[:,None]
+
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        intercept = y_mean - slope * x_mean
+
+    bad = n < 2
+    slope[bad] = intercept[bad] = np.nan
+    return slope, intercept
+
+def tabulate(plates):
+    """
+    Return a data frame with one row for each well of each plate, giving the
+    well's layout and the results of its fit.
+    """
+    return pd.concat([
+        p.wells.join(p.fits).assign(plate=p.name, date=p.date).reset_index()
+        for p in plates
+    ], ignore_index=True, sort=False)
+
+
+def find_xlsx_path(toml_path, layout):
+    """
+    Work out where the plate reader data for the given layout is.  Relative
+    paths are relative to the file that specifies them, which may be one of
+    the templates that the layout refers to.
+    """
+    toml_path = Path(toml_path).resolve()
+
+    if 'xlsx_path' in layout:
+        return find_defining_toml(toml_path, 'xlsx_path').parent / layout['xlsx_path']
+    if 'default' in layout.get('paths', {}):
+        return find_defining_toml(toml_path, 'path').parent / layout['paths']['default']
+
+    # It's ok for individual files to not include `xlsx_path`, because it
+    # might be filled in by default, or implied from a template file.  But by
+    # the time we get here, we need to know where the data is.
+    raise ValueError(f"no xlsx path specified or inferred in '{toml_path}'")
+
+def find_defining_toml(toml_path, key):
+    """
+    Return the first file that defines the given key, out of the given TOML
+    file and the templates it refers to (directly or indirectly).
+    """
+    while True:
+        layout = plate.load_toml(toml_path)
+        if key in layout or 'template' not in layout:
+            return toml_path
+        toml_path = (toml_path.parent / layout['template']).resolve()
+
+def find_blank_well(blank_well, well):
+    """
+    Work out which well should be used to blank the given well.  The blank can
+    be a whole well name ('A1'), just a row ('A'), or just a column ('1').
+    In the latter two cases, the missing coordinate comes from the well itself.
+    """
+    row_col_pat = re.compile('^([A-H])?([0-9]{1,2})?$')
+    blank_match = row_col_pat.match(blank_well)
+    well_match = row_col_pat.match(well)
+
+    if not blank_match:
+        raise ValueError(f"blank well '{blank_well}' doesn't seem like a well.")
+    if not well_match:
+        raise ValueError(f"well '{well}' doesn't seem like a well.")
+
+    blank_row, blank_col = blank_match.groups()
+    well_row, well_col = well_match.groups()
+
+    if blank_row and blank_col:
+        return blank_row + blank_col
+
+    elif blank_row and not blank_col:
+        return blank_row + well_col
+
+    elif not blank_row and blank_col:
+        return well_row + blank_col
+
+    else:
+        raise AssertionError()
+
+def subtract_blanks(data, wells, channel):
+    """
+    Subtract the appropriate blank from each well of the given data, which can
+    either be a series (indexed by well) or a data frame (with one column per
+    well).  Only the wells in the layout are returned, but the blanks can come
+    from any well in the data.
+    """
+    blanks = pd.Series(None, index=wells.index, dtype=object)
+    for key in 'blank', f'{channel}_blank':
+        if key in wells:
+            blanks = wells[key].where(wells[key].notnull(), blanks)
+
+    # Wells are the index of a series, but the columns of a data frame.
+    axis = data.ndim - 1
+    blanked = data.reindex(wells.index, axis=axis)
+
+    for well, blank in blanks.dropna().items():
+        blank_well = find_blank_well(blank, well)
+        if blank_well not in data.axes[axis]:
+            raise ValueError(f"no data for blank well '{blank_well}' (needed to blank '{well}')")
+        blanked[well] = blanked[well] - data[blank_well]
+
+    return blanked
+
+def fingerprint(toml_path):
+    """
+    Identify the current state of all the files that go into analyzing the
+    given plate: the layout, any templates it refers to, the data, and the
+    source code of this module.
+    """
+    toml_path = Path(toml_path).resolve()
+    paths = [toml_path, Path(__file__)]
+    layout = plate.load_toml(toml_path)
+
+    while 'template' in layout:
+        template_path = (paths[-2].parent / layout['template']).resolve()
+        paths.insert(-1, template_path)
+        layout = plate.load_toml(template_path)
+
+    try:
+        paths.append(find_xlsx_path(toml_path, plate.load_layout(toml_path)))
+    except ValueError:
+        pass
+
+    return file_fingerprint(*paths)
+
+def cache_path(cache_dir, toml_path):
+    return key_path(cache_dir, str(toml_path))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""\
+Keep the results of slow analyses on disk, so they only need to be redone when
+the files they came from change.
+
+Caches live in ``$XDG_CACHE_HOME/sgrna_sensor`` (``~/.cache/sgrna_sensor`` by
+default).  Each entry is stored along with a fingerprint of the files it was
+derived from, and is ignored if the fingerprint no longer matches.
+"""
+
+import os
+import pickle
+import hashlib
+from pathlib import Path
+
+def default_cache_dir(name):
+    """
+    Return the default location of the cache with the given name.
+    """
+    root = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(root) / 'sgrna_sensor' / name
+
+def file_fingerprint(*paths, extra=None):
+    """
+    Identify the current state of the given files, by their modification times
+    and sizes.  `extra` can be anything with a stable repr (e.g. the settings
+    used to analyze the files), and is included in the fingerprint.
+    """
+    sha1 = hashlib.sha1()
+    for path in paths:
+        stat = Path(path).stat()
+        sha1.update(f'{path}:{stat.st_mtime}:{stat.st_size};'.encode())
+    if extra is not None:
+        sha1.update(repr(extra).encode())
+    return sha1.hexdigest()
+
+def key_path(cache_dir, key, suffix='.pkl'):
+    """
+    Return a path in the given directory that is unique to the given key.
+    """
+    return Path(cache_dir) / f'{hashlib.sha1(key.encode()).hexdigest()}{suffix}'
+
+def load_pickle(path, fingerprint):
+    """
+    Return the object pickled at the given path, or None if there isn't one or
+    if it was saved with a different fingerprint.
+    """
+    try:
+        with Path(path).open('rb') as file:
+            cached_fingerprint, obj = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+    return obj if cached_fingerprint == fingerprint else None
+
+def save_pickle(path, fingerprint, obj):
+    """
+    Pickle the given object (along with the given fingerprint) to the given
+    path.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write to a temporary file first, so a crash can't leave a truncated
+    # cache entry behind.
+    tmp_path = path.with_suffix('.tmp')
+    with tmp_path.open('wb') as file:
+        pickle.dump((fingerprint, obj), file, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(path)
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 
+import os
+import functools
 from pprint import pprint
+from collections import namedtuple
 from .sequence import *
 from .helpers import *
 
@@ -52,7 +55,8 @@ def spacer(name='none', species=None):
     Parameters
     ----------
     target: 'rfp', 'aavs', 'vegfa'
-        The sequence to target.
+        The sequence to target.  Any spacer added to the registry (see 
+        `register_spacers()`) can also be named here.
 
     species:
         The species of Cas9 in question.  Different species have different 
@@ -62,9 +66,134 @@ def spacer(name='none', species=None):
         'sp': S. pyogenes
         'sa': S. aureus
     """
-    if species is None:
-        species = 'sp'
+    sequence = spacer_registry().lookup(name, species)
 
+    spacer = Domain('spacer', sequence)
+    spacer.style = 'white', 'bold'
+
+    return Construct(name, spacer)
+
+class SpacerRegistry:
+    """
+    Keep track of all the named spacer sequences, for each species of Cas9.
+
+    Spacers can be looked up by name or by alias, and the names of the 
+    spacers with a given sequence can be looked up too.  Every lookup is a 
+    dictionary access, so tables with thousands of spacers (e.g. genome-wide 
+    guide libraries) can be registered without slowing anything down.
+    """
+
+    # The 'sap' scaffold has all the same spacers as the 'sa' scaffold.
+    species_aliases = {'sap': 'sa'}
+
+    def __init__(self):
+        self.spacers = {}
+        self.aliases = {}
+        self.names_by_seq = {}
+        self.version = 0
+
+    def add_species(self, species):
+        species = self.species_aliases.get(species, species)
+        self.spacers.setdefault(species, {})
+        self.aliases.setdefault(species, {})
+        self.names_by_seq.setdefault(species, {})
+        return species
+
+    def add_spacer(self, name, sequence, species='sp', overwrite=False):
+        species = self.add_species(species)
+        spacers = self.spacers[species]
+
+        if name in spacers:
+            if spacers[name] == sequence:
+                return
+            if not overwrite:
+                raise ValueError(f"Spacer '{name}' is already defined as '{spacers[name]}' for species '{species}'")
+            self._unindex(species, name)
+
+        spacers[name] = sequence
+        key = self._seq_key(sequence)
+        self.names_by_seq[species].setdefault(key, []).append(name)
+        self.version += 1
+
+    def add_spacers(self, spacers, species='sp', overwrite=False):
+        """
+        Add every spacer from the given dictionary (or iterable of (name, 
+        sequence) pairs).
+        """
+        if hasattr(spacers, 'items'):
+            spacers = spacers.items()
+        for name, sequence in spacers:
+            self.add_spacer(name, sequence, species, overwrite)
+
+    def add_alias(self, alias, name, species='sp'):
+        species = self.add_species(species)
+        self.aliases[species][alias] = name
+        self.version += 1
+
+    def get(self, name, species=None):
+        """
+        Return the sequence of the given spacer, or None if there is no such 
+        spacer (or no such species).
+        """
+        if species is None:
+            species = 'sp'
+        species = self.species_aliases.get(species, species)
+
+        try:
+            aliases = self.aliases[species]
+            return self.spacers[species][aliases.get(name, name)]
+        except KeyError:
+            return None
+
+    def lookup(self, name, species=None):
+        """
+        Return the sequence of the given spacer, or raise a ValueError if 
+        there is no such spacer.
+        """
+        sequence = self.get(name, species)
+        if sequence is None:
+            if self.species_aliases.get(species, species or 'sp') not in self.spacers:
+                raise ValueError("Unknown species: '{}'".format(species))
+            raise ValueError("Unknown spacer: '{}'".format(name))
+        return sequence
+
+    def find(self, sequence, species=None):
+        """
+        Return the names of all the spacers with the given sequence.  DNA and 
+        RNA sequences are treated the same, and case doesn't matter.
+        """
+        key = self._seq_key(sequence)
+
+        if species is None:
+            species = list(self.names_by_seq)
+        else:
+            species = [self.species_aliases.get(species, species)]
+
+        return [
+                name
+                for x in species
+                for name in self.names_by_seq.get(x, {}).get(key, [])
+        ]
+
+    def _unindex(self, species, name):
+        key = self._seq_key(self.spacers[species][name])
+        names = self.names_by_seq[species][key]
+        names.remove(name)
+        if not names:
+            del self.names_by_seq[species][key]
+
+    @staticmethod
+    def _seq_key(sequence):
+        return sequence.upper().replace('U', 'T')
+
+@functools.lru_cache(maxsize=None)
+def spacer_registry():
+    """
+    Return the registry of known spacers.  The registry is built the first 
+    time it's needed and then shared for the rest of the session, so any 
+    spacers added to it (e.g. with `register_spacers()`) are visible to 
+    `spacer()` and to all the design factories.
+    """
     spacers = {
             'sp': {
                 'none':   '',
@@ -126,41 +255,58 @@ def spacer(name='none', species=None):
             'sa': {
             },
     }
-        
+
+    registry = SpacerRegistry()
+
+    for species in spacers:
+        registry.add_spacers(spacers[species], species)
+    for species in aliases:
+        for alias, name in aliases[species].items():
+            registry.add_alias(alias, name, species)
+
     # Include the Doench16 spacers
     from os.path import join, dirname
     doench_tsv = join(dirname(__file__), 'doench_spacers.tsv')
     with open(doench_tsv) as file:
         for line in file:
             doench_name, spacer, score = line.split()
-            spacers['sp'][doench_name] = spacer[4:24]
+            registry.add_spacer(doench_name, spacer[4:24], 'sp', overwrite=True)
 
     # Include the FolA spacers
-    doench_tsv = join(dirname(__file__), 'folA_spacers.tsv')
-    with open(doench_tsv) as file:
+    folA_tsv = join(dirname(__file__), 'folA_spacers.tsv')
+    with open(folA_tsv) as file:
         for line in file:
             folA_name, spacer, pam, orientation = line.split()
-            spacers['sp'][folA_name] = spacer
+            registry.add_spacer(folA_name, spacer, 'sp', overwrite=True)
 
-    # The 'sap' scaffold has all the same spacers as the 'sa' scaffold.
-    spacers['sap'] = spacers['sa']
-    aliases['sap'] = aliases['sa']
+    return registry
 
-    try:
-        spacers = spacers[species]
-        aliases = aliases[species]
-    except KeyError:
-        raise ValueError("Unknown species: '{}'".format(species))
+def register_spacers(spacers, species='sp', overwrite=False):
+    """
+    Add the given spacers to the registry, so that they can be used by name.
 
-    try:
-        sequence = spacers[aliases.get(name, name)]
-    except KeyError:
-        raise ValueError("Unknown spacer: '{}'".format(name))
+    Parameters
+    ----------
+    spacers: dict, iterable of (name, sequence) pairs, or path
+        The spacers to add.  A path should refer to a whitespace-delimited 
+        table where the first two columns are the name and the sequence of 
+        each spacer.  Blank lines and lines beginning with '#' are ignored.
 
-    spacer = Domain('spacer', sequence)
-    spacer.style = 'white', 'bold'
+    species:
+        The species of Cas9 that the spacers are meant for.
 
-    return Construct(name, spacer)
+    overwrite: bool
+        If false, it's an error to give a new sequence to an existing name.
+    """
+    if isinstance(spacers, (str, os.PathLike)):
+        with open(spacers) as file:
+            spacers = [
+                    line.split()[:2]
+                    for line in file
+                    if line.strip() and not line.startswith('#')
+            ]
+
+    spacer_registry().add_spacers(spacers, species, overwrite)
 
 def repeat(name, length, end, pattern='UUUCCC'):
     """
@@ -181,15 +327,74 @@ def repeat(name, length, end, pattern='UUUCCC'):
     sequence = pattern * (1 + length // len(pattern))
     return Domain(name, sequence[:length])
 
+AptamerTemplate = namedtuple('AptamerTemplate', [
+        'sequence_pieces',
+        'constraint_pieces',
+        'affinity_uM',
+        'liu_sequence_pieces',
+])
+
+APTAMERS = {}
+
+def add_aptamer(names, sequence_pieces, constraint_pieces, affinity_uM=float('inf'), liu_sequence_pieces=None):
+    """
+    Make a new aptamer available to `aptamer()` and all of the design 
+    factories.
+
+    Parameters
+    ----------
+    names: tuple of str
+        All the names that can be used to refer to the aptamer, e.g. 
+        ('th', 'theo', 'theophylline').
+
+    sequence_pieces: tuple of str
+        Either the whole aptamer sequence, or its 5' half, splitter, and 3' 
+        half.
+
+    constraint_pieces: tuple of str
+        The dot-bracket constraints for each sequence piece.  None means that 
+        the aptamer isn't supported yet.
+
+    affinity_uM: float
+        The dissociation constant of the aptamer for its ligand.
+
+    liu_sequence_pieces: tuple of str
+        An alternative sequence to use when `aptamer()` is called with 
+        `liu=True`.
+    """
+    sequence_pieces = tuple(sequence_pieces)
+    name = names[0]
+
+    # Check for obvious entry errors in the aptamer sequences.
+
+    for pieces in (sequence_pieces, liu_sequence_pieces):
+        if pieces is None or constraint_pieces is None:
+            continue
+        if len(pieces) not in (1, 3):
+            raise AssertionError("{} has {} sequence pieces, not 1 or 3.".format(name, len(pieces)))
+        if len(pieces) != len(constraint_pieces):
+            raise AssertionError("{} has {} sequence pieces and {} constraint pieces.".format(name, len(pieces), len(constraint_pieces)))
+        if len(''.join(pieces)) != len(''.join(constraint_pieces)):
+            raise AssertionError("the {} sequence has a different length than its constraints.".format(name))
+
+    template = AptamerTemplate(
+            sequence_pieces,
+            constraint_pieces and tuple(constraint_pieces),
+            affinity_uM,
+            liu_sequence_pieces and tuple(liu_sequence_pieces),
+    )
+    for name in names:
+        APTAMERS[name] = template
+
 def aptamer(ligand, piece='whole', liu=False):
     """
     Construct aptamer sequences.
 
     Parameters
     ----------
-    ligand: 'theo'
-        Specify the aptamer to generate.  Right now only the theophylline 
-        aptamer is known.
+    ligand: 'theo', 'tpp', 'tet', etc.
+        Specify the aptamer to generate.  Any of the names in `APTAMERS` can 
+        be given.
 
     piece: 'whole', '5', '3', or 'splitter'
         Specify which part of the aptamer to generate.  The whole aptamer 
@@ -203,214 +408,24 @@ def aptamer(ligand, piece='whole', liu=False):
         RNAfold to approximate a ligand bound state.
     """
 
-    affinity_uM = float('inf')
-
-    # Get the right sequence for the requested aptamer.
-
-    if ligand in ('th', 'theo', 'theophylline'):
-        sequence_pieces         = 'AUACCAGCC', 'GAAA', 'GGCCCUUGGCAG'
-        if liu: sequence_pieces = 'AUACCACGC', 'GAAA', 'GCGCCUUGGCAG'
-        constraint_pieces       = '.((((.(((', '....', ')))....)))).'
-        affinity_uM = 0.32
-
-    elif ligand in ('gtheoc'):
-        # The theophylline aptamer, bracketed by a GC base pair.  This 
-        # construct is more convenient to use with ViennaRNA, because a 
-        # bracketing base pair is required to make a constraint.
-        sequence_pieces   = 'GAUACCAGCC', 'GAAA', 'GGCCCUUGGCAGC'
-        constraint_pieces = '(.((((.(((', '....', ')))....)))).)'
-        affinity_uM = 0.32
-
-    elif ligand in ('3', '3mx', '3-methylxanthine'):
-        # Soukup, Emilsson, Breaker. Altering molecular recognition of RNA 
-        # aptamers by allosteric selection. J. Mol. Biol. (2000) 298, 623-632.
-        sequence_pieces   = 'AUACCAGCC', 'GAAA', 'GGCCAUUGGCAG'
-        constraint_pieces = '.(.((((((', '....', ')))...))).).'
-
-    elif ligand in ('r', 'tmr', 'tetramethylrosamine', 'mg', 'malachite green'):
-        # Baugh, Grate, Wilson. 2.8Å structure of the malachite green aptamer.  
-        # JMB (2000) 301:1:117-128.
-
-        # This aptamer was used to make riboswitches, but with luciferase and 
-        # not RFP, possibly because TMR is a fluorescent dye: Borujeni et al.  
-        # Automated physics-based design of synthetic riboswitches from diverse 
-        # RNA aptamers. Nucl.  Acids Res.  (2016) 44:1:1-13.
-
-        # I can't find any commercial TMR.  Sigma used to sell it as product 
-        # number T1823, but has since discontinued it.
-        sequence_pieces   = 'CCGACUGGCGAGAGCCAGGUAACGAAUG',
-        constraint_pieces = '(...(((((....))))).........)',
-
-    elif ligand in ('tpp', 'thiamine', 'thiamine pyrophosphate'):
-        # Winkler, Hahvi, Breaker. Thiamine derivatives bind messenger RNAs 
-        # directly to regulate bacterial gene expression. Nature (2002) 
-        # 419:952-956.
-
-        # The sequence I've copied here is the ThiM 91 fragment from Winkler et 
-        # al.  Weiland et al. used almost the same sequence, but they mutated 
-        # the last nucleotide from A to U to break a base pair.
-
-        # Winker et al used "M9 glucose minimal media (plus 50 μg/mL vitamin 
-        # assay Casamino acids; Difco)" with or without 100 μM thiamine for 
-        # their in vivo assays (figure 4b, bottom).  The "vitamin assay" means 
-        # the casein digest was treated to remove certain vitamins; presumably 
-        # this is an important detail.
-
-        # Weiland et al. used M63 media with or without 1 mM thiamine for their 
-        # in vivo assays.  This is a little confusing to me because the M63 
-        # recipe I found contains thiamine.  Also, the titrations in figure 3B 
-        # and 3C only go to 50 μM (and saturate around 1 μM).
-
-        # My plan is to use M9 media with glucose and "vitamin assay" Casamino 
-        # acids, with and without 100 μM thiamine.
-        sequence_pieces   = 'UCGGGGUGCCCUUCUGCGUGAAGGCUGAGAAAUACCCGUAUCACCUGAUCUGGAUAAUGCCAGCGUAGGGAA',
-        constraint_pieces = '(..(((((.(((((.....)))))........)))))......((((..((((......))))..))))..)',
-        affinity_uM = 0.0324 # (interpolated from figure 2b in Winkler et al.)
-
-    elif ligand in ('a', 'add', 'adenine'):
-        # Serganov et al. Structural Basis for discriminative regulation of 
-        # gene expression by adenine- and guanine-sensing mRNAs. Chemistry & 
-        # Biology (2004) 11:1729-1741.
-
-        # I truncated 7 base pairs that weren't interacting with the ligand 
-        # from the end of the construct.  I haven't been able to find an 
-        # example of the adenine aptamer being used in a riboswitch to see if 
-        # this is what other people have done, but Nomura et al. made 
-        # essentially the same truncation to the highly homologous guanine 
-        # aptamer when using it to make an allosteric ribozyme, so I'm pretty 
-        # confident that this could work.
-
-        # Dixon et al. used M9 + 0.4% glucose + 2 mg/mL cas-amino acids + 0.1 
-        # mg/mL thiamine.  This is a higher concentration of cas-amino acids 
-        # than Winkler et al. use for the TPP aptamer, but this is much more in 
-        # line with the standard protocols.
-        # 
-        # The ligand was also in some amount of DMSO, but I'm not sure how 
-        # much.  The solubility of adenine in water is 7.6 mM, so maybe the 
-        # DMSO was only necessary for some of their other ligands.
-        sequence_pieces   = 'UAUAAUCCUAAUGAUAUGGUUUGGGAGUUUCUACCAAGAGCCUUAAACUCUUGAUUA',
-        constraint_pieces = '((...(((((((.......)))))))........((((((.......))))))..))',
-
-    elif ligand in ('b', 'amm', 'ammeline'):
-        # Dixon et al. Reengineering orthogonally selective riboswitches. PNAS 
-        # (2010) 107:7:2830-2835.
-
-        # This is the M6 construct, which is just the adenine aptamer from 
-        # above with U47C and U51C.  The affinity measurement is actually for 
-        # M6'', because it was not measured for M6.
-        sequence_pieces   = 'UAUAAUCCUAAUGAUAUGGUUUGGGAGCUUCCACCAAGAGCCUUAAACUCUUGAUUA',
-        constraint_pieces = '((...(((((((.......)))))))........((((((.......))))))..))',
-        affinity_uM = 1.19
-
-    elif ligand in ('g', 'gua', 'guanine'):
-        # Nomura, Zhou, Miu, Yokobayashi. Controlling mammalian gene expression 
-        # by allosteric Hepatitis Delta Virus ribozymes. ACS Synth. Biol.  
-        # (2013) 2:684-689.
-
-        # Nomura et al. used guanine at 500 μM, but I still see toxicity at 
-        # this concentration.  I think I'm going to use 250 μM instead.
-        sequence_pieces   = 'UAUAAUCGCGUGGAUAUGGCACGCAAGUUUCUACCGGGCACCGUAAAUGUCCGACUA',
-        constraint_pieces = '((...(.(((((.......))))).)........((((((.......))))))..))',
-        affinity_uM = 0.005
-
-    elif ligand in ('fmn', 'flavin', 'flavin mononucleotide'):
-        # Soukup, Breaker. Engineering precision RNA molecular switches. PNAS 
-        # (1999) 96:3584-3589.  
-
-        # I can't find any examples of anyone using this aptamer in vivo.
-        sequence_pieces   = 'GAGGAUAUGCUUCGGCAGAAGGC',
-        constraint_pieces = '(......(((....))).....)',
-
-    elif ligand in ('m', 'ms2', 'ms2 coat protein'):
-        # Qi, Lucks, Liu, Mutalik, Arkin. Engineering naturally occurring 
-        # trans-acting non-coding RNAs to sense molecular signals. Nucl. Acids 
-        # Res. (2012) 40:12:5775-5786. Sequence in supplement.
-
-        # I can't really figure out which MS2 aptamer people use for synthetic 
-        # biology.  All the papers I've read agree that the aptamer has one 
-        # stem and three unpaired adenosines.  The sequences from Romaniuk, 
-        # Convery, and Qi actually have the same stem, they just differ in the 
-        # loop.  The sequences from Batey and Culler are exactly the same, but 
-        # different from those in the other papers.
-
-        # The loop from Romaniuk and Convery is AUUA (the wildtype sequence) 
-        # while the loop from Qi is ACCA.  I'm inclined to use ACCA because Qi 
-        # was doing synthetic biology and because Convery mentions that the 
-        # natural consensus sequence for the loop is ANYA, a standard tetraloop 
-        # which doesn't preclude ACCA.
-
-        # I should consider making the N55K mutation to the coat protein 
-        # itself.  One of the plasmids on AddGene mentioned that this mutation 
-        # increases affinity for the aptamer.  That plasmid was for mammalian 
-        # expression, and so far I haven't seen this assertion corroborated for 
-        # bacterial systems.
-        sequence_pieces   = 'AACAUGAGGACCACCCAUGUU',
-        constraint_pieces = '((((((.((....))))))))',
-
-    elif ligand in ('bca', 'beta-catenin'):
-        # Culler, Hoff, Smolke. Reprogramming cellular behavior with rna 
-        # controllers responsive to endogenous proteins. Science (2010) 
-        # 330:6008:1251-1255.
-        sequence_pieces = 'AGGCCGATCTATGGACGCTATAGGCACACCGGATACTTTAACGATTGGCT',
-        raise NotImplementedError
+    # Look up the precompiled sequence for the requested aptamer.  The 
+    # template is shared by every call, but its pieces are all immutable 
+    # strings, so each construct gets its own domains without any copying.
 
-    elif ligand in ('tc', 'tet', 'tetracycline'):
-        # Wittmann and Suess.  Selection of tetracycline inducible 
-        # self-cleaving ribozymes as synthetic devices for gene regulation in 
-        # yeast.  Mol BioSyst (2011) 7:2419-2427.
-
-        # The authors used 100 μM tetracycline in yeast.  I've seen other 
-        # papers that used as much as 250 μM.
-        sequence_pieces   = 'AAAACAUACCAGAUUUCGAUCUGGAGAGGUGAAGAAUACGACCACCU',
-        constraint_pieces = '(.......((((((....))))))...((((...........)))))',
-
-        # Müller, Weigand, Weichenrieder, Suess. Thermodynamic characterization 
-        # of an engineered tetracycline-binding riboswitch. Nucleic Acids 
-        # Research (2006) 34:9:2607-2617.
-        affinity_uM = 0.00077 # 770 pM
-
-    elif ligand in ('neo', 'neomycin'):
-        # Weigand, Sanchez, Gunnesch, Zeiher, Schroeder, Suess. Screening for 
-        # engineered neomycin riboswitches that control translation initiation.  
-        # RNA (2008) 14:89-97.
-
-        # The authors show that the aptamer consists of two domains: one that 
-        # binds neomycin and one which is just a stem.  Both are important for 
-        # regulating gene expression in their system, which is the 5'-UTR of an 
-        # mRNA.  However, here I only include the ligand-binding domain.  The 
-        # length and composition of the stem domain is probably application 
-        # dependent, and that's what I need to pull out of directed evolution.
-        #
-        # The authors used 100 μM neomycin.  Yeast were grown at 28°C for 48h 
-        # in 5 mL minimal media.
-        sequence_pieces   = 'GCUUGUCCUUUAAUGGUCC',
-        constraint_pieces = '(.....((......))..)',
-
-    elif ligand in ('asp', 'aspartame'):
-        # Ferguson et al. A novel strategy for selection of allosteric 
-        # ribozymes yields RiboReporter™ sensors for caffeine and aspartame.  
-        # Nucl. Acids Res. (2004) 32:5
-        sequence_pieces   = 'CGGTGCTAGTTAGTTGCAGTTTCGGTTGTTACG',
-        constraint_pieces = '((.............................))',
-
-    elif ligand in ('caf', 'caffeine'):
-        # Ferguson et al. A novel strategy for selection of allosteric 
-        # ribozymes yields RiboReporter™ sensors for caffeine and aspartame.  
-        # Nucl. Acids Res. (2004) 32:5
-        sequence_pieces   = 'GATCATCGGACTTTGTCCTGTGGAGTAAGATCG',
-        constraint_pieces = '.................................',
+    try:
+        template = APTAMERS[ligand]
+    except (KeyError, TypeError):
+        raise ValueError("no aptamer for '{}'".format(ligand)) from None
 
-    else:
-        raise ValueError("no aptamer for '{}'".format(ligand))
+    if template.constraint_pieces is None:
+        raise NotImplementedError
 
-    # Check for obvious entry errors in the aptamer sequences.
+    sequence_pieces = template.sequence_pieces
+    constraint_pieces = template.constraint_pieces
+    affinity_uM = template.affinity_uM
 
-    if len(sequence_pieces) not in (1, 3):
-        raise AssertionError("{} has {} sequence pieces, not 1 or 3.".format(ligand, len(sequence_pieces)))
-    if len(sequence_pieces) != len(constraint_pieces):
-        raise AssertionError("{} has {} sequence pieces and {} constraint pieces.".format(ligand, len(sequence_pieces), len(constraint_pieces)))
-    if len(''.join(sequence_pieces)) != len(''.join(constraint_pieces)):
-        raise AssertionError("the {} sequence has a different length than its constraints.".format(ligand))
+    if liu and template.liu_sequence_pieces:
+        sequence_pieces = template.liu_sequence_pieces
 
     # Define the domains that make up the aptamer.
 
@@ -435,28 +450,252 @@ def aptamer(ligand, piece='whole', liu=False):
 
         aptamer_S.mutable = True
 
-    # Assemble the aptamer domains into a single construct and return it.
-
-    construct = Construct('aptamer')
+    # Assemble the aptamer domains into a single construct and return it.  
+    # The domains are handed to the constructor all at once, because 
+    # appending them one at a time recalculates the whole sequence each time.
 
     if len(sequence_pieces) == 1:
-        construct += aptamer
+        domains = [aptamer]
 
     if len(sequence_pieces) == 3:
         if piece == 'whole':
-            construct += aptamer_5
-            construct += aptamer_S
-            construct += aptamer_3
+            domains = [aptamer_5, aptamer_S, aptamer_3]
         elif str(piece) == '5':
-            construct += aptamer_5
+            domains = [aptamer_5]
         elif piece == 'splitter':
-            construct += aptamer_S
+            domains = [aptamer_S]
         elif str(piece) == '3':
-            construct += aptamer_3
+            domains = [aptamer_3]
         else:
             raise ValueError("must request 'whole', '5', '3', or 'splitter' piece of aptamer, not {}.".format(piece))
 
-    return construct
+    return Construct('aptamer', domains)
+
+# The aptamers known to `aptamer()`.  Each template is checked and stored 
+# once, when this module is imported.
+
+add_aptamer(
+        ('th', 'theo', 'theophylline'),
+        sequence_pieces=('AUACCAGCC', 'GAAA', 'GGCCCUUGGCAG'),
+        liu_sequence_pieces=('AUACCACGC', 'GAAA', 'GCGCCUUGGCAG'),
+        constraint_pieces=('.((((.(((', '....', ')))....)))).'),
+        affinity_uM=0.32,
+)
+
+# The theophylline aptamer, bracketed by a GC base pair.  This
+# construct is more convenient to use with ViennaRNA, because a
+# bracketing base pair is required to make a constraint.
+add_aptamer(
+        ('gtheoc',),
+        sequence_pieces=('GAUACCAGCC', 'GAAA', 'GGCCCUUGGCAGC'),
+        constraint_pieces=('(.((((.(((', '....', ')))....)))).)'),
+        affinity_uM=0.32,
+)
+
+# Soukup, Emilsson, Breaker. Altering molecular recognition of RNA
+# aptamers by allosteric selection. J. Mol. Biol. (2000) 298, 623-632.
+add_aptamer(
+        ('3', '3mx', '3-methylxanthine'),
+        sequence_pieces=('AUACCAGCC', 'GAAA', 'GGCCAUUGGCAG'),
+        constraint_pieces=('.(.((((((', '....', ')))...))).).'),
+)
+
+# Baugh, Grate, Wilson. 2.8Å structure of the malachite green aptamer.
+# JMB (2000) 301:1:117-128.
+#
+# This aptamer was used to make riboswitches, but with luciferase and
+# not RFP, possibly because TMR is a fluorescent dye: Borujeni et al.
+# Automated physics-based design of synthetic riboswitches from diverse
+# RNA aptamers. Nucl.  Acids Res.  (2016) 44:1:1-13.
+#
+# I can't find any commercial TMR.  Sigma used to sell it as product
+# number T1823, but has since discontinued it.
+add_aptamer(
+        ('r', 'tmr', 'tetramethylrosamine', 'mg', 'malachite green'),
+        sequence_pieces=('CCGACUGGCGAGAGCCAGGUAACGAAUG',),
+        constraint_pieces=('(...(((((....))))).........)',),
+)
+
+# Winkler, Hahvi, Breaker. Thiamine derivatives bind messenger RNAs
+# directly to regulate bacterial gene expression. Nature (2002)
+# 419:952-956.
+#
+# The sequence I've copied here is the ThiM 91 fragment from Winkler et
+# al.  Weiland et al. used almost the same sequence, but they mutated
+# the last nucleotide from A to U to break a base pair.
+#
+# Winker et al used "M9 glucose minimal media (plus 50 μg/mL vitamin
+# assay Casamino acids; Difco)" with or without 100 μM thiamine for
+# their in vivo assays (figure 4b, bottom).  The "vitamin assay" means
+# the casein digest was treated to remove certain vitamins; presumably
+# this is an important detail.
+#
+# Weiland et al. used M63 media with or without 1 mM thiamine for their
+# in vivo assays.  This is a little confusing to me because the M63
+# recipe I found contains thiamine.  Also, the titrations in figure 3B
+# and 3C only go to 50 μM (and saturate around 1 μM).
+#
+# My plan is to use M9 media with glucose and "vitamin assay" Casamino
+# acids, with and without 100 μM thiamine.
+add_aptamer(
+        ('tpp', 'thiamine', 'thiamine pyrophosphate'),
+        sequence_pieces=('UCGGGGUGCCCUUCUGCGUGAAGGCUGAGAAAUACCCGUAUCACCUGAUCUGGAUAAUGCCAGCGUAGGGAA',),
+        constraint_pieces=('(..(((((.(((((.....)))))........)))))......((((..((((......))))..))))..)',),
+        affinity_uM=0.0324, # (interpolated from figure 2b in Winkler et al.)
+)
+
+# Serganov et al. Structural Basis for discriminative regulation of
+# gene expression by adenine- and guanine-sensing mRNAs. Chemistry &
+# Biology (2004) 11:1729-1741.
+#
+# I truncated 7 base pairs that weren't interacting with the ligand
+# from the end of the construct.  I haven't been able to find an
+# example of the adenine aptamer being used in a riboswitch to see if
+# this is what other people have done, but Nomura et al. made
+# essentially the same truncation to the highly homologous guanine
+# aptamer when using it to make an allosteric ribozyme, so I'm pretty
+# confident that this could work.
+#
+# Dixon et al. used M9 + 0.4% glucose + 2 mg/mL cas-amino acids + 0.1
+# mg/mL thiamine.  This is a higher concentration of cas-amino acids
+# than Winkler et al. use for the TPP aptamer, but this is much more in
+# line with the standard protocols.
+#
+# The ligand was also in some amount of DMSO, but I'm not sure how
+# much.  The solubility of adenine in water is 7.6 mM, so maybe the
+# DMSO was only necessary for some of their other ligands.
+add_aptamer(
+        ('a', 'add', 'adenine'),
+        sequence_pieces=('UAUAAUCCUAAUGAUAUGGUUUGGGAGUUUCUACCAAGAGCCUUAAACUCUUGAUUA',),
+        constraint_pieces=('((...(((((((.......)))))))........((((((.......))))))..))',),
+)
+
+# Dixon et al. Reengineering orthogonally selective riboswitches. PNAS
+# (2010) 107:7:2830-2835.
+#
+# This is the M6 construct, which is just the adenine aptamer from
+# above with U47C and U51C.  The affinity measurement is actually for
+# M6'', because it was not measured for M6.
+add_aptamer(
+        ('b', 'amm', 'ammeline'),
+        sequence_pieces=('UAUAAUCCUAAUGAUAUGGUUUGGGAGCUUCCACCAAGAGCCUUAAACUCUUGAUUA',),
+        constraint_pieces=('((...(((((((.......)))))))........((((((.......))))))..))',),
+        affinity_uM=1.19,
+)
+
+# Nomura, Zhou, Miu, Yokobayashi. Controlling mammalian gene expression
+# by allosteric Hepatitis Delta Virus ribozymes. ACS Synth. Biol.
+# (2013) 2:684-689.
+#
+# Nomura et al. used guanine at 500 μM, but I still see toxicity at
+# this concentration.  I think I'm going to use 250 μM instead.
+add_aptamer(
+        ('g', 'gua', 'guanine'),
+        sequence_pieces=('UAUAAUCGCGUGGAUAUGGCACGCAAGUUUCUACCGGGCACCGUAAAUGUCCGACUA',),
+        constraint_pieces=('((...(.(((((.......))))).)........((((((.......))))))..))',),
+        affinity_uM=0.005,
+)
+
+# Soukup, Breaker. Engineering precision RNA molecular switches. PNAS
+# (1999) 96:3584-3589.
+#
+# I can't find any examples of anyone using this aptamer in vivo.
+add_aptamer(
+        ('fmn', 'flavin', 'flavin mononucleotide'),
+        sequence_pieces=('GAGGAUAUGCUUCGGCAGAAGGC',),
+        constraint_pieces=('(......(((....))).....)',),
+)
+
+# Qi, Lucks, Liu, Mutalik, Arkin. Engineering naturally occurring
+# trans-acting non-coding RNAs to sense molecular signals. Nucl. Acids
+# Res. (2012) 40:12:5775-5786. Sequence in supplement.
+#
+# I can't really figure out which MS2 aptamer people use for synthetic
+# biology.  All the papers I've read agree that the aptamer has one
+# stem and three unpaired adenosines.  The sequences from Romaniuk,
+# Convery, and Qi actually have the same stem, they just differ in the
+# loop.  The sequences from Batey and Culler are exactly the same, but
+# different from those in the other papers.
+#
+# The loop from Romaniuk and Convery is AUUA (the wildtype sequence)
+# while the loop from Qi is ACCA.  I'm inclined to use ACCA because Qi
+# was doing synthetic biology and because Convery mentions that the
+# natural consensus sequence for the loop is ANYA, a standard tetraloop
+# which doesn't preclude ACCA.
+#
+# I should consider making the N55K mutation to the coat protein
+# itself.  One of the plasmids on AddGene mentioned that this mutation
+# increases affinity for the aptamer.  That plasmid was for mammalian
+# expression, and so far I haven't seen this assertion corroborated for
+# bacterial systems.
+add_aptamer(
+        ('m', 'ms2', 'ms2 coat protein'),
+        sequence_pieces=('AACAUGAGGACCACCCAUGUU',),
+        constraint_pieces=('((((((.((....))))))))',),
+)
+
+# Culler, Hoff, Smolke. Reprogramming cellular behavior with rna
+# controllers responsive to endogenous proteins. Science (2010)
+# 330:6008:1251-1255.
+add_aptamer(
+        ('bca', 'beta-catenin'),
+        sequence_pieces=('AGGCCGATCTATGGACGCTATAGGCACACCGGATACTTTAACGATTGGCT',),
+        constraint_pieces=None,
+)
+
+# Wittmann and Suess.  Selection of tetracycline inducible
+# self-cleaving ribozymes as synthetic devices for gene regulation in
+# yeast.  Mol BioSyst (2011) 7:2419-2427.
+#
+# The authors used 100 μM tetracycline in yeast.  I've seen other
+# papers that used as much as 250 μM.
+#
+# Müller, Weigand, Weichenrieder, Suess. Thermodynamic characterization
+# of an engineered tetracycline-binding riboswitch. Nucleic Acids
+# Research (2006) 34:9:2607-2617.
+add_aptamer(
+        ('tc', 'tet', 'tetracycline'),
+        sequence_pieces=('AAAACAUACCAGAUUUCGAUCUGGAGAGGUGAAGAAUACGACCACCU',),
+        constraint_pieces=('(.......((((((....))))))...((((...........)))))',),
+        affinity_uM=0.00077, # 770 pM
+)
+
+# Weigand, Sanchez, Gunnesch, Zeiher, Schroeder, Suess. Screening for
+# engineered neomycin riboswitches that control translation initiation.
+# RNA (2008) 14:89-97.
+#
+# The authors show that the aptamer consists of two domains: one that
+# binds neomycin and one which is just a stem.  Both are important for
+# regulating gene expression in their system, which is the 5'-UTR of an
+# mRNA.  However, here I only include the ligand-binding domain.  The
+# length and composition of the stem domain is probably application
+# dependent, and that's what I need to pull out of directed evolution.
+#
+# The authors used 100 μM neomycin.  Yeast were grown at 28°C for 48h
+# in 5 mL minimal media.
+add_aptamer(
+        ('neo', 'neomycin'),
+        sequence_pieces=('GCUUGUCCUUUAAUGGUCC',),
+        constraint_pieces=('(.....((......))..)',),
+)
+
+# Ferguson et al. A novel strategy for selection of allosteric
+# ribozymes yields RiboReporter™ sensors for caffeine and aspartame.
+# Nucl. Acids Res. (2004) 32:5
+add_aptamer(
+        ('asp', 'aspartame'),
+        sequence_pieces=('CGGTGCTAGTTAGTTGCAGTTTCGGTTGTTACG',),
+        constraint_pieces=('((.............................))',),
+)
+
+# Ferguson et al. A novel strategy for selection of allosteric
+# ribozymes yields RiboReporter™ sensors for caffeine and aspartame.
+# Nucl. Acids Res. (2004) 32:5
+add_aptamer(
+        ('caf', 'caffeine'),
+        sequence_pieces=('GATCATCGGACTTTGTCCTGTGGAGTAAGATCG',),
+        constraint_pieces=('.................................',),
+)
 
 def aptamer_insert(ligand, linker_len=0, splitter_len=0, repeat_factory=repeat,
         num_aptamers=1):
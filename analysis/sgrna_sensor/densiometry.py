@@ -24,72 +24,100 @@ def standardize_df(f):
     return wrapper
 
 
-def load_cleavage_data_from_xlsx_dir(dir, **kw):
+def load_cleavage_data_from_xlsx_dir(dir, workers=None, cache=True, **kw):
+    """
+    Load every spreadsheet in the given directory.  The files are parsed in 
+    parallel, using the given number of worker processes (by default, one per 
+    CPU).  Pass ``workers=1`` to parse the files in the calling process.
+
+    Parsed spreadsheets are cached (see `CleavageDataCache`), so only files 
+    that are new or have changed since the last call are actually parsed.  The 
+    cache is kept in ``~/.cache/sgrna_sensor`` by default.  Pass a path to use 
+    a different database, or ``cache=False`` to parse everything from scratch.
+    """
     dir = Path(dir)
-    dfs = [load_cleavage_data_from_xlsx(p, **kw)
-            for p in sorted(dir.glob('*.xlsx'))]
-    return pd.concat(dfs, ignore_index=True)
+    paths = sorted(dir.glob('*.xlsx'))
+    load = functools.partial(load_cleavage_data_from_xlsx, **kw)
+
+    if cache is True:
+        cache = CleavageDataCache.default_path()
+
+    with contextlib.ExitStack() as stack:
+        db = stack.enter_context(CleavageDataCache(cache, **kw)) if cache else None
+        dfs = {p: db.get(p) for p in paths} if db else {}
+        stale = [p for p in paths if dfs.get(p) is None]
+
+        if workers == 1 or len(stale) <= 1:
+            parsed = [load(p) for p in stale]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(workers) as executor:
+                parsed = list(executor.map(load, stale))
+
+        for p, df in zip(stale, parsed):
+            dfs[p] = df
+            if db: db.put(p, df)
+
+    return pd.concat([dfs[p] for p in paths], ignore_index=True)
 
 def load_cleavage_data_from_xlsx(path, drop_rejects=True, inheritable_cols=INHERITABLE_COLS):
     try:
         from openpyxl import load_workbook
-        book = load_workbook(path)
-        sheet = book['data']
-
-        # Start by parsing the column headers.  Not all the spreadsheets will 
-        # have the same data in the same columns, so we need to figure out 
-        # which columns are present before parsing the rows.
-
-        headers = []
-        cols = []
-        is_col_empty = lambda j: sheet.cell(row=1, column=j).value is None
-        j = 1  # indexing is from 1.
-
-        while not is_col_empty(j):
-            title = sheet.cell(row=1, column=j).value
-
-            # Attempt to remove weird characters from the column titles, 
-            # including parenthesized unit labels and punctuation.  This allows 
-            # downstream code to use pull data out of the data frame using the 
-            # nicer attribute syntax.
-
-            slug = title.lower()
-            slug = re.sub('\(.*\)', '', slug)
-            slug = re.sub('\W', '', slug)
-
-            ignore = 'cleaved', 'change', 'notes'
-            if slug not in ignore:
-                headers.append(slug)
-                cols.append(j)
-
-            j += 1
-
-        # Parse the data from each row.  For "inheritable" columns ('expt', 
-        # 'spacer', 'design', and 'ligand' by default), fill in missing values 
-        # from previous rows.
-        
-        rows = []
-        previous_row = []
-        is_row_empty = lambda i: not any([
-            sheet.cell(row=i, column=j).value for j in cols])
-        i = 2  # Skip the header (indexing is from 1).
-
-        def parse_cell(i, j, j0): #
-            x = sheet.cell(row=i, column=j).value
-            if x is None and headers[j0] in INHERITABLE_COLS:
-                x = previous_row[j0]
-            return x
-
-        while not is_row_empty(i):
-            row = [parse_cell(i, j, j0) for j0, j in enumerate(cols)]
-            rows.append(row)
-            previous_row = row
-            i += 1
-
-        # Convert the parsed data to a pandas data frame, then clean it up a 
+
+        # Open the workbook in read-only mode and stream the rows as plain 
+        # values.  This is much faster than looking up cells one at a time, 
+        # because read-only worksheets have to re-parse the XML for every 
+        # random access.
+        book = load_workbook(path, read_only=True)
+        try:
+            rows = book['data'].iter_rows(values_only=True)
+
+            # Start by parsing the column headers.  Not all the spreadsheets 
+            # will have the same data in the same columns, so we need to 
+            # figure out which columns are present before parsing the rows.
+
+            headers = []
+            cols = []
+
+            for j, title in enumerate(next(rows, ())):
+                if title is None:
+                    break
+
+                # Attempt to remove weird characters from the column titles, 
+                # including parenthesized unit labels and punctuation.  This 
+                # allows downstream code to use pull data out of the data 
+                # frame using the nicer attribute syntax.
+
+                slug = title.lower()
+                slug = re.sub('\(.*\)', '', slug)
+                slug = re.sub('\W', '', slug)
+
+                ignore = 'cleaved', 'change', 'notes'
+                if slug not in ignore:
+                    headers.append(slug)
+                    cols.append(j)
+
+            # Parse the data from each row, stopping at the first empty row.
+
+            data = []
+            for row in rows:
+                row = [row[j] if j < len(row) else None for j in cols]
+                if not any(row):
+                    break
+                data.append(row)
+
+        finally:
+            book.close()
+
+        # Convert the parsed data to a pandas data frame.  For "inheritable" 
+        # columns ('spacer', 'design', and 'ligand' by default), fill in 
+        # missing values from previous rows.  Then clean up the data frame a 
         # little bit and check for data entry errors.
 
-        df = pd.DataFrame(rows, columns=headers)
+        df = pd.DataFrame(data, columns=headers)
+
+        inherit = [x for x in headers if x in inheritable_cols]
+        df[inherit] = df[inherit].ffill()
 
         df['expt'] = str(path)
         df['date'] = pd.Timestamp(re.search('[0-9]{8}', str(path)).group(0))
@@ -106,6 +134,129 @@ def load_cleavage_data_from_xlsx(path, drop_rejects=True, inheritable_cols=INHER
     return df
     
 
+class CleavageDataCache:
+    """
+    A database of parsed spreadsheets, keyed by path.
+
+    A cached data frame is only used if the file it came from hasn't changed 
+    (judging first by its modification time and size, then by a hash of its 
+    contents) and if it was parsed by the same code with the same arguments.  
+    The parser is identified by the source code of the functions that read and 
+    clean up the spreadsheets, so editing `sanitize_data()` (for example) 
+    automatically invalidates every entry.
+
+    The data frames are stored as pickles in an SQLite database, so they come 
+    back with exactly the same dtypes as a fresh parse.
+    """
+
+    def __init__(self, db_path, **kw):
+        import sqlite3
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.db = sqlite3.connect(str(db_path))
+        self.db.execute('''\
+                CREATE TABLE IF NOT EXISTS gels (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL,
+                    size INTEGER,
+                    sha1 TEXT,
+                    parser TEXT,
+                    data BLOB
+                )''')
+        self.parser = self.parser_version(**kw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def default_path():
+        from .cache import default_cache_dir
+        return default_cache_dir('densiometry.sqlite')
+
+    @staticmethod
+    def parser_version(**kw):
+        import inspect, hashlib
+        funcs = [
+                load_cleavage_data_from_xlsx,
+                drop_rejected_data,
+                sanitize_data,
+                check_for_errors,
+        ]
+        sha1 = hashlib.sha1()
+        for func in funcs:
+            sha1.update(inspect.getsource(func).encode())
+        sha1.update(repr(sorted(kw.items())).encode())
+        sha1.update(pd.__version__.encode())
+        return sha1.hexdigest()
+
+    def get(self, path):
+        """
+        Return the cached data frame for the given path, or None if there is 
+        no up-to-date entry.
+        """
+        import pickle
+
+        row = self.db.execute(
+                'SELECT mtime, size, sha1, data FROM gels '
+                'WHERE path=? AND parser=?',
+                (self._key(path), self.parser),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        mtime, size, sha1, data = row
+        stat = path.stat()
+
+        if (mtime, size) != (stat.st_mtime, stat.st_size):
+            if sha1 != self._hash(path):
+                return None
+
+            # The file was touched but not changed, so remember the new 
+            # modification time to avoid hashing it again next time.
+            with self.db:
+                self.db.execute(
+                        'UPDATE gels SET mtime=?, size=? WHERE path=?',
+                        (stat.st_mtime, stat.st_size, self._key(path)),
+                )
+
+        # The same directory may be referred to by different relative paths, 
+        # so make sure the 'expt' column matches the path we were given.
+        df = pickle.loads(data)
+        df['expt'] = str(path)
+        return df
+
+    def put(self, path, df):
+        import pickle
+        stat = path.stat()
+        with self.db:
+            self.db.execute(
+                    'INSERT OR REPLACE INTO gels VALUES (?, ?, ?, ?, ?, ?)', (
+                        self._key(path),
+                        stat.st_mtime,
+                        stat.st_size,
+                        self._hash(path),
+                        self.parser,
+                        pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL),
+            ))
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def _key(path):
+        return str(Path(path).resolve())
+
+    @staticmethod
+    def _hash(path):
+        import hashlib
+        return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
 def natsort_spacers(df):
     from natsort import order_by_index, index_natsorted
     return df.reindex(
@@ -169,14 +320,14 @@ def check_for_errors(df, path):
         raise ValueError(msg)
 
     # Make sure none of the designs are misspelled.
-    from .usage import from_name
+    from .usage import validate_name
     unexpected_names = []
     for name in set(df.design):
         # I don't give the full name for zipper designs, so ignore those.
         if name[0] == 'z' or name[:2] == 'id':
             continue
-        try: from_name(name)
-        except (ValueError, IndexError): unexpected_names.append(name)
+        try: validate_name(name)
+        except ValueError: unexpected_names.append(name)
     if unexpected_names:
         msg = f"Found the following unexpected designs in '{path}': {', '.join(str(x) for x in sorted(unexpected_names))}"
         raise ValueError(msg)
@@ -190,83 +341,135 @@ def check_for_errors(df, path):
 
 
 def calc_percent_cut(df):
+    """
+    Calculate the fraction of DNA cut in each lane, from the intensities of 
+    the cut and uncut bands.
+
+    Each lane is identified by its spacer, design, experiment, and ligand 
+    concentration, and must have either the 500/350 bp bands (in which case 
+    the intensities are weighted by length) or the 4000/2000 bp bands.
+    """
     if 'percent_cut' in df: return df
-    return df.\
-            groupby(['spacer', 'design', 'expt', 'ligand']).\
-            apply(percent_cut)
-
-def percent_cut(group):
-    if set(group.band) == {500, 350}:
-        uncut_px = 500 * group[group.band == 500].pixels.iat[0]
-        cut_px = 350 * group[group.band == 350].pixels.iat[0]
-    elif set(group.band) == {4000, 2000}:
-        uncut_px = group[group.band == 4000].pixels.iat[0]
-        cut_px = group[group.band == 2000].pixels.iat[0]
-    else:
+
+    keys = ['spacer', 'design', 'expt', 'ligand']
+    df = df.dropna(subset=keys)
+
+    # Make sure every lane has one of the expected pairs of bands, and 
+    # nothing else.
+    bands = df.groupby(keys + ['band']).size().unstack('band', fill_value=0)
+    bands = bands.reindex(columns=bands.columns.union([4000, 2000, 500, 350]), fill_value=0) > 0
+    other = bands.drop(columns=[4000, 2000, 500, 350]).any(axis=1)
+    short = bands[500] & bands[350] & ~bands[4000] & ~bands[2000] & ~other
+    long = bands[4000] & bands[2000] & ~bands[500] & ~bands[350] & ~other
+
+    if not (short | long).all():
+        unexpected = (short | long)[lambda x: ~x].index[0]
+        group = df.set_index(keys).loc[[unexpected]].reset_index()
         raise ValueError(f'Unexpected bands:\n{group}')
 
-    return pd.Series({
+    # Use the first measurement of each band in each lane.
+    px = df.drop_duplicates(keys + ['band'])\
+            .set_index(keys + ['band']).pixels\
+            .unstack('band')\
+            .reindex(index=bands.index, columns=[4000, 2000, 500, 350])
+
+    uncut_px = np.where(short, 500 * px[500], px[4000])
+    cut_px = np.where(short, 350 * px[350], px[2000])
+
+    lanes = df.groupby(keys)
+    return pd.DataFrame({
         'percent_cut': cut_px / (uncut_px + cut_px),
-        'date': min(group.date),
-        'order': min(group.order),
-    })
+        'date': lanes.date.min(),
+        'order': lanes.order.min(),
+    }, index=bands.index)
 
 def calc_percent_change(df):
+    """
+    Calculate the difference in the fraction of DNA cut with and without 
+    ligand, for each spacer/design in each experiment.
+    """
     if 'percent_change' in df: return df
-    return calc_percent_cut(df).\
-            groupby(['spacer', 'design', 'expt']).\
-            apply(percent_change)
-
-def percent_change(group):
-    group = group.reset_index()  # MultiIndex confuses me...so just nuke it...
-    apo_percent = group[group.ligand == 0].percent_cut.iat[0]
-    holo_percent = group[group.ligand == 10000].percent_cut.iat[0]
-    return pd.Series({
+
+    keys = ['spacer', 'design', 'expt']
+    df = calc_percent_cut(df)
+    if any(df.index.names): df = df.reset_index()
+    df = df.dropna(subset=keys)
+
+    # Use the first apo and holo measurement from each experiment.
+    percent_cut = df[df.ligand.isin([0, 10000])]\
+            .drop_duplicates(keys + ['ligand'])\
+            .set_index(keys + ['ligand']).percent_cut\
+            .unstack('ligand')
+
+    expts = df.groupby(keys)
+    percent_cut = percent_cut.reindex(
+            index=expts.size().index,
+            columns=[0, 10000],
+    )
+
+    missing = percent_cut.isnull().any(axis=1)
+    if missing.any():
+        group = df.set_index(keys).loc[[missing[missing].index[0]]].reset_index()
+        raise ValueError(f'Missing apo or holo data:\n{group}')
+
+    apo_percent = percent_cut[0]
+    holo_percent = percent_cut[10000]
+
+    return pd.DataFrame({
         'apo_percent': apo_percent,
         'holo_percent': holo_percent,
         'percent_change': holo_percent - apo_percent,
-        'date': min(group.date),
-        'order': min(group.order),
+        'date': expts.date.min(),
+        'order': expts.order.min(),
     })
 
 def calc_mean_change(df):
+    """
+    Summarize the change in cleavage for each spacer/design over all the 
+    experiments it was tested in.
+    """
     if 'mean_change' in df: return df
-    return calc_percent_change(df).\
-            groupby(['spacer', 'design']).\
-            apply(mean_change).reset_index()
-
-def mean_change(group):
-    earliest = group.date.idxmin()
-
-    def most_extreme(x): #
-        a, b = min(x), max(x)
-        return a if abs(a) > abs(b) else b
-
-    def least_extreme(x): #
-        a, b = min(x), max(x)
-        return a if abs(a) < abs(b) else b
-
-    return pd.Series({
-        'earliest_date': group.date.loc[earliest],
-        'earliest_order': group.order.loc[earliest],
-
-        'mean_change': group.percent_change.mean(),
-        'min_change': least_extreme(group.percent_change),
-        'max_change': most_extreme(group.percent_change),
-        'std_change': group.percent_change.std(),
-
-        'mean_apo': group.apo_percent.mean(),
-        'min_apo': least_extreme(group.apo_percent),
-        'max_apo': most_extreme(group.apo_percent),
-        'std_apo': group.apo_percent.std(),
-
-        'mean_holo': group.holo_percent.mean(),
-        'min_holo': least_extreme(group.holo_percent),
-        'max_holo': most_extreme(group.holo_percent),
-        'std_holo': group.holo_percent.std(),
-        
-        'num_replicates': len(group),
-    })
+
+    keys = ['spacer', 'design']
+    df = calc_percent_change(df)
+    if any(df.index.names): df = df.reset_index()
+    df = df.dropna(subset=keys)
+
+    designs = df.groupby(keys)
+    earliest = df.sort_values('date', kind='mergesort')\
+            .drop_duplicates(keys)\
+            .set_index(keys)\
+            .reindex(designs.size().index)
+
+    def most_extreme(x):
+        a, b = designs[x].min(), designs[x].max()
+        return a.where(abs(a) > abs(b), b)
+
+    def least_extreme(x):
+        a, b = designs[x].min(), designs[x].max()
+        return a.where(abs(a) < abs(b), b)
+
+    return pd.DataFrame({
+        'earliest_date': earliest.date,
+        'earliest_order': earliest.order,
+
+        'mean_change': designs.percent_change.mean(),
+        'min_change': least_extreme('percent_change'),
+        'max_change': most_extreme('percent_change'),
+        'std_change': designs.percent_change.std(),
+
+        'mean_apo': designs.apo_percent.mean(),
+        'min_apo': least_extreme('apo_percent'),
+        'max_apo': most_extreme('apo_percent'),
+        'std_apo': designs.apo_percent.std(),
+
+        'mean_holo': designs.holo_percent.mean(),
+        'min_holo': least_extreme('holo_percent'),
+        'max_holo': most_extreme('holo_percent'),
+        'std_holo': designs.holo_percent.std(),
+
+        'num_replicates': designs.size(),
+    }).reset_index()
 
 
 @contextlib.contextmanager
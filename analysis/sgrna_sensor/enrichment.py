@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""\
+Compare the variant counts from different rounds of a library screen, e.g.
+before and after a sort, or between sorts done with and without ligand.
+
+The counts are expected in the form of the first data frame returned by
+`fastq.count_variants()`: one row per variant (indexed by the sequence of the
+variable region of the design) and one column per round.  Enrichments are log2
+ratios of each variant's frequency in two rounds, so they're normalized for
+the sequencing depth of each round.  Standard errors assume that the counts
+are Poisson distributed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .library import BASES, encode_dna
+from .fastq import VariableRegion
+
+LOGO_COLS = [
+        'position',
+        'base',
+        'count_reference',
+        'count_selected',
+        'log2_enrichment',
+        'std_err',
+]
+
+def calc_enrichment(counts, reference, selected, pseudocount=0.5):
+    """
+    Calculate how much each variant was enriched in the `selected` round
+    relative to the `reference` round (both column names in `counts`).
+
+    The result is a data frame with the same index as `counts` and these
+    columns:
+
+    'count_reference', 'count_selected': The raw counts.
+    'log2_enrichment': The log2 ratio of the variant's frequency in the
+        selected round to its frequency in the reference round.
+    'std_err': The standard error of the above, based on the counts.
+    'z': The enrichment divided by its standard error.  Variants with lots of
+        reads have large z-scores even if their enrichment is modest, so this
+        is a good way to rank hits.
+
+    The pseudocount is added to every count, so that variants that weren't
+    seen in one of the rounds still have finite enrichments.
+    """
+    df = pd.DataFrame(index=counts.index)
+    df['count_reference'] = counts[reference]
+    df['count_selected'] = counts[selected]
+    df['log2_enrichment'], df['std_err'] = log2_enrichment(
+            df['count_reference'].values,
+            df['count_selected'].values,
+            pseudocount,
+    )
+    df['z'] = df['log2_enrichment'] / df['std_err']
+    return df
+
+def calc_logo(counts, design, reference, selected, pseudocount=0.5):
+    """
+    Calculate how much each base at each degenerate position of the given
+    design was enriched in the `selected` round relative to the `reference`
+    round.  The design can be given either as a construct or as a name that
+    can be passed to `from_name()`.
+
+    The result is a tidy data frame with one row for each base at each
+    degenerate position (constant positions are left out), and these columns:
+
+    'position': The index of the position in the design.
+    'base': The base (A, C, G, or T).
+    'count_reference', 'count_selected': The number of reads with that base
+        at that position.
+    'log2_enrichment', 'std_err': As for `calc_enrichment()`.
+    """
+    region = VariableRegion(design)
+    start, library = region.start, region.library
+
+    if counts.empty:
+        return pd.DataFrame(columns=LOGO_COLS)
+
+    # Build a sparse one-hot matrix with a row for each variant and a column
+    # for each base at each degenerate position, so that counting the reads
+    # with each base at each position is just one matrix multiplication.
+    one_hot = _one_hot(counts.index, library)
+    weights = counts[[reference, selected]].values.astype(float)
+    base_counts = np.asarray(one_hot.T @ weights)
+
+    logo = pd.DataFrame({
+            'position': np.repeat(library.positions + start, 4),
+            'base': np.tile(list(BASES), len(library.positions)),
+            'count_reference': base_counts[:,0],
+            'count_selected': base_counts[:,1],
+    })
+
+    # Compare each base only to the other bases at the same position.  Bases
+    # that aren't allowed at a position (e.g. the Ts at an R position) don't
+    # get a pseudocount, so they don't affect the normalization.
+    n = len(library.positions)
+    allowed = library.digits >= 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lfc, err = log2_enrichment(
+                base_counts[:,0].reshape(n, 4),
+                base_counts[:,1].reshape(n, 4),
+                np.where(allowed, pseudocount, 0),
+        )
+
+    logo['log2_enrichment'] = lfc.reshape(-1)
+    logo['std_err'] = err.reshape(-1)
+
+    return logo[allowed.reshape(-1)].reset_index(drop=True)
+
+def log2_enrichment(reference, selected, pseudocount=0.5):
+    """
+    Return the log2 enrichment of the selected counts relative to the
+    reference counts, and its standard error.  If the counts are 2D arrays,
+    each row is normalized separately.
+    """
+    reference = np.asarray(reference, dtype=float) + pseudocount
+    selected = np.asarray(selected, dtype=float) + pseudocount
+
+    def log2_freq(x):
+        return np.log2(x) - np.log2(x.sum(axis=-1, keepdims=True))
+
+    lfc = log2_freq(selected) - log2_freq(reference)
+    err = np.sqrt(1 / selected + 1 / reference) / np.log(2)
+    return lfc, err
+
+def from_variant(design, variant):
+    """
+    Return the member of the given library design that has the given variable
+    region, e.g. a hit from `calc_enrichment()`.  The design can be given
+    either as a construct or as a name that can be passed to `from_name()`.
+    The returned construct is named after the design and the variant, e.g.
+    'rb/4/5[GGTCATACC…]'.
+    """
+    from .usage import from_name
+
+    construct = from_name(design) if isinstance(design, str) else design.copy()
+    region = VariableRegion(construct)
+    start, library = region.start, region.library
+
+    # Raises a ValueError if the variant isn't in the library.
+    library.rank(variant)
+
+    rna = 'U' in construct.seq.upper()
+    for i in library.positions:
+        base = variant[i]
+        construct[int(start + i)] = 'U' if rna and base == 'T' else base
+
+    construct.name = f'{construct.name}[{variant}]'
+    return construct
+
+
+def _one_hot(variants, library):
+    from scipy.sparse import csr_matrix
+
+    n = len(variants)
+    codes = encode_dna(''.join(variants)).reshape(n, -1)
+    codes = codes[:, library.positions]
+
+    cols = 4 * np.arange(len(library.positions)) + codes
+    rows = np.repeat(np.arange(n), len(library.positions))
+    data = np.ones(cols.size)
+
+    return csr_matrix(
+            (data, (rows, cols.reshape(-1))),
+            shape=(n, 4 * len(library.positions)),
+    )
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""\
+Count the library members in deep-sequencing reads of sorted populations.
+
+The randomized region of each read is found using the constant sequences that
+flank it in the design, e.g. ``from_name('rb/n')``.  Reads are streamed from
+(optionally gzipped) FASTQ files and processed in chunks, so memory use only
+depends on the number of distinct variants, not on the size of the files.
+"""
+
+import io
+import gzip
+import functools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections import Counter
+
+from .library import Library, encode_dna, decode_dna
+
+STATS_COLS = [
+        'reads',
+        'no_flanks',
+        'low_quality',
+        'not_in_library',
+        'counted',
+]
+
+class VariableRegion:
+    """
+    The part of a design that contains degenerate bases, and the constant
+    sequences on either side of it that can be used to find it in a read.
+    """
+
+    def __init__(self, design, flank_length=10):
+        from .usage import from_name
+
+        if isinstance(design, str):
+            design = from_name(design)
+
+        seq = design.dna.upper()
+        degenerate = [i for i, x in enumerate(seq) if x not in 'ACGTU']
+
+        if not degenerate:
+            raise ValueError(f"'{design.name}' doesn't have any degenerate positions.")
+
+        self.name = design.name
+        self.start = degenerate[0]
+        self.end = degenerate[-1] + 1
+        self.library = Library(seq[self.start:self.end])
+
+        # Use shorter flanks if the design doesn't have enough constant
+        # sequence on either side of the degenerate positions.
+        upstream = seq[max(self.start - flank_length, 0):self.start]
+        downstream = seq[self.end:self.end + flank_length]
+
+        if not upstream or not downstream:
+            raise ValueError(f"'{design.name}' doesn't have any constant bases on both sides of its degenerate positions.")
+        if seq.count(upstream) > 1:
+            raise ValueError(f"the bases upstream of the degenerate positions in '{design.name}' ({upstream}) aren't unique, use longer flanks.")
+
+        self.upstream = upstream.replace('U', 'T').encode('ascii')
+        self.downstream = downstream.replace('U', 'T').encode('ascii')
+
+    def __len__(self):
+        return self.end - self.start
+
+    def find(self, read):
+        """
+        Return the index of the variable region in the given read, or None if
+        the flanks can't be found.
+        """
+        # Short flanks can occur by chance elsewhere in the read, so try every
+        # occurrence of the upstream flank until the downstream flank matches.
+        i = read.find(self.upstream)
+        while i >= 0:
+            j = i + len(self.upstream) + len(self)
+            if read[j:j + len(self.downstream)] == self.downstream:
+                return i + len(self.upstream)
+            i = read.find(self.upstream, i + 1)
+
+        return None
+
+
+def count_variants(fastq_paths, design, min_quality=20, flank_length=10, workers=None):
+    """
+    Count the library members found in each of the given FASTQ files.
+
+    The design can be given either as a construct or as a name that can be
+    passed to `from_name()`.  The reads can come from either strand.  Reads
+    are discarded if the constant sequences flanking the variable region (up
+    to `flank_length` bases on each side) don't match exactly, if any of the
+    degenerate bases have a quality score below `min_quality`, or if the
+    variable region isn't a member of the library (e.g. because one of its
+    constant bases was misread).
+
+    Two data frames are returned.  The first has the counts, with one row for
+    each variant (indexed by the sequence of the variable region) and one
+    column for each file.  The second has one row for each file and the
+    columns in `STATS_COLS`, giving the number of reads discarded for each
+    reason.
+
+    The files are processed in parallel using `workers` processes (by
+    default, one for each CPU).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if isinstance(fastq_paths, (str, Path)):
+        fastq_paths = [fastq_paths]
+
+    region = VariableRegion(design, flank_length)
+    count_ = functools.partial(
+            count_variants_in_file,
+            region=region,
+            min_quality=min_quality,
+    )
+
+    if workers == 1 or len(fastq_paths) <= 1:
+        results = list(map(count_, fastq_paths))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(count_, fastq_paths))
+
+    # Convert the ranks back into sequences only once, for all the variants
+    # seen in any file.
+    labels = [str(x) for x in fastq_paths]
+    ranks = sorted(set().union(*(counter for counter, _ in results)))
+    index = pd.Index(
+            decode_dna(region.library.unrank(ranks)) if ranks else [],
+            name='variant',
+    )
+
+    counts = pd.DataFrame(
+            {
+                label: [counter.get(x, 0) for x in ranks]
+                for label, (counter, _) in zip(labels, results)
+            },
+            index=index,
+    )
+    stats = pd.DataFrame(
+            [stats for _, stats in results],
+            index=pd.Index(labels, name='path'),
+            columns=STATS_COLS,
+    )
+    return counts, stats
+
+def count_variants_in_file(fastq_path, region, min_quality=20, chunk_size=100000):
+    """
+    Count the library members found in one FASTQ file.  Return a counter
+    mapping the rank of each library member (see `Library.rank()`) to the
+    number of times it was seen, and a dictionary with the values described
+    by `STATS_COLS`.
+    """
+    counts = Counter()
+    stats = dict.fromkeys(STATS_COLS, 0)
+    seqs, quals = [], []
+
+    for seq, qual in iter_fastq(fastq_path):
+        stats['reads'] += 1
+
+        i = region.find(seq)
+        if i is None:
+            seq = seq.translate(_DNA_COMPLEMENTS)[::-1]
+            qual = qual[::-1]
+            i = region.find(seq)
+        if i is None:
+            stats['no_flanks'] += 1
+            continue
+
+        seqs.append(seq[i:i + len(region)])
+        quals.append(qual[i:i + len(region)])
+
+        if len(seqs) >= chunk_size:
+            count_chunk(region, seqs, quals, min_quality, counts, stats)
+            seqs, quals = [], []
+
+    count_chunk(region, seqs, quals, min_quality, counts, stats)
+    return counts, stats
+
+def count_chunk(region, seqs, quals, min_quality, counts, stats):
+    if not seqs:
+        return
+
+    library = region.library
+    codes = encode_dna(b''.join(seqs), strict=False).reshape(len(seqs), -1)
+    quals = np.frombuffer(b''.join(quals), dtype=np.uint8).reshape(len(seqs), -1)
+
+    # Quality scores are encoded as Phred+33.
+    ok = quals[:, library.positions].min(axis=1) >= min_quality + 33
+    stats['low_quality'] += int((~ok).sum())
+
+    codes = codes[ok]
+    known = (codes <= 3).all(axis=1)
+    ranks = library.rank_codes(codes[known])
+    ranks = ranks[ranks >= 0]
+    stats['not_in_library'] += len(codes) - len(ranks)
+    stats['counted'] += len(ranks)
+
+    unique_ranks, unique_counts = np.unique(ranks, return_counts=True)
+    counts.update(dict(zip(unique_ranks.tolist(), unique_counts.tolist())))
+
+def iter_fastq(fastq_path):
+    """
+    Yield the sequence and the quality string (both as bytes) of each read in
+    the given FASTQ file, which may be gzipped.
+    """
+    fastq_path = Path(fastq_path)
+    open_ = gzip.open if fastq_path.suffix == '.gz' else open
+
+    with open_(fastq_path, 'rb') as file:
+        # GzipFile.readline() is implemented in python, so buffer the
+        # decompressed data to read lines in C.
+        file = io.BufferedReader(file, buffer_size=2**20)
+
+        for header, seq, _, qual in zip(file, file, file, file):
+            seq, qual = seq.rstrip(), qual.rstrip()
+
+            if not header.startswith(b'@') or len(seq) != len(qual):
+                raise ValueError(f"'{fastq_path}' is not a valid FASTQ file.")
+
+            yield seq, qual
+
+
+_DNA_COMPLEMENTS = bytes.maketrans(b'ACGTNacgtn', b'TGCANtgcan')
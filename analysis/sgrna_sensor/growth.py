@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+"""\
+Fit growth curves to kinetic OD600 measurements from the Biotek plate reader.
+
+Each well is fit to either a logistic or a Gompertz model, using the
+reparameterization from Zwietering et al. (1990) so that the fit parameters
+are directly meaningful:
+
+    ln(OD) = ln(OD₀) + A·f(t; μ, λ, A)
+
+    logistic:  f = 1 / (1 + exp(4μ/A·(λ - t) + 2))
+    gompertz:  f = exp(-exp(μe/A·(λ - t) + 1))
+
+where μ is the maximum specific growth rate (1/min), λ is the lag time (min),
+and A is the log-fold increase from the initial OD to the carrying capacity.
+"""
+
+import functools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from .cache import default_cache_dir, file_fingerprint, key_path, load_pickle, save_pickle
+
+FIT_COLS = [
+        'num_points',
+        'od0',
+        'lag_min',
+        'max_growth_rate',
+        'doubling_time_min',
+        'carrying_capacity',
+        'rmse',
+]
+
+def logistic(t, log_od0, a, mu, lag):
+    with np.errstate(over='ignore'):
+        return log_od0 + a / (1 + np.exp(4 * mu / a * (lag - t) + 2))
+
+def gompertz(t, log_od0, a, mu, lag):
+    with np.errstate(over='ignore'):
+        return log_od0 + a * np.exp(-np.exp(mu * np.e / a * (lag - t) + 1))
+
+MODELS = {
+        'logistic': logistic,
+        'gompertz': gompertz,
+}
+
+def fit_growth_curves(xlsx_paths, model='gompertz', wavelength=600, blank=None, workers=None, cache=True):
+    """
+    Fit a growth curve to every well in the given plate reader files, and
+    return the fits as a data frame with one row per well.
+
+    The columns are:
+
+    'plate': The path to the plate reader file.
+    'well': The name of the well, e.g. 'A1'.
+    'model': The name of the model that was fit.
+    'num_points': The number of timepoints used in the fit.
+    'od0': The initial OD.
+    'lag_min': The lag time, in minutes.
+    'max_growth_rate': The maximum specific growth rate, in 1/min.
+    'doubling_time_min': The doubling time at the maximum growth rate.
+    'carrying_capacity': The OD at saturation.
+    'rmse': The RMS error of the fit, in units of ln(OD).
+
+    If `blank` is the name of a well, the median OD of that well is subtracted
+    from every other well before fitting.  Timepoints with no OD or an OD
+    that isn't positive are ignored.  Wells that can't be fit get NaN, and so
+    do the growth parameters of wells that don't grow (see `fit_well()`).
+
+    The wells are fit in parallel using `workers` processes (by default, one
+    for each CPU).  The fits for each file are cached (kept in
+    ``~/.cache/sgrna_sensor/growth`` by default; pass a directory to use a
+    different location, or ``cache=False`` to disable caching), and are only
+    reused if neither the file, the fit settings, nor this module have
+    changed.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if isinstance(xlsx_paths, (str, Path)):
+        xlsx_paths = [xlsx_paths]
+    if model not in MODELS:
+        raise ValueError(f"unknown growth model '{model}', expected one of: {', '.join(MODELS)}")
+    if cache is True:
+        cache = default_cache_dir('growth')
+
+    settings = dict(model=model, wavelength=wavelength, blank=blank)
+    fits = {}
+    curves = {}
+
+    for path in xlsx_paths:
+        path = Path(path).resolve()
+        if cache:
+            fits[path] = load_pickle(
+                    cache_path(cache, path, settings),
+                    fingerprint(path, settings),
+            )
+        if fits.get(path) is None:
+            curves[path] = load_growth_curves(path, wavelength, blank)
+
+    # Pool the wells from every plate that needs to be fit, so that the work
+    # is spread evenly between the workers.
+    tasks = [
+            (t, od)
+            for df in curves.values()
+            for _, t, od in iter_wells(df)
+    ]
+    fit_well_ = functools.partial(fit_well, model=model)
+
+    if workers == 1 or len(tasks) <= 1:
+        results = list(map(fit_well_, tasks))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(fit_well_, tasks, chunksize=8))
+
+    i = 0
+    for path, df in curves.items():
+        wells = [well for well, _, _ in iter_wells(df)]
+        fits[path] = pd.DataFrame(
+                results[i:i+len(wells)],
+                index=pd.Index(wells, name='well'),
+                columns=FIT_COLS,
+        ).reset_index()
+        fits[path].insert(0, 'plate', str(path))
+        fits[path].insert(2, 'model', model)
+        i += len(wells)
+
+        if cache:
+            save_pickle(
+                    cache_path(cache, path, settings),
+                    fingerprint(path, settings),
+                    fits[path],
+            )
+
+    return pd.concat(fits.values(), ignore_index=True)
+
+def load_growth_curves(xlsx_path, wavelength=600, blank=None):
+    """
+    Load the kinetic OD measurements from the given plate reader file, as a
+    data frame with 'well', 'minutes', and 'od' columns.
+    """
+    from .plate_reader import BiotekExperiment
+
+    data = BiotekExperiment(str(xlsx_path))
+    try:
+        kinetic = data.kinetic[wavelength]
+    except KeyError:
+        raise ValueError(f"no kinetic {wavelength} nm reads in '{xlsx_path}'") from None
+
+    df = kinetic[['well', 'minutes']].copy()
+    df['od'] = pd.to_numeric(kinetic['read'], errors='coerce')
+
+    if blank is not None:
+        blank_od = df.loc[df['well'] == blank, 'od']
+        if blank_od.empty:
+            raise ValueError(f"no data for blank well '{blank}' in '{xlsx_path}'")
+        df = df[df['well'] != blank]
+        df['od'] -= blank_od.median()
+
+    return df.reset_index(drop=True)
+
+def iter_wells(df):
+    for well, group in df.groupby('well', sort=False):
+        yield well, group['minutes'].values, group['od'].values
+
+def fit_well(task, model='gompertz'):
+    """
+    Fit the given model to one growth curve, and return a tuple of the
+    values described by `FIT_COLS`.
+
+    Any curve, even a flat one, can be fit by a small enough step hidden in
+    the noise.  So if the fitted curve doesn't rise clearly above the noise
+    (i.e. the RMS error of the fit) between the first and last timepoints, or
+    if the growth rate ends up on its bound, the well is taken not to have
+    grown: the number of points and the RMS error are still reported, but
+    the other values are NaN.
+    """
+    from scipy.optimize import curve_fit
+
+    t, od = task
+    t = np.asarray(t, dtype=float)
+    od = np.asarray(od, dtype=float)
+
+    ok = np.isfinite(t) & np.isfinite(od) & (od > 0)
+    t, y = t[ok], np.log(od[ok])
+    n = len(t)
+    failed = (n,) + (np.nan,) * (len(FIT_COLS) - 1)
+
+    if n < 5:
+        return failed
+
+    # Keep the parameters within a few multiples of what was actually
+    # observed, otherwise curves that never saturate can wander off towards
+    # infinite carrying capacities.
+    f = MODELS[model]
+    p0 = guess_params(t, y)
+    y_span = y.max() - y.min() + 1
+    t_span = t.max() - t.min()
+    bounds = [
+            (y.min() - y_span, 1e-6,       1e-9, t.min() - t_span),
+            (y.max() + y_span, 3 * y_span, np.inf, t.max() + t_span),
+    ]
+    p0 = np.clip(p0, *bounds)
+
+    try:
+        params, _ = curve_fit(f, t, y, p0=p0, bounds=bounds, maxfev=10000)
+    except (RuntimeError, ValueError):
+        return failed
+
+    log_od0, a, mu, lag = params
+    rmse = np.sqrt(np.mean((f(t, *params) - y)**2))
+
+    rise = f(t.max(), *params) - f(t.min(), *params)
+    mu_min, mu_max = bounds[0][2], bounds[1][2]
+
+    if rise < 3 * rmse or np.isclose(mu, mu_min, rtol=1e-3) or mu >= mu_max:
+        return (n,) + (np.nan,) * (len(FIT_COLS) - 2) + (rmse,)
+
+    return (
+            n,
+            np.exp(log_od0),
+            lag,
+            mu,
+            np.log(2) / mu,
+            np.exp(log_od0 + a),
+            rmse,
+    )
+
+def guess_params(t, y):
+    """
+    Make an initial guess for the fit parameters from the steepest part of
+    the (smoothed) log-OD curve.  Only the middle of the curve is searched, so
+    that noise at either end (where the slope should be near zero anyway)
+    can't be mistaken for growth.
+    """
+    order = np.argsort(t)
+    t, y = t[order], y[order]
+
+    k = max(3, len(y) // 15)
+    pad = k // 2
+    smooth = np.convolve(np.pad(y, pad, mode='edge'), np.ones(k) / k, mode='valid')[:len(y)]
+    slopes = np.gradient(smooth, t)
+
+    log_od0, log_od_max = smooth.min(), smooth.max()
+    a = max(log_od_max - log_od0, 1e-3)
+    middle = (smooth > log_od0 + 0.1 * a) & (smooth < log_od0 + 0.9 * a)
+    i = np.argmax(np.where(middle, slopes, -np.inf)) if middle.any() else np.argmax(slopes)
+
+    mu = max(slopes[i], 1e-6)
+    lag = np.clip(t[i] - (smooth[i] - log_od0) / mu, t[0], t[-1])
+
+    return log_od0, a, mu, lag
+
+def calc_od(fit, t):
+    """
+    Evaluate the fitted growth curve (i.e. one row of the data frame returned
+    by `fit_growth_curves()`) at the given times.
+    """
+    log_od0 = np.log(fit['od0'])
+    a = np.log(fit['carrying_capacity']) - log_od0
+    f = MODELS[fit['model']]
+    return np.exp(f(np.asarray(t, dtype=float), log_od0, a, fit['max_growth_rate'], fit['lag_min']))
+
+
+def fingerprint(xlsx_path, settings):
+    return file_fingerprint(xlsx_path, __file__, extra=sorted(settings.items()))
+
+def cache_path(cache_dir, xlsx_path, settings):
+    key = f'{xlsx_path}:{settings["model"]}:{settings["wavelength"]}:{settings["blank"]}'
+    return key_path(cache_dir, key)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""\
+Enumerate, index, and sample the members of degenerate libraries, i.e.
+constructs with IUPAC codes like N, R, or Y in their sequences.
+
+Library members are ordered like the digits of a number: the last degenerate
+position varies fastest, and each position runs through its possible bases in
+the order A, C, G, T.  Bases are represented by 2-bit codes (A=0, C=1, G=2,
+T=3), which can be packed four to a byte to keep large libraries compact.
+"""
+
+import operator
+import numpy as np
+
+BASES = 'ACGT'
+
+IUPAC_BASES = {
+        'A': 'A',
+        'C': 'C',
+        'G': 'G',
+        'T': 'T',
+        'U': 'T',
+        'R': 'AG',
+        'Y': 'CT',
+        'M': 'AC',
+        'K': 'GT',
+        'S': 'CG',
+        'W': 'AT',
+        'H': 'ACT',
+        'B': 'CGT',
+        'V': 'ACG',
+        'D': 'AGT',
+        'N': 'ACGT',
+}
+
+class Library:
+    """
+    All the sequences that can be made from a construct (or a plain sequence)
+    with degenerate bases.
+
+    The library supports ``len()``, indexing by rank (which returns the
+    member as a DNA string), and ``in``.  The `rank()`, `sample()`, and
+    `iter_chunks()` methods cover the rest.  None of these methods ever build
+    more than one chunk of the library at a time, so even libraries with
+    billions of members can be handled.  (Python can't take the ``len()`` of
+    libraries with more than 2⁶³ members, but `size` always works.)
+    """
+
+    def __init__(self, sequence):
+        sequence = getattr(sequence, 'dna', sequence).upper()
+
+        try:
+            alphabets = [IUPAC_BASES[x] for x in sequence]
+        except KeyError as err:
+            raise ValueError(f"'{err.args[0]}' is not an IUPAC nucleotide code.") from None
+
+        self.sequence = sequence
+        self.template = encode_dna(''.join(x[0] for x in alphabets))
+
+        # The positions that can vary, the number of bases possible at each,
+        # and the codes of those bases.
+        self.positions = np.array(
+                [i for i, x in enumerate(alphabets) if len(x) > 1],
+                dtype=int,
+        )
+        self.radices = [len(alphabets[i]) for i in self.positions]
+        self.choices = [encode_dna(alphabets[i]) for i in self.positions]
+
+        # The rank contributed by each base at each variable position, or -1
+        # if that base isn't allowed there.
+        self.place_values = []
+        place_value = 1
+        for radix in reversed(self.radices):
+            self.place_values.insert(0, place_value)
+            place_value *= radix
+        self.size = place_value
+
+        self.digits = np.full((len(self.positions), 4), -1, dtype=int)
+        for i, choices in enumerate(self.choices):
+            self.digits[i, choices] = np.arange(len(choices))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.sequence!r})'
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, rank):
+        # Check the range before `unrank()` converts the rank to a numpy
+        # integer, which would overflow for ranks beyond 64 bits.
+        rank = operator.index(rank)
+        if not -self.size <= rank < self.size:
+            raise IndexError(f"library index out of range (the library has {self.size} members)")
+
+        return decode_dna(self.unrank([rank]))[0]
+
+    def __contains__(self, sequence):
+        try:
+            self.rank(sequence)
+            return True
+        except ValueError:
+            return False
+
+    def __iter__(self):
+        for chunk in self.iter_chunks(packed=False):
+            yield from decode_dna(chunk)
+
+    @property
+    def num_degenerate_positions(self):
+        return len(self.positions)
+
+    def rank(self, sequence):
+        """
+        Return the index of the given sequence in this library.  A ValueError
+        is raised if the sequence isn't a member of the library.
+        """
+        codes = encode_dna(sequence)
+        if codes.shape != self.template.shape:
+            raise ValueError(f"'{sequence}' is {len(codes)} nt long, but the library members are {len(self.template)} nt long.")
+
+        rank = self.rank_codes(codes[np.newaxis])[0]
+        if rank < 0:
+            raise ValueError(f"'{sequence}' is not in the library.")
+
+        return int(rank)
+
+    def rank_codes(self, codes):
+        """
+        Return the index of each of the given sequences (a 2D array of 2-bit
+        codes, one sequence per row, as returned by `unrank()`).  Sequences
+        that aren't in the library get a rank of -1.
+        """
+        codes = np.asarray(codes)
+        ranks = np.zeros(len(codes), dtype=self._rank_dtype)
+        ok = np.ones(len(codes), dtype=bool)
+
+        fixed = np.ones(len(self.template), dtype=bool)
+        fixed[self.positions] = False
+        ok &= (codes[:, fixed] == self.template[fixed]).all(axis=1)
+
+        for i, position in enumerate(self.positions):
+            digits = self.digits[i, codes[:, position]]
+            ok &= digits >= 0
+            ranks += digits.astype(ranks.dtype) * self.place_values[i]
+
+        ranks[~ok] = -1
+        return ranks
+
+    def unrank(self, ranks):
+        """
+        Return the library members with the given indices, as a 2D array of
+        2-bit codes (one sequence per row).
+        """
+        ranks = np.array(ranks, dtype=self._rank_dtype).reshape(-1)
+        ranks[ranks < 0] += self.size
+
+        if ((ranks < 0) | (ranks >= self.size)).any():
+            raise IndexError(f"library index out of range (the library has {self.size} members)")
+
+        codes = np.tile(self.template, (len(ranks), 1))
+
+        for i in reversed(range(len(self.positions))):
+            ranks, digits = ranks // self.radices[i], ranks % self.radices[i]
+            codes[:, self.positions[i]] = self.choices[i][digits.astype(int)]
+
+        return codes
+
+    def sample(self, n, seed=None, packed=False):
+        """
+        Pick `n` members of the library uniformly at random (with replacement),
+        and return them as a 2D array of 2-bit codes (one sequence per row).
+        If `packed` is true, the codes are packed four to a byte (see
+        `pack_2bit()`).
+        """
+        rng = np.random.default_rng(seed)
+        codes = np.tile(self.template, (n, 1))
+
+        # Each position is independent, so picking each one uniformly picks
+        # the whole sequence uniformly.
+        for i, choices in enumerate(self.choices):
+            codes[:, self.positions[i]] = rng.choice(choices, size=n)
+
+        return pack_2bit(codes) if packed else codes
+
+    def iter_chunks(self, chunk_size=2**16, start=0, stop=None, packed=True):
+        """
+        Yield the members of the library in order, `chunk_size` at a time.  By
+        default every member is yielded, but `start` and `stop` can be given
+        (like a slice) to yield only some of them.  Each chunk is a 2D array
+        of 2-bit codes, packed four to a byte unless `packed` is false.
+        """
+        start, stop, _ = slice(start, stop).indices(self.size)
+
+        for i in range(start, stop, chunk_size):
+            j = min(i + chunk_size, stop)
+            ranks = np.arange(j - i, dtype=self._rank_dtype) + i
+            codes = self.unrank(ranks)
+            yield pack_2bit(codes) if packed else codes
+
+    @property
+    def _rank_dtype(self):
+        # Fall back on python integers for libraries too big to index with
+        # 64-bit integers.
+        return np.int64 if self.size < 2**63 else object
+
+
+def encode_dna(sequence, strict=True):
+    """
+    Convert the given DNA (or RNA) sequence to an array of 2-bit codes.  The
+    sequence can be either a string or bytes.  Bases other than A, C, G, T,
+    and U raise a ValueError, unless `strict` is false, in which case they
+    get a code of 255.
+    """
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii')
+
+    codes = _CODES_FROM_ASCII[np.frombuffer(sequence, dtype=np.uint8)]
+    if strict and (codes > 3).any():
+        raise ValueError(f"'{sequence.decode('ascii')}' contains bases other than A, C, G, T, and U.")
+    return codes
+
+def decode_dna(codes):
+    """
+    Convert a 2D array of 2-bit codes (one sequence per row) into a list of
+    DNA strings.
+    """
+    codes = np.atleast_2d(codes)
+    ascii = np.frombuffer(BASES.encode('ascii'), dtype=np.uint8)[codes]
+    return [x.tobytes().decode('ascii') for x in ascii]
+
+def pack_2bit(codes):
+    """
+    Pack a 2D array of 2-bit codes (one sequence per row) four to a byte.  The
+    first base of each group of four goes in the most significant bits, and
+    the last byte is padded with A (0) if necessary.  Use `unpack_2bit()` to
+    get the original codes back.
+    """
+    codes = np.atleast_2d(codes).astype(np.uint8)
+    n, length = codes.shape
+    padded = np.zeros((n, -(-length // 4) * 4), dtype=np.uint8)
+    padded[:, :length] = codes
+    padded = padded.reshape(n, -1, 4)
+    return (padded[..., 0] << 6) | (padded[..., 1] << 4) | (padded[..., 2] << 2) | padded[..., 3]
+
+def unpack_2bit(packed, length):
+    """
+    Unpack the 2-bit codes packed by `pack_2bit()`.  The length of the
+    sequences must be given, because it can't be inferred from the padding.
+    """
+    packed = np.atleast_2d(packed)
+    shifts = np.array([6, 4, 2, 0], dtype=np.uint8)
+    codes = (packed[..., np.newaxis] >> shifts) & 0b11
+    return codes.reshape(len(packed), -1)[:, :length]
+
+
+_CODES_FROM_ASCII = np.full(256, 255, dtype=np.uint8)
+for _i, _base in enumerate(BASES):
+    _CODES_FROM_ASCII[ord(_base)] = _i
+    _CODES_FROM_ASCII[ord(_base.lower())] = _i
+_CODES_FROM_ASCII[ord('U')] = _CODES_FROM_ASCII[ord('u')] = BASES.index('T')
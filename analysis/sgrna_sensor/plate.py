@@ -17,7 +17,14 @@
 #
 # - Tiling?
 
-def recursive_merge(config, defaults, overwrite=False):
+import copy
+import string
+import functools
+import itertools
+import pandas as pd
+from pathlib import Path
+
+def recursive_merge(layout, defaults, overwrite=False):
     for key, default in defaults.items():
         if isinstance(default, dict):
             layout.setdefault(key, {})
@@ -60,50 +67,7 @@ def load_plate(toml_path):
     take precedence.
 
     """
-    import toml
-    import itertools
-    from pathlib import Path
-
-    def recursive_merge(layout, defaults, overwrite=False):
-        for key, default in defaults.items():
-            if isinstance(default, dict):
-                layout.setdefault(key, {})
-                recursive_merge(layout[key], default)
-            else:
-                if overwrite or key not in layout:
-                    layout[key] = default
-
-    def do_load_paths(toml_path, expected_ext='.xlsx'):
-        toml_path = Path(toml_path).resolve()
-        layout = toml.load(str(toml_path))
-
-        # Resolve the path(s) to actual data.
-        if 'path' in layout and 'paths' in layout:
-            raise ValueError(f"{toml_path} specifies both 'path' and 'paths'")
-
-        elif 'path' in layout:
-            path = toml_path.parent / layout['path']
-            layout['paths'] = {'default': path}
-
-        elif 'paths' in layout:
-            layout['paths'] = {
-                    toml_path.parent / x
-                    for x in layout['paths']
-            }
-        else:
-            default_path = toml_path.with_suffix(expected_ext)
-            if default_path.exists():
-                layout['paths'] = {'default': default_path}
-
-        # Include a remote file if one is specified.  
-        if 'template' in layout:
-            layout['template'] = toml_path.parent / layout['template']
-            template = do_load_paths(layout['template'])
-            recursive_merge(layout, template)
-
-        return layout
-
-    layout = do_load_paths(toml_path)
+    layout = load_layout(toml_path)
 
     # Apply any row or column defaults.
     if 'well' not in layout:
@@ -127,60 +91,149 @@ def load_plate(toml_path):
     for well in layout.get('well', {}):
         recursive_merge(layout['well'][well], layout['plate'])
 
-    # If the experiment has any notes, print them out.
-    if 'notes' in layout:
-        print(toml_path)
-        print(layout['notes'].strip())
-        print()
+    print_notes(toml_path, layout)
+    return layout
+
+def load_plate_df(toml_path):
+    """\
+    Parse a TOML-formatted plate layout (see `load_plate()`) into a data frame 
+    with one row for each well.  See `compile_layout()` for a description of 
+    the data frame.
+    """
+    layout = load_layout(toml_path)
+    print_notes(toml_path, layout)
+    return compile_layout(layout)
+
+def load_layout(toml_path, expected_ext='.xlsx'):
+    """\
+    Parse the given TOML file, merge in any templates it refers to, and work 
+    out where the data files are.  The wells themselves aren't filled in.
+
+    Each TOML file is only parsed once per session (or again if it's modified 
+    on disk), which saves a lot of time when many plates share the same 
+    templates.
+    """
+    toml_path = Path(toml_path).resolve()
+    layout = load_toml(toml_path)
+
+    # Resolve the path(s) to actual data.
+    if 'path' in layout and 'paths' in layout:
+        raise ValueError(f"{toml_path} specifies both 'path' and 'paths'")
+
+    elif 'path' in layout:
+        path = toml_path.parent / layout['path']
+        layout['paths'] = {'default': path}
+
+    elif 'paths' in layout:
+        layout['paths'] = {
+                toml_path.parent / x
+                for x in layout['paths']
+        }
+    else:
+        default_path = toml_path.with_suffix(expected_ext)
+        if default_path.exists():
+            layout['paths'] = {'default': default_path}
+
+    # Include a remote file if one is specified.  
+    if 'template' in layout:
+        layout['template'] = toml_path.parent / layout['template']
+        template = load_layout(layout['template'])
+        recursive_merge(layout, template)
 
     return layout
 
-def rows_cols_from_dict(config, label=None):
-    # Create wells dictionary from dictionary.  The following keys are used to 
-    # fill out wells:
-    #
-    # [row]
-    # [irow]
-    # [col]
-    # [icol]
-    # [well]
+def load_toml(toml_path):
+    """\
+    Return the contents of the given TOML file, parsing it only if it hasn't 
+    been parsed before or if it's been modified since.  The caller gets its 
+    own copy of the contents, so it's free to modify them.
+    """
+    toml_path = Path(toml_path).resolve()
+    mtime = toml_path.stat().st_mtime
+    return copy.deepcopy(_parse_toml(toml_path, mtime))
 
+@functools.lru_cache(maxsize=128)
+def _parse_toml(toml_path, mtime):
+    import toml
+    return toml.load(str(toml_path))
+
+def compile_layout(layout):
+    """\
+    Resolve the [well], [row], [col], and [plate] blocks of the given layout 
+    into a data frame with one row for each well.
+
+    The data frame is indexed by well name (e.g. 'A1') and has 'row', 'col', 
+    'row_0', and 'col_0' columns giving the position of each well, followed by 
+    one column for each setting.  Nested settings are flattened into dotted 
+    column names (e.g. [plate.ligand] name = 'theo' becomes 'ligand.name').  
+    Settings that aren't specified for a well are NaN.  Because the index is 
+    the well name, the data frame can be joined directly onto plate reader 
+    data, e.g. `reads.join(wells, on='well')`.
+
+    The precedence rules are the same as for `load_plate()`, but they are 
+    applied a whole column at a time instead of one well at a time.
+    """
     wells = layout.get('well', {})
-    meta = layout.get('meta', {})
     rows = layout.get('row', {})
-    irows = layout.get('irow', {})
     cols = layout.get('col', {})
-    icols = layout.get('icol', {})
-
-    # Fill in everything from the template.
-    if 'defaults' in meta:
-        config = 
+    plate = layout.get('plate', {})
 
-    # Create new wells implied by the 'row' and 'col' blocks.
+    # Find every well that's mentioned, either explicitly or implicitly via 
+    # the 'row' and 'col' blocks.
+    names = dict.fromkeys(wells)
     for row, col in itertools.product(rows, cols):
-        key = well_from_row_col(row, col)
-        wells.setdefault(key, {})
-
-    for irow, col in itertools.product(irows, cols):
-        key = well_from_irow_col(irow, col)
-        wells.setdefault(key, {})
-
-    if row, icol in itertools.product(rows, icols):
-        key = well_from_row_icol(row, icol)
-        wells.setdefault(key, {})
-    
-    # Update any existing wells.
-    for key in wells:
-        row, col = row_col_from_well(well)
-        irow, icol = irow_icol_from_well(well)
-
-        recursive_merge(wells[key], rows.get(row, {}))
-        recursive_merge(wells[key], cols.get(col, {}))
-        recursive_merge(wells[key], irows.get(irow, {}))
-        recursive_merge(wells[key], icols.get(icol, {}))
+        names.setdefault(well_from_row_col(row, col))
+
+    index = pd.Index(list(names), name='well', dtype=object)
+    df = pd.DataFrame({
+            'row': index.str[:1],
+            'col': index.str[1:],
+    }, index=index)
+    df['row_0'] = df.row.map(int_from_row)
+    df['col_0'] = df.col.map(int_from_col)
+    df = df.sort_values(['row_0', 'col_0'])
+
+    # Look up the settings for each well from each block, then let the more 
+    # specific blocks take precedence over the less specific ones.  The 
+    # tables are built one column at a time and kept as objects until the 
+    # end, so that integer settings don't become floats just because some 
+    # wells (or blocks) are missing them.
+    def settings_table(blocks, keys):
+        flat = {k: flatten_dict(v) for k, v in blocks.items()}
+        columns = dict.fromkeys(x for settings in flat.values() for x in settings)
+        table = pd.DataFrame({
+                col: pd.Series(
+                    {k: v[col] for k, v in flat.items() if col in v},
+                    dtype=object,
+                )
+                for col in columns
+        }, index=list(flat), dtype=object)
+        return table.reindex(keys.values).set_axis(df.index, axis='index')
+
+    settings = settings_table(wells, df.index.to_series())
+    settings = settings.combine_first(settings_table(rows, df.row))
+    settings = settings.combine_first(settings_table(cols, df.col))
+    settings = settings.combine_first(pd.DataFrame(
+            [flatten_dict(plate)] * len(df), index=df.index, dtype=object))
+
+    return df.join(settings.infer_objects())
+
+def flatten_dict(config, label=None):
+    flat = {}
+    for key, value in config.items():
+        key = dotted_label(label, key)
+        if isinstance(value, dict):
+            flat.update(flatten_dict(value, key))
+        else:
+            flat[key] = value
+    return flat
 
-    
-    
+def print_notes(toml_path, layout):
+    # If the experiment has any notes, print them out.
+    if 'notes' in layout:
+        print(toml_path)
+        print(layout['notes'].strip())
+        print()
 
 def well_from_row_col(row, col):
     return f'{row}{col}'
@@ -255,7 +308,7 @@ def irow_icol_from_well(well):
 def index_from_well(well):
     row, col = well[:1], well[1:]
     return dict(
-            well=key,
+            well=well,
             row=row,
             col=col,
             row_0=int_from_row(row),
@@ -41,8 +41,8 @@ class BiotekExperiment:
         }
 
         def parse_row(self, row):
-            key = row[0].value
-            value = row[1].value
+            key = row[0]
+            value = row[1]
 
             if key in self.header_keys:
                 attr = nonstdlib.slugify(key)
@@ -51,8 +51,8 @@ class BiotekExperiment:
     class ReadParser(Parser):
 
         def parse_row(self, row):
-            indent = row[0].value
-            key = row[1].value
+            indent = row[0]
+            key = row[1]
             read_pattern = re.compile('(?:(?:Blank )?Read \d:)?(\d+)')
 
             if indent is not None:
@@ -60,53 +60,83 @@ class BiotekExperiment:
             if key is None:
                 return
             if key == 'Well':
-                self.wells = [x.value for x in row[2:] if x.value]
+                self.wells = [x for x in row[2:] if x]
                 return
             
             read_match = read_pattern.match(str(key))
             if read_match:
                 wavelength = int(read_match.group(1))
                 reads = {
-                        k: x.value
+                        k: x
                         for k,x in zip(self.wells, row[2:])
-                        if x.value and x.value != '?????'
+                        if x and x != '?????'
                 }
                 self.expt.reads[wavelength] = reads
 
     class KineticParser(Parser):
+        # Each row of a kinetic block has the time, the temperature, and then 
+        # one read for every well.  Rather than making a record for every 
+        # read, keep the rows as they are and reshape them into columns all at 
+        # once when the block is finished.
+
+        def __init__(self, expt):
+            super().__init__(expt)
+            self.header = []
+            self.minutes = []
+            self.temperatures = []
+            self.reads = []
 
         def parse_row(self, row):
-            title = row[0].value
-            key = row[1].value
+            title = row[0]
+            key = row[1]
 
             if title is not None:
                 self.wavelength = int(title.split(':')[-1])
-                self.kinetic = []
                 self.prev_minutes = 0
 
             if key == 'Time':
-                self.header = ['minutes'] + [x.value for x in row[2:]]
+                # Ignore any empty columns past the last well.  How many there 
+                # are depends on how wide the rest of the worksheet is.
+                header = list(row[2:])
+                while header and header[-1] is None:
+                    header.pop()
+                self.header = ['minutes'] + header
 
             elif key is not None:
-                for i, cell in enumerate(row[3:], 2):
-                    # Update the minutes accounting for the fact that openpyxl 
-                    # wraps hours after 1 day.  Fucking stupid library.
-                    minutes = 60 * key.hour + key.minute
-                    while self.prev_minutes > minutes:
-                        minutes += 60 * 24
-                    self.prev_minutes = minutes
-
-                    entry = {
-                            'well': self.header[i],
-                            'temperature': row[2].value,
-                            'minutes': minutes,
-                            'wavelength': self.wavelength,
-                            'read': cell.value,
-                    }
-                    self.kinetic.append(entry)
+                # Update the minutes accounting for the fact that openpyxl 
+                # wraps hours after 1 day.  Fucking stupid library.
+                minutes = 60 * key.hour + key.minute
+                while self.prev_minutes > minutes:
+                    minutes += 60 * 24
+                self.prev_minutes = minutes
+
+                self.minutes.append(minutes)
+                self.temperatures.append(row[2])
+                self.reads.append(row[3:])
 
         def finish(self):
-            df = pd.DataFrame(self.kinetic)
+            wells = self.header[2:]
+            num_times = len(self.reads)
+            num_wells = len(wells)
+
+            # All the rows in a worksheet have the same width, so the reads 
+            # fill a (times × wells) array.  Pad just in case they don't.
+            reads = np.full((num_times, num_wells), None, dtype=object)
+            for i, row in enumerate(self.reads):
+                reads[i, :len(row)] = row[:num_wells]
+
+            def column(values):
+                # Let pandas infer the dtype of each column, exactly as it 
+                # would have if the data frame were built row by row.
+                return pd.Series(values).infer_objects()
+
+            df = pd.DataFrame({
+                    'well': column(wells * num_times),
+                    'temperature': column(np.repeat(self.temperatures, num_wells)),
+                    'minutes': column(np.repeat(self.minutes, num_wells)),
+                    'wavelength': self.wavelength,
+                    'read': column(reads.ravel()),
+            })
             df[df == '?????'] = np.nan
             #df = df.dropna(axis='columns', how='all')
             self.expt.kinetic[self.wavelength] = df
@@ -115,14 +145,16 @@ class BiotekExperiment:
         self.reads = {}
         self.kinetic = {}
 
-        wb = load_workbook(path)
+        # Stream the values from the worksheet, rather than loading every 
+        # cell into memory.
+        wb = load_workbook(path, read_only=True)
         ws = wb.active
         parser = self.HeaderParser(self)
         kinetic_pattern = re.compile('^.*:\d+')
 
-        for row in ws.rows:
-            key = row[0].value
-            subkey = row[1].value
+        for row in ws.iter_rows(values_only=True):
+            row = row + (None,) * (3 - len(row))
+            key = row[0]
 
             if key == 'Results':
                 parser.finish()
@@ -135,6 +167,7 @@ class BiotekExperiment:
             parser.parse_row(row)
 
         parser.finish()
+        wb.close()
 
     def __str__(self):
         from pprint import pformat
@@ -161,38 +194,49 @@ class PerkinElmerExperiment:
         def min_from_days(days):
             return days * 24 * 60
 
-        wb = load_workbook(path)
+        wb = load_workbook(path, read_only=True)
         ws = find_list_sheet(wb)
-
-        # The time column is in units of days (?).
-        col_titles = []
-        time_cols = []
+        rows = ws.iter_rows(values_only=True)
+
+        # The first row gives the column titles.  Each 'Time' column is 
+        # followed by the column it gives the times for.
+        col_titles = [x for x in next(rows) if x]
+        plate_col = col_titles.index('Plate')
+        well_col = col_titles.index('Well')
+        repeat_col = col_titles.index('Repeat')
+        type_col = col_titles.index('Type')
+        time_cols = [i for i,x in enumerate(col_titles) if x == 'Time']
+
+        # Collect the whole table before building any data frames, so that 
+        # each column can be converted in one step.
+        table = [[x for x in row if x] for row in rows]
+        wb.close()
+
+        cells = np.full((len(table), len(col_titles)), None, dtype=object)
+        for i, row in enumerate(table):
+            cells[i, :len(row)] = row[:len(col_titles)]
+
+        def column(values):
+            return pd.Series(values).infer_objects()
+
+        # Group the data by name, in case the same measurement was made more 
+        # than once in each repeat.
         data = {}
+        for time_col in time_cols:
+            datum_col = time_col + 1
+            datum_name = nonstdlib.slugify(col_titles[datum_col])
+            data.setdefault(datum_name, []).append(time_col)
 
-        for i, row in enumerate(ws.rows):
-            cells = [x.value for x in row if x.value]
-
-            if i == 0:
-                col_titles = cells
-                plate_col = cells.index('Plate')
-                well_col = cells.index('Well')
-                repeat_col = cells.index('Repeat')
-                type_col = cells.index('Type')
-                time_cols = [i for i,x in enumerate(cells) if x == 'Time']
-
-            else:
-                for time_col in time_cols:
-                    datum_col = time_col + 1
-                    datum_name = nonstdlib.slugify(col_titles[datum_col])
-                    datum = { #
-                            'plate':    cells[plate_col],
-                            'well':     cells[well_col],
-                            'repeat':   cells[repeat_col],
-                            'type':     cells[type_col],
-                            'minutes':  min_from_days(cells[time_col]),
-                            datum_name: cells[datum_col],
-                    }
-                    data.setdefault(datum_name, []).append(datum)
-
-        self.reads = {k: pd.DataFrame(v) for k,v in data.items()}
-
+        self.reads = {}
+        for datum_name, time_cols in data.items():
+            n = len(time_cols)
+            datum_cols = [x + 1 for x in time_cols]
+
+            self.reads[datum_name] = pd.DataFrame({ #
+                    'plate':    column(np.repeat(cells[:, plate_col], n)),
+                    'well':     column(np.repeat(cells[:, well_col], n)),
+                    'repeat':   column(np.repeat(cells[:, repeat_col], n)),
+                    'type':     column(np.repeat(cells[:, type_col], n)),
+                    'minutes':  column(min_from_days(cells[:, time_cols].ravel())),
+                    datum_name: column(cells[:, datum_cols].ravel()),
+            })
@@ -2,6 +2,7 @@
 
 import bio96
 import json
+import functools
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -9,29 +10,9 @@ import matplotlib.pyplot as plt
 from pathlib import Path
 from sgrna_sensor.style import pick_color, pick_style, FoldChangeLocator
 
-def load(toml_path, query=None, aggregate=None, genes=None):
+def load(toml_path, query=None, aggregate=None, genes=None, efficiencies=None):
     toml_path = Path(toml_path)
-
-    def biorad(path):
-        df = pd.read_csv(path / 'Quantification Cq Results.csv')
-        df = df.rename({'Well': 'well0', 'Cq': 'cq'}, axis='columns')
-        return df[['well0', 'cq']]
-        
-    def applied_biosystems(path):
-        df = pd.read_excel(path, sheet_name='Results', header=43)
-        df = df.dropna(thresh=3)
-        df = df.rename({'Well Position': 'well', 'CT': 'cq'})
-        return df[['well', 'cq']]
-
-    with toml_path.open() as f:
-        first_line = f.read().lower()
-
-    if "applied biosystems" in first_line:
-        load_unlabeled_cq = applied_biosystems
-        merge_cols = {'well': 'well'},
-    else:  # biorad
-        load_unlabeled_cq = biorad
-        merge_cols = {'well0': 'well0'}
+    load_unlabeled_cq, merge_cols = sniff_format(toml_path)
 
     df, options = bio96.load(
             toml_path,
@@ -49,30 +30,117 @@ def load(toml_path, query=None, aggregate=None, genes=None):
         df = calc_cq(df, aggregate)
 
     if genes:
-        df = calc_Δcq(df, genes)
+        df = calc_Δcq(df, genes, efficiencies)
 
     return df, options
 
+def load_many(toml_paths, workers=None, query=None, aggregate=None, genes=None, efficiencies=None):
+    """
+    Load several qPCR runs into a single data frame.
+
+    The runs are loaded in parallel, using the given number of worker 
+    processes (by default, one per CPU).  Pass ``workers=1`` to load them in 
+    the calling process.  The path to each run's TOML file is recorded in a 
+    'run' column, and all the text columns are converted to categories to 
+    save memory.  Include 'run' in the `aggregate` attributes to summarize 
+    each run separately.
+
+    Returns a data frame and a dictionary mapping each run to its options.
+    """
+    toml_paths = [Path(x) for x in toml_paths]
+    runs = [str(x) for x in toml_paths]
+    load_run = functools.partial(load, query=query)
+
+    if workers == 1 or len(toml_paths) <= 1:
+        results = [load_run(x) for x in toml_paths]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(load_run, toml_paths))
+
+    dfs = []
+    options = {}
+
+    for run, (df, run_options) in zip(runs, results):
+        df.insert(0, 'run', run)
+        dfs.append(df)
+        options[run] = run_options
+
+    df = pd.concat(dfs, ignore_index=True, sort=False)
+    df['run'] = pd.Categorical(df['run'], categories=runs)
+
+    for col in df.select_dtypes(include='object'):
+        try: df[col] = df[col].astype('category')
+        except TypeError: pass  # Unhashable values, e.g. lists.
+
+    if aggregate:
+        df = calc_cq(df, aggregate)
+
+    if genes:
+        df = calc_Δcq(df, genes, efficiencies)
+
+    return df, options
+
+def sniff_format(toml_path):
+    """
+    Decide which instrument the given run came from, based on the first line 
+    of its TOML file.  Returns a function to load the Cq values and the 
+    columns to merge them on.
+    """
+
+    def biorad(path):
+        df = pd.read_csv(path / 'Quantification Cq Results.csv')
+        df = df.rename({'Well': 'well0', 'Cq': 'cq'}, axis='columns')
+        return df[['well0', 'cq']]
+        
+    def applied_biosystems(path):
+        df = pd.read_excel(path, sheet_name='Results', header=43)
+        df = df.dropna(thresh=3)
+        df = df.rename({'Well Position': 'well', 'CT': 'cq'}, axis='columns')
+        return df[['well', 'cq']]
+
+    with Path(toml_path).open() as f:
+        first_line = f.readline().lower()
+
+    if "applied biosystems" in first_line:
+        return applied_biosystems, {'well': 'well'}
+    else:  # biorad
+        return biorad, {'well0': 'well0'}
+
 def load_efficiencies(json_path):
     with open(json_path) as f:
         return json.load(f)
 
 def calc_cq(df, attrs):
-
-    def aggregate_cq(df):
-        row = pd.Series()
-        row['n'] = len(df['cq'])
-        row['n_nan'] = df['cq'].isnull().sum()
-        row['cq_mean'] = df['cq'].mean()
-        row['cq_median'] = df['cq'].median()
-        row['cq_min'] = df['cq'].min()
-        row['cq_max'] = df['cq'].max()
-        row['cq_std'] = df['cq'].std()
-        return row
-
-    return df.groupby(attrs).apply(aggregate_cq)
-
-def calc_Δcq(cq, genes):
+    """
+    Summarize the Cq values for each group of wells that share the given 
+    attributes.  The data can come from any number of plates or runs, as long 
+    as they're in the same data frame.
+    """
+    cq = df.groupby(attrs, observed=True)['cq'].agg(
+            ['size', 'count', 'mean', 'median', 'min', 'max', 'std'])
+
+    return pd.DataFrame({
+        'n': cq['size'],
+        'n_nan': cq['size'] - cq['count'],
+        'cq_mean': cq['mean'],
+        'cq_median': cq['median'],
+        'cq_min': cq['min'],
+        'cq_max': cq['max'],
+        'cq_std': cq['std'],
+    })
+
+def calc_Δcq(cq, genes, efficiencies=None):
+    """
+    Calculate the expression of one gene relative to another, e.g. a target 
+    gene relative to a housekeeping gene.
+
+    By default, both genes are assumed to amplify with perfect efficiency 
+    (i.e. the amount of product doubles every cycle).  If the efficiencies 
+    have been measured (see `load_efficiencies()`), the fold changes are 
+    instead calculated using the Pfaffl method, which accounts for any 
+    difference in efficiency between the two genes.
+    """
     x = cq.loc[genes['expt']]
     x0 = cq.loc[genes['ref']]
 
@@ -83,10 +151,29 @@ def calc_Δcq(cq, genes):
     # https://stats.stackexchange.com/questions/25848/how-to-sum-a-standard-deviation
     df['Δcq_std'] = np.sqrt(x['cq_std']**2 + x0['cq_std']**2)
 
-    # Assume perfect efficiency (i.e. 2).  If the reference and target genes 
-    # have very different efficiencies, I might need to use the Pfaffl method.
-    df['fold_change'] = 2**(-df['Δcq_mean'])
-    df['fold_change_bound'] = 2**(-df['Δcq_mean'] + df['Δcq_std'])
+    if efficiencies is None:
+        # Assume perfect efficiency (i.e. 2).
+        df['fold_change'] = 2**(-df['Δcq_mean'])
+        df['fold_change_bound'] = 2**(-df['Δcq_mean'] + df['Δcq_std'])
+
+    else:
+        # Pfaffl method: the amount of each product is proportional to E^-Cq, 
+        # where E is the amplification factor per cycle for that gene.  Work 
+        # in log space, and propagate the standard deviations of the Cq 
+        # values accordingly.
+        if isinstance(efficiencies, (str, Path)):
+            efficiencies = load_efficiencies(efficiencies)
+
+        log_e = np.log(efficiencies[genes['expt']]['factor'])
+        log_e0 = np.log(efficiencies[genes['ref']]['factor'])
+
+        log_fold_change = log_e0 * x0['cq_mean'] - log_e * x['cq_mean']
+        log_fold_change_std = np.sqrt(
+                (log_e * x['cq_std'])**2 + (log_e0 * x0['cq_std'])**2)
+
+        df['fold_change'] = np.exp(log_fold_change)
+        df['fold_change_bound'] = np.exp(log_fold_change + log_fold_change_std)
+
     df['fold_change_err'] = df['fold_change_bound'] - df['fold_change']
 
     return df
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+"""\
+Predict the on-target activity of spacers using the "Rule Set 2" model from
+Doench et al. (2016).
+
+The model is a gradient boosted regression tree, distributed as a python2
+pickle of a scikit-learn 0.16 estimator.  Rather than relying on that exact
+version of scikit-learn, the pickle is unpacked into plain numpy arrays and
+the trees are evaluated directly.  The features (one-hot and k-mer counts,
+GC content, melting temperatures, etc.) are calculated for many sequences at
+once, so tens of thousands of sequences can be scored per second.
+
+Each sequence must be a 30-mer of the form ``NNNN[20-nt spacer]NGGNNN``:
+
+>>> model = load_model()
+>>> model.score(['AAAAAAAAAAAAAAAAAAAAAAAAAGGAAA'])
+array([0.2183...])
+"""
+
+import io
+import pickle
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+
+from .library import encode_dna
+
+SEQ_LEN = 30
+
+# The order of the alphabet used by the original feature code.  It matters,
+# because the trees refer to features by index.
+RS2_BASES = 'ATCG'
+
+MODEL_DIR = Path(__file__).parents[2] / 'notebook' / '20170329_test_multiple_spacers' / 'doench16' / 'Rule_Set_2_scoring_v1' / 'saved_models'
+
+# Nearest-neighbor parameters (ΔH in kcal/mol, ΔS in cal/mol·K) used by
+# Biopython's `Tm_staluc()` (i.e. `Tm_NN()` with the DNA_NN3 table) to
+# calculate the melting temperature features.
+NN_THERMODYNAMICS = {
+        'AA': (-7.9, -22.2), 'TT': (-7.9, -22.2),
+        'AT': (-7.2, -20.4), 'TA': (-7.2, -21.3),
+        'CA': (-8.5, -22.7), 'TG': (-8.5, -22.7),
+        'GT': (-8.4, -22.4), 'AC': (-8.4, -22.4),
+        'CT': (-7.8, -21.0), 'AG': (-7.8, -21.0),
+        'GA': (-8.2, -22.2), 'TC': (-8.2, -22.2),
+        'CG': (-10.6, -27.2),
+        'GC': (-9.8, -24.4),
+        'GG': (-8.0, -19.9), 'CC': (-8.0, -19.9),
+}
+NN_INIT_AT = (2.3, 4.1)
+NN_INIT_GC = (0.1, -2.8)
+
+class Model:
+    """
+    A Rule Set 2 model, loaded once and reused to score any number of
+    sequences.  Use `load_model()` to create one.
+
+    The scores of the `cache_size` most recently scored sequences (and gene
+    positions, for models that use them) are cached, so sequences that are
+    scored repeatedly aren't featurized again.  Set `cache_size` to 0 to
+    disable the cache.
+    """
+
+    def __init__(self, pickle_path, cache_size=2**16):
+        self.pickle_path = Path(pickle_path)
+        self.cache_size = cache_size
+
+        with open(self.pickle_path, 'rb') as file:
+            estimator, learn_options = _LegacyUnpickler(file).load()
+
+        self.use_gene_position = learn_options['include_gene_position']
+        self.num_features = estimator.n_features
+        self.learning_rate = estimator.learning_rate
+        self.intercept = estimator.init_.mean
+
+        # Pack every tree into one set of arrays, so that all the trees can
+        # be evaluated at the same time.
+        trees = [x.tree_ for x in estimator.estimators_[:,0]]
+        max_nodes = max(x.node_count for x in trees)
+
+        self.left = np.full((len(trees), max_nodes), -1, dtype=np.int64)
+        self.right = np.full((len(trees), max_nodes), -1, dtype=np.int64)
+        self.feature = np.zeros((len(trees), max_nodes), dtype=np.int64)
+        self.threshold = np.zeros((len(trees), max_nodes))
+        self.value = np.zeros((len(trees), max_nodes))
+
+        for i, tree in enumerate(trees):
+            n = tree.node_count
+            self.left[i,:n] = tree.nodes['left_child']
+            self.right[i,:n] = tree.nodes['right_child']
+            self.feature[i,:n] = np.maximum(tree.nodes['feature'], 0)
+            self.threshold[i,:n] = tree.nodes['threshold']
+            self.value[i,:n] = tree.values[:,0,0]
+
+        self._cache = OrderedDict()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({str(self.pickle_path)!r})'
+
+    def score(self, seqs, aa_cut=None, percent_peptide=None, chunk_size=2**14):
+        """
+        Return an array with the predicted activity of each of the given
+        30-mers.
+
+        `aa_cut` and `percent_peptide` give the position of each cut site in
+        the targeted protein, and are required by (and only used by) models
+        trained with gene position features.  They can be single values or one
+        value per sequence.  New sequences are scored `chunk_size` at a time,
+        to limit how much memory the features take.
+        """
+        seqs = [x.upper() for x in seqs]
+        keys = self._cache_keys(seqs, aa_cut, percent_peptide)
+        scores = {}
+        todo = []
+
+        for k in dict.fromkeys(keys):
+            if k in self._cache:
+                self._cache.move_to_end(k)
+                scores[k] = self._cache[k]
+            else:
+                todo.append(k)
+
+        for i in range(0, len(todo), chunk_size):
+            chunk = todo[i:i+chunk_size]
+            chunk_seqs, chunk_cuts, chunk_peptides = zip(*chunk)
+            features = featurize(
+                    chunk_seqs,
+                    chunk_cuts if self.use_gene_position else None,
+                    chunk_peptides if self.use_gene_position else None,
+            )
+            scores.update(zip(chunk, self.predict(features)))
+
+        # Forget the least recently scored sequences, so that scoring every
+        # site in a genome doesn't keep every score in memory.
+        if self.cache_size > 0:
+            self._cache.update((k, scores[k]) for k in todo)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return np.array([scores[k] for k in keys], dtype=float)
+
+    def predict(self, features):
+        """
+        Evaluate the model for the given feature matrix (as returned by
+        `featurize()`), without using or updating the cache.
+        """
+        if features.shape[1] != self.num_features:
+            raise ValueError(f"expected {self.num_features} features, not {features.shape[1]}.")
+
+        # scikit-learn compares single precision features to the thresholds.
+        x = features.astype(np.float32)
+        trees = np.arange(len(self.left))
+        nodes = np.zeros((len(x), len(trees)), dtype=np.int64)
+
+        rows = np.arange(len(x))[:, np.newaxis]
+
+        while True:
+            leaf = self.left[trees, nodes] < 0
+            if leaf.all():
+                break
+
+            feature = self.feature[trees, nodes]
+            go_left = x[rows, feature] <= self.threshold[trees, nodes]
+            next_nodes = np.where(go_left, self.left[trees, nodes], self.right[trees, nodes])
+            nodes = np.where(leaf, nodes, next_nodes)
+
+        return self.intercept + self.learning_rate * self.value[trees, nodes].sum(axis=1)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _cache_keys(self, seqs, aa_cut, percent_peptide):
+        if not self.use_gene_position:
+            return [(x, None, None) for x in seqs]
+
+        if aa_cut is None or percent_peptide is None:
+            raise ValueError(f"'{self.pickle_path.name}' requires `aa_cut` and `percent_peptide`.")
+
+        cuts = np.broadcast_to(np.asarray(aa_cut, dtype=float), len(seqs))
+        peptides = np.broadcast_to(np.asarray(percent_peptide, dtype=float), len(seqs))
+        return list(zip(seqs, cuts.tolist(), peptides.tolist()))
+
+
+def load_model(pickle_path=None, gene_position=False):
+    """
+    Load a Rule Set 2 model.
+
+    By default, the model saved in this repository is used: the one that
+    doesn't need to know where in the targeted gene each spacer cuts, unless
+    `gene_position` is true.  Loaded models are kept, so calling this function
+    again with the same arguments is cheap and reuses the same score cache.
+    """
+    if pickle_path is None:
+        name = 'V3_model_full.pickle' if gene_position else 'V3_model_nopos.pickle'
+        pickle_path = MODEL_DIR / name
+
+    pickle_path = Path(pickle_path).resolve()
+
+    if pickle_path not in _MODELS:
+        if not pickle_path.exists():
+            raise ValueError(f"can't find Rule Set 2 model: '{pickle_path}'")
+        _MODELS[pickle_path] = Model(pickle_path)
+
+    return _MODELS[pickle_path]
+
+def score_spacers(seqs, aa_cut=None, percent_peptide=None, model=None, chunk_size=2**14):
+    """
+    Return the Rule Set 2 score of each of the given 30-mers.  If positions in
+    the targeted protein are given, the model that uses them is loaded.
+    """
+    if model is None:
+        model = load_model(gene_position=aa_cut is not None)
+
+    return model.score(seqs, aa_cut, percent_peptide, chunk_size)
+
+def featurize(seqs, aa_cut=None, percent_peptide=None):
+    """
+    Calculate the Rule Set 2 features for each of the given 30-mers, in the
+    order the models expect.  Return a 2D array with one row per sequence.
+    If `aa_cut` and `percent_peptide` are given, the gene position features
+    are included.
+    """
+    codes = _encode_30mers(seqs)
+    n = len(codes)
+
+    nuc_pd_1, nuc_pi_1 = _nucleotide_features(codes, 1)
+    nuc_pd_2, nuc_pi_2 = _nucleotide_features(codes, 2)
+
+    # GC content of the 20-mer (offset by 1 nt, like the original code).
+    gc_count = np.isin(codes[:, 5:25], [RS2_BASES.index('C'), RS2_BASES.index('G')]).sum(axis=1)
+
+    nggx = np.zeros((n, 16))
+    nggx[np.arange(n), _NGGX_COLS[4 * codes[:, 24] + codes[:, 27]]] = 1
+
+    tm = np.column_stack([
+            melting_temp(codes),
+            melting_temp(codes[:, 20:25]),
+            melting_temp(codes[:, 12:20]),
+            melting_temp(codes[:, 7:12]),
+    ])
+
+    # This order comes from iterating over a python2 dictionary of feature
+    # sets in the original code.
+    if aa_cut is None and percent_peptide is None:
+        blocks = [
+                gc_count, nuc_pd_2, nuc_pd_1, gc_count > 10, nuc_pi_1,
+                nuc_pi_2, tm, gc_count < 10, nggx,
+        ]
+    else:
+        aa_cut = np.broadcast_to(np.asarray(aa_cut, dtype=float), n)
+        percent_peptide = np.broadcast_to(np.asarray(percent_peptide, dtype=float), n)
+        blocks = [
+                gc_count, aa_cut, nuc_pd_2, nuc_pd_1, gc_count > 10,
+                nuc_pi_1, nuc_pi_2, percent_peptide < 50, tm, gc_count < 10,
+                nggx, percent_peptide,
+        ]
+
+    return np.column_stack([
+            np.asarray(x, dtype=float).reshape(n, -1) for x in blocks
+    ])
+
+def melting_temp(codes):
+    """
+    Calculate the DNA/DNA melting temperature of each row of the given array
+    of base codes (as used by `featurize()`), in the same way as Biopython's
+    `Tm_staluc()`: nearest-neighbor thermodynamics with 25 nM of each strand
+    and 50 mM Na⁺.
+    """
+    codes = np.atleast_2d(codes)
+    length = codes.shape[1]
+
+    dh, ds = _NN_TABLE[:, codes[:, :-1], codes[:, 1:]].sum(axis=2)
+
+    ends = codes[:, [0, -1]]
+    at_ends = np.isin(ends, [RS2_BASES.index('A'), RS2_BASES.index('T')]).sum(axis=1)
+    gc_ends = 2 - at_ends
+    dh += NN_INIT_AT[0] * at_ends + NN_INIT_GC[0] * gc_ends
+    ds += NN_INIT_AT[1] * at_ends + NN_INIT_GC[1] * gc_ends
+
+    # Salt correction (method 5, Owczarzy et al. 2004).
+    ds += 0.368 * (length - 1) * np.log(50e-3)
+
+    R = 1.987
+    k = (25 - 25 / 2) * 1e-9
+    return 1000 * dh / (ds + R * np.log(k)) - 273.15
+
+
+def _encode_30mers(seqs):
+    seqs = list(seqs)
+    for seq in seqs:
+        if len(seq) != SEQ_LEN:
+            raise ValueError(f"expected a {SEQ_LEN}-mer, not '{seq}'.")
+        if seq[25:27].upper() != 'GG':
+            raise ValueError(f"expected GG (the PAM) at positions 26-27, not '{seq}'.")
+
+    if not seqs:
+        return np.zeros((0, SEQ_LEN), dtype=np.uint8)
+
+    # `encode_dna()` uses the ACGT order, but the trees expect ATCG.
+    codes = encode_dna(''.join(seqs)).reshape(len(seqs), SEQ_LEN)
+    return _ACGT_TO_RS2[codes]
+
+def _nucleotide_features(codes, order):
+    n, length = codes.shape
+    kmers = np.zeros((n, length - order + 1), dtype=np.int64)
+    for j in range(order):
+        kmers = 4 * kmers + codes[:, j:length - order + 1 + j]
+
+    num_kmers = 4**order
+    pos_dependent = np.zeros((n, kmers.shape[1] * num_kmers))
+    cols = num_kmers * np.arange(kmers.shape[1]) + kmers
+    pos_dependent[np.arange(n)[:, np.newaxis], cols] = 1
+
+    pos_independent = np.zeros((n, num_kmers))
+    np.add.at(pos_independent, (np.arange(n)[:, np.newaxis], kmers), 1)
+
+    return pos_dependent, pos_independent
+
+def _nn_table():
+    table = np.zeros((2, 4, 4))
+    for (a, b), (dh, ds) in NN_THERMODYNAMICS.items():
+        i, j = RS2_BASES.index(a), RS2_BASES.index(b)
+        table[:, i, j] = dh, ds
+    return table
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """
+    Unpickle a python2 scikit-learn model into plain objects that just hold
+    the pickled attributes.
+    """
+
+    def __init__(self, file):
+        super().__init__(io.BytesIO(file.read()), encoding='latin1')
+
+    def find_class(self, module, name):
+        if module.split('.')[0] == 'sklearn':
+            return _PickledObject
+        return super().find_class(module, name)
+
+class _PickledObject:
+
+    def __init__(self, *args):
+        pass
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+_ACGT_TO_RS2 = np.array([RS2_BASES.index(x) for x in 'ACGT'], dtype=np.uint8)
+_NN_TABLE = _nn_table()
+
+# The original code built the NGGX features by concatenating pandas series,
+# which sorted the feature names ('P0', 'P1', 'P10', ..., 'P9') as strings.
+_NGGX_COLS = np.argsort(sorted(range(16), key=lambda i: f'P{i}'))
+_MODELS = {}
@@ -188,6 +188,7 @@ class Construct (Sequence):
         attached constructs) with the given name.  
         """
         domains = [x for x in self._domains if x.name in names]
+        domains = [self._own(x) for x in domains]
         for attachment in self._attachments.values():
             domains += attachment.construct.domains_from_name(*names)
         return domains
@@ -201,7 +202,7 @@ class Construct (Sequence):
 
         for iter in self._iterate_domains():
             if iter.start <= index < iter.end:
-                return iter.domain, iter.rel_index(index)
+                return self._own(iter.domain), iter.rel_index(index)
 
         raise IndexError('index out of range')
 
@@ -251,8 +252,31 @@ class Construct (Sequence):
         print(self.format(*args, **kwargs))
 
     def copy(self):
-        from copy import deepcopy
-        return deepcopy(self)
+        """
+        Return a copy of this construct.
+
+        The copy shares its domains with this construct rather than 
+        duplicating them.  Whenever a shared domain is about to change, the 
+        copy is given its own snapshot of that domain first (and the copy 
+        makes its own copy of any domain it looks up, since that's how 
+        domains are modified).  Deriving many variants from one construct 
+        therefore only costs memory for the domains that actually change.
+        """
+        copy = self.__class__.__new__(self.__class__)
+        copy.__dict__.update(self.__dict__)
+
+        copy._domains = list(self._domains)
+        copy._attachments = {
+                k: a._replace(construct=a.construct.copy())
+                for k, a in self._attachments.items()
+        }
+        copy._expected_base_pairs = set(self._expected_base_pairs)
+        copy._expected_unpaired_bases = set(self._expected_unpaired_bases)
+
+        for domain in {id(x): x for x in self._domains}.values():
+            domain._sharers.add(copy)
+
+        return copy
 
     def append(self, sequence):
         """
@@ -417,6 +441,54 @@ class Construct (Sequence):
         self.unattach(construct)
         self.attach(construct, start_domain, start_index, end_domain, end_index)
 
+    def _own(self, domain):
+        """
+        Make sure that the given domain (which may belong to this construct or 
+        to one of its attachments) isn't shared with the construct this one 
+        was copied from, and return the domain that ends up in its place.  
+        Returns None if the domain isn't part of this construct.
+        """
+        if not any(x is domain for x in self._domains):
+            for attachment in self._attachments.values():
+                owned = attachment.construct._own(domain)
+                if owned is not None:
+                    return owned
+            return None
+
+        if self not in domain._sharers:
+            return domain
+
+        domain._sharers.discard(self)
+        clone = domain.copy()
+        self._swap_domain(domain, clone)
+        return clone
+
+    def _own_all(self):
+        """
+        Make sure that none of the domains in this construct (or in its 
+        attachments) are shared with the construct this one was copied from.
+        """
+        for domain in {id(x): x for x in self._domains}.values():
+            self._own(domain)
+        for attachment in self._attachments.values():
+            attachment.construct._own_all()
+
+    def _swap_domain(self, old, new):
+        """
+        Put the given new domain everywhere the old one was used.
+        """
+        def swap(x):
+            return new if x is old else x
+
+        self._domains = [swap(x) for x in self._domains]
+        self._attachments = {
+                swap(k): a._replace(
+                    start_domain=swap(a.start_domain),
+                    end_domain=swap(a.end_domain),
+                )
+                for k, a in self._attachments.items()
+        }
+
     def _iterate_domains(self):
         """
         Iterate over all the domains that make up this construct (even those 
@@ -519,6 +591,12 @@ class Construct (Sequence):
             raise IndexError('index out of range')
 
         if isinstance(sequence, Construct):
+            # The given construct may be a copy that still shares its domains 
+            # with the construct it was copied from.  It has to own them 
+            # before they're shared with this construct, too, otherwise 
+            # changes made through this construct would end up in the 
+            # original rather than in the copy.
+            sequence._own_all()
             self._domains[position:position] = sequence._domains
             self._attachments.update(sequence._attachments)
         elif isinstance(sequence, Domain):
@@ -545,6 +623,7 @@ class Domain (Sequence):
     """
 
     def __init__(self, name, sequence, style=None, mutable=True):
+        self.__dict__['_sharers'] = _Sharers()
         Sequence.__init__(self, name)
         self._sequence = sequence
         self._attachment_sites = []
@@ -554,6 +633,22 @@ class Domain (Sequence):
         self.style = style
         self.mutable = mutable
 
+    def __setattr__(self, name, value):
+        # Give any constructs that share this domain (see `Construct.copy()`) 
+        # their own snapshot of it before it changes.
+        if self.__dict__.get('_sharers'):
+            self._detach_sharers()
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_sharers', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__['_sharers'] = _Sharers()
+
     def __hash__(self):
         from six.moves.builtins import id
         return hash(id(self))
@@ -652,8 +747,23 @@ class Domain (Sequence):
         print(self.format(*args, **kwargs))
 
     def copy(self):
-        from copy import deepcopy
-        return deepcopy(self)
+        """
+        Return a copy of this domain.  The sequence, constraints, and style are 
+        all immutable, so they're shared with the copy rather than duplicated.
+        """
+        domain = self.__class__.__new__(self.__class__)
+        domain.__setstate__(self.__getstate__())
+        domain._attachment_sites = list(self._attachment_sites)
+        return domain
+
+    def _detach_sharers(self):
+        sharers = list(self._sharers)
+        self._sharers.clear()
+        snapshot = self.copy()
+
+        for construct in sharers:
+            construct._swap_domain(self, snapshot)
+            snapshot._sharers.add(construct)
 
     def mutate(self, index, mutation):
         self[index] = mutation
@@ -675,4 +785,45 @@ class Domain (Sequence):
         self[start:end] = ''
 
 
+class _Sharers:
+    """
+    The constructs that share a domain (see `Construct.copy()`).
+
+    Constructs are compared by identity rather than by sequence, and are only 
+    weakly referenced: each one drops out of the set as soon as it's garbage 
+    collected, so discarded copies don't accumulate.
+    """
+
+    def __init__(self):
+        self._refs = {}
+
+    def __contains__(self, construct):
+        ref = self._refs.get(id(construct))
+        return ref is not None and ref() is construct
+
+    def __iter__(self):
+        for ref in list(self._refs.values()):
+            construct = ref()
+            if construct is not None:
+                yield construct
+
+    def __len__(self):
+        return len(self._refs)
+
+    def add(self, construct):
+        import weakref
+
+        key, refs = id(construct), self._refs
+
+        def forget(ref):
+            if refs.get(key) is ref:
+                del refs[key]
+
+        refs[key] = weakref.ref(construct, forget)
+
+    def discard(self, construct):
+        if construct in self:
+            del self._refs[id(construct)]
 
+    def clear(self):
+        self._refs.clear()
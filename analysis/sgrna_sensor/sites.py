@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+
+"""\
+Find the sites that Cas9 can target in a genome, and count how many other
+sites in the genome each spacer could also target.
+
+Sites are found on both strands by matching each species' PAM against the
+whole genome at once.  To count off-targets quickly, every site in the genome
+is indexed by its PAM-proximal "seed" sequence.  A spacer's off-targets (with
+up to a few mismatches anywhere) are then found by looking up every seed
+within that many mismatches of the spacer's own seed, and comparing the rest
+of the spacer only for the sites that share one of those seeds.  The index is
+saved to disk and memory-mapped, so it only has to be built once per genome
+and can be shared between processes.
+"""
+
+import gzip
+import hashlib
+import functools
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections import namedtuple
+
+from .cache import default_cache_dir, file_fingerprint
+from .library import IUPAC_BASES, BASES, encode_dna, decode_dna
+
+Cas9 = namedtuple('Cas9', 'species pam spacer_len seed_len')
+
+CAS9 = {
+        'sp': Cas9('sp', 'NGG', 20, 12),
+        'sa': Cas9('sa', 'NNGRRT', 21, 12),
+}
+
+SITE_COLS = [
+        'chrom',
+        'strand',
+        'start',
+        'end',
+        'spacer',
+        'pam',
+]
+
+def get_cas9(species):
+    from .components import SpacerRegistry
+
+    species = SpacerRegistry.species_aliases.get(species, species)
+    try:
+        return CAS9[species]
+    except KeyError:
+        raise ValueError("Unknown species: '{}'".format(species)) from None
+
+def load_fasta(fasta_path):
+    """
+    Return a dictionary mapping the name of each sequence in the given FASTA
+    file (which may be gzipped) to the sequence itself, in upper case.
+    """
+    fasta_path = Path(fasta_path)
+    open_ = gzip.open if fasta_path.suffix == '.gz' else open
+
+    seqs = {}
+    name, lines = None, []
+
+    with open_(fasta_path, 'rt') as file:
+        for line in file:
+            if line.startswith('>'):
+                if name is not None:
+                    seqs[name] = ''.join(lines).upper()
+                name, lines = line[1:].strip().split(' ')[0], []
+            else:
+                lines.append(line.strip())
+
+    if name is None:
+        raise ValueError(f"'{fasta_path}' is not a FASTA file.")
+
+    seqs[name] = ''.join(lines).upper()
+    return seqs
+
+def find_sites(genome, species='sp'):
+    """
+    Find every site on either strand of the given genome that can be targeted
+    by the given species of Cas9.  The genome can be a dictionary of
+    sequences (as returned by `load_fasta()`) or a path to a FASTA file.
+
+    The result is a data frame with one row per site and these columns:
+
+    'chrom': The name of the sequence the site is in.
+    'strand': '+' or '-'.
+    'start', 'end': The position of the spacer, on the + strand, in python
+        slice notation.
+    'spacer': The spacer sequence (5' to 3', DNA).
+    'pam': The PAM sequence (5' to 3', DNA).
+
+    Sites with any bases other than A, C, G, or T are skipped.
+    """
+    if not isinstance(genome, dict):
+        genome = load_fasta(genome)
+
+    cas9 = get_cas9(species)
+    tables = []
+
+    for chrom, seq in genome.items():
+        codes = encode_dna(seq, strict=False)
+        for strand, strand_codes in [('+', codes), ('-', _reverse_complement(codes))]:
+            spacer_codes, pam_codes, i = _find_sites(strand_codes, cas9)
+
+            # Convert the indices to + strand coordinates.
+            start = i if strand == '+' else len(seq) - i - cas9.spacer_len
+
+            tables.append(pd.DataFrame({
+                    'chrom': chrom,
+                    'strand': strand,
+                    'start': start,
+                    'end': start + cas9.spacer_len,
+                    'spacer': decode_dna(spacer_codes) if len(i) else [],
+                    'pam': decode_dna(pam_codes) if len(i) else [],
+            }, columns=SITE_COLS))
+
+    return pd.concat(tables, ignore_index=True)
+
+def _find_sites(codes, cas9):
+    """
+    Find the sites on the given strand (an array of 2-bit codes).  Return the
+    spacer and PAM codes (one site per row), and the index of each spacer.
+    """
+    n = len(codes) - cas9.spacer_len - len(cas9.pam) + 1
+    if n <= 0:
+        empty = np.zeros((0, 0), dtype=np.uint8)
+        return empty, empty, np.zeros(0, dtype=int)
+
+    # Check each position of the PAM against every position in the genome at
+    # once, using bit masks of the bases allowed by the IUPAC code.
+    ok = np.ones(n, dtype=bool)
+    for j, code in enumerate(cas9.pam):
+        mask = sum(1 << BASES.index(x) for x in IUPAC_BASES[code])
+        window = codes[cas9.spacer_len + j:cas9.spacer_len + j + n]
+        ok &= (window <= 3) & ((mask >> (window & 3)) & 1).astype(bool)
+
+    i = np.flatnonzero(ok)
+    site_len = cas9.spacer_len + len(cas9.pam)
+    sites = codes[i[:, np.newaxis] + np.arange(site_len)]
+
+    known = (sites <= 3).all(axis=1)
+    i, sites = i[known], sites[known]
+
+    return sites[:, :cas9.spacer_len], sites[:, cas9.spacer_len:], i
+
+
+class SeedIndex:
+    """
+    Every site in a genome, sorted by the PAM-proximal seed of its spacer.
+
+    The index consists of two arrays, which are stored in a directory and
+    memory-mapped: `seeds` (the sorted seed of each site, packed into an
+    integer) and `spacers` (the whole spacer of each site, packed 2 bits per
+    base into a 64-bit integer).  Use `load_seed_index()` to get an index for
+    a FASTA file.
+    """
+
+    def __init__(self, directory, species='sp'):
+        self.directory = Path(directory)
+        self.cas9 = get_cas9(species)
+        self.seeds = np.load(self.directory / 'seeds.npy', mmap_mode='r')
+        self.spacers = np.load(self.directory / 'spacers.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.seeds)
+
+    @classmethod
+    def build(cls, sites, directory, species='sp'):
+        """
+        Build an index for the given sites (as returned by `find_sites()`) in
+        the given directory.
+        """
+        cas9 = get_cas9(species)
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        codes = encode_dna(''.join(sites['spacer'])).reshape(len(sites), -1)
+        spacers = pack_spacers(codes)
+        seeds = pack_spacers(codes[:, -cas9.seed_len:])
+
+        order = np.argsort(seeds, kind='stable')
+
+        # Write each array to a temporary file first, so a crash can't leave a
+        # truncated index behind.
+        for name, array in [('seeds', seeds[order]), ('spacers', spacers[order])]:
+            tmp_path = directory / f'{name}.tmp.npy'
+            np.save(tmp_path, array)
+            tmp_path.replace(directory / f'{name}.npy')
+
+        return cls(directory, species)
+
+    def count_off_targets(self, spacer, max_mismatches=3):
+        """
+        Count the sites in the genome that match the given spacer with 0, 1,
+        ..., `max_mismatches` mismatches, and return the counts as an array.
+        If the spacer comes from the genome, its own site is included in the
+        count with no mismatches.
+        """
+        codes = encode_dna(spacer)
+        if len(codes) != self.cas9.spacer_len:
+            raise ValueError(f"'{spacer}' is {len(codes)} nt long, but {self.cas9.species} spacers are {self.cas9.spacer_len} nt long.")
+
+        query = pack_spacers(codes[np.newaxis])[0]
+        seed_codes = codes[-self.cas9.seed_len:]
+        seed_mismatches = min(max_mismatches, self.cas9.seed_len)
+
+        # Find the range of the index that has each seed within the allowed
+        # number of mismatches of the query seed.
+        seeds = seed_variants(seed_codes, seed_mismatches)
+        lo = np.searchsorted(self.seeds, seeds, 'left')
+        hi = np.searchsorted(self.seeds, seeds, 'right')
+        lengths = hi - lo
+
+        # Gather all the sites in those ranges, then count the mismatches
+        # across the whole spacer.
+        offsets = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+        candidates = np.arange(lengths.sum()) + offsets
+        mismatches = count_mismatches(self.spacers[candidates], query)
+
+        return np.bincount(
+                mismatches[mismatches <= max_mismatches],
+                minlength=max_mismatches + 1,
+        )
+
+
+def load_seed_index(fasta_path, species='sp', cache=True):
+    """
+    Return a `SeedIndex` for the given FASTA file, building it if necessary.
+
+    The index is kept in ``~/.cache/sgrna_sensor/sites`` by default; pass a
+    directory to use a different location.  It's rebuilt whenever the FASTA
+    file or this module changes.  If `cache` is false, the index is built in
+    a temporary directory.
+    """
+    fasta_path = Path(fasta_path).resolve()
+    species = get_cas9(species).species
+
+    if not cache:
+        import tempfile
+        directory = Path(tempfile.mkdtemp())
+        return SeedIndex.build(find_sites(fasta_path, species), directory, species)
+
+    if cache is True:
+        cache = default_cache_dir('sites')
+
+    key = hashlib.sha1(f'{fasta_path}:{species}'.encode()).hexdigest()
+    directory = Path(cache) / key
+    stamp = directory / 'fingerprint'
+
+    try:
+        if stamp.read_text() == file_fingerprint(fasta_path, __file__, extra=species):
+            return SeedIndex(directory, species)
+    except OSError:
+        pass
+
+    index = SeedIndex.build(find_sites(fasta_path, species), directory, species)
+    stamp.write_text(file_fingerprint(fasta_path, __file__, extra=species))
+    return index
+
+def rank_spacers(spacers, index, max_mismatches=3, workers=None):
+    """
+    Count the off-targets of each of the given spacers, and return them as a
+    data frame sorted from the most to the least specific.
+
+    The spacers can be a list of sequences, or a data frame of sites (as
+    returned by `find_sites()`).  The columns 'off_targets_0mm' ...
+    'off_targets_Nmm' are added, giving the number of sites in the indexed
+    genome with that many mismatches.  Spacers are ranked by their 0-mismatch
+    counts first (which include the on-target site, if it's in the indexed
+    genome), then by their 1-mismatch counts, and so on.
+
+    The spacers are processed in parallel using `workers` processes (by
+    default, one for each CPU).  Each process memory-maps the same index.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if isinstance(spacers, pd.DataFrame):
+        df = spacers.copy()
+    else:
+        df = pd.DataFrame({'spacer': list(spacers)})
+
+    count = functools.partial(
+            _count_off_targets,
+            directory=index.directory,
+            species=index.cas9.species,
+            max_mismatches=max_mismatches,
+    )
+    chunks = np.array_split(df['spacer'].values, max(1, len(df) // 1000))
+
+    if workers == 1 or len(chunks) <= 1:
+        counts = list(map(count, chunks))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            counts = list(pool.map(count, chunks))
+
+    cols = [f'off_targets_{i}mm' for i in range(max_mismatches + 1)]
+    counts = np.vstack(counts) if counts else np.zeros((0, len(cols)), dtype=int)
+    for i, col in enumerate(cols):
+        df[col] = counts[:, i]
+
+    return df.sort_values(cols, kind='stable').reset_index(drop=True)
+
+def _count_off_targets(spacers, directory, species, max_mismatches):
+    index = SeedIndex(directory, species)
+    return np.array(
+            [index.count_off_targets(x, max_mismatches) for x in spacers],
+            dtype=int,
+    ).reshape(len(spacers), max_mismatches + 1)
+
+
+def pack_spacers(codes):
+    """
+    Pack each row of the given 2D array of 2-bit codes into a 64-bit integer,
+    with the first base in the most significant bits.
+    """
+    codes = np.asarray(codes, dtype=np.uint64)
+    packed = np.zeros(len(codes), dtype=np.uint64)
+    for j in range(codes.shape[1]):
+        packed = (packed << np.uint64(2)) | codes[:, j]
+    return packed
+
+def seed_variants(codes, max_mismatches):
+    """
+    Return the packed sequences (see `pack_spacers()`) of every sequence with
+    no more than the given number of mismatches to the given one.
+    """
+    query = pack_spacers(np.asarray(codes)[np.newaxis])[0]
+    return np.sort(query ^ _mismatch_masks(len(codes), max_mismatches))
+
+@functools.lru_cache()
+def _mismatch_masks(n, max_mismatches):
+    # XOR-ing a 2-bit code with 1, 2, or 3 always gives a different base, so
+    # the variants of any sequence can be made by XOR-ing it with the same set
+    # of masks.
+    masks = [0]
+
+    for k in range(1, max_mismatches + 1):
+        for positions in itertools.combinations(range(n), k):
+            shifts = [2 * (n - 1 - i) for i in positions]
+            for subs in itertools.product((1, 2, 3), repeat=k):
+                masks.append(sum(x << shift for x, shift in zip(subs, shifts)))
+
+    return np.array(masks, dtype=np.uint64)
+
+def count_mismatches(packed, query):
+    """
+    Count the bases that differ between each of the given packed sequences and
+    the packed query sequence.
+    """
+    diff = np.asarray(packed, dtype=np.uint64) ^ np.uint64(query)
+    diff = (diff | (diff >> np.uint64(1))) & np.uint64(0x5555555555555555)
+    return _POPCOUNT[diff.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=int)
+
+def _reverse_complement(codes):
+    # A and T (0 and 3) and C and G (1 and 2) are complementary, unknown bases
+    # (255) stay unknown.
+    rc = codes[::-1].copy()
+    known = rc <= 3
+    rc[known] = 3 - rc[known]
+    return rc
+
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
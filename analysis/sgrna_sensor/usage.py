@@ -116,6 +116,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import docopt
+import functools
 import math
 import re
 import subprocess
@@ -126,6 +127,55 @@ from .helpers import *
 from .sequence import *
 
 def from_name(name, **kwargs):
+    factory, args, kwargs = parse_name(name, **kwargs)
+    return factory(*args, **kwargs)
+
+def validate_name(name):
+    """
+    Raise a ValueError if the given name doesn't refer to a design.
+
+    This checks that the spacer, ligand, and design factory all exist and that 
+    the factory accepts the given arguments, then builds the design to catch 
+    arguments with invalid values (e.g. a variant that isn't in the factory's 
+    table).  The variant tables are local to each factory, so building the 
+    design is the only way to check them.  The result for each name is 
+    remembered, though, so each name is only built once.
+
+    Only the ValueErrors that factories raise for unknown variants are 
+    reported as bad names; any other exception raised while building the 
+    design is a bug in the factory, and is allowed to propagate.
+    """
+    # Registering new spacers can change how names are parsed, so the cached 
+    # results are only good for one version of the registry.
+    error = _validate_name(name, spacer_registry().version)
+    if error: raise ValueError(error)
+
+@functools.lru_cache(maxsize=None)
+def _validate_name(name, registry_version):
+    import inspect
+
+    try:
+        factory, args, kwargs = parse_name(name)
+    except ValueError as error:
+        return f"Can't parse '{name}': {error}"
+
+    # Check the arguments before calling the factory, so that a TypeError from 
+    # inside the factory isn't mistaken for a name with the wrong arguments.
+    try:
+        inspect.signature(factory).bind(*args, **kwargs)
+    except TypeError as error:
+        return f"Can't parse '{name}': {error}"
+
+    try:
+        factory(*args, **kwargs)
+    except ValueError as error:
+        return f"Can't parse '{name}': {error}"
+
+def parse_name(name, **kwargs):
+    """
+    Work out which factory function the given name refers to, and which 
+    arguments should be passed to it.  Returns a (factory, args, kwargs) tuple.
+    """
     import re, inspect
 
     name = name.strip()
@@ -143,28 +193,23 @@ def from_name(name, **kwargs):
     if tokens[0] in ('sa', 'sp', 'sap'):
         kwargs['species'] = tokens.pop(0)
 
-    if tokens[0] == 'pam':
+    if tokens and tokens[0] == 'pam':
         kwargs['pam'] = tokens.pop(0)
 
-    try:
-        spacer(tokens[0], species=kwargs.get('species'))
-    except ValueError:
-        pass
-    else:
+    if tokens and spacer_registry().get(tokens[0], kwargs.get('species')) is not None:
         if 'target' not in kwargs:
             kwargs['target'] = tokens.pop(0)
 
-    try:
-        aptamer(tokens[0])
-    except ValueError:
-        pass
-    else:
+    if tokens and tokens[0] in APTAMERS:
         if 'ligand' not in kwargs:
             kwargs['ligand'] = tokens.pop(0)
 
     # The first token after the (optional) aptamer specifies the factory 
     # function to use and must exist in the global namespace. 
 
+    if not tokens:
+        raise ValueError("No design named in '{}'.".format(name))
+
     try:
         factory = globals()[tokens[0]]
     except KeyError:
@@ -184,7 +229,7 @@ def from_name(name, **kwargs):
 
     argspec = inspect.getargspec(factory)
     known_kwargs = {k:v for k,v in kwargs.items() if k in argspec.args}
-    return factory(*args, **known_kwargs)
+    return factory, args, known_kwargs
 
 def predict_fold(design, constraints=False, verbose=False):
     import shlex, re
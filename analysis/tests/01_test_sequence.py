@@ -264,3 +264,88 @@ def test_construct_class():
     assert dave.constraints == '...(()).........'
 
 
+
+def test_construct_copy():
+    alice = Construct('Alice')
+    alice += Domain('A', 'AAAAAA')
+    alice += Domain('C', 'CCCCCC')
+
+    bob = Construct('Bob')
+    bob += Domain('G', 'GGGGGG')
+    bob += Domain('T', 'TTTTTT')
+    alice.attach(bob, 'A', 3, 'C', 3)
+
+    assert alice.seq == 'AAAGGGGGGTTTTTTCCC'
+
+    ## Test that copies share the domains that haven't been changed.
+
+    copies = [alice.copy() for i in range(3)]
+
+    for copy in copies:
+        assert copy.seq == alice.seq
+        assert copy._domains[0] is alice._domains[0]
+        assert copy._domains[1] is alice._domains[1]
+
+    ## Test that changing a copy doesn't change the original.
+
+    copies[0]['A'].seq = 'TTTTTT'
+    copies[0][9] = 'A'
+
+    assert copies[0].seq == 'TTTGGGGGGATTTTTCCC'
+    assert copies[1].seq == 'AAAGGGGGGTTTTTTCCC'
+    assert alice.seq == 'AAAGGGGGGTTTTTTCCC'
+    assert bob.seq == 'GGGGGGTTTTTT'
+    assert copies[0]._domains[1] is alice._domains[1]
+
+    ## Test that changing the original doesn't change the copies.
+
+    alice['C'].seq = 'GGGGGG'
+    bob['G'].constraints = '((()))'
+
+    assert alice.seq == 'AAAGGGGGGTTTTTTGGG'
+    assert alice.constraints == '...((()))' + 9 * '.'
+    for copy in copies:
+        assert copy.seq.endswith('CCC')
+        assert copy.constraints == 18 * '.'
+
+    ## Test that domains looked up before the copy was made are safe to change.
+
+    c = alice['C']
+    copy = alice.copy()
+    c.seq = 'CCCCCC'
+
+    assert alice.seq == 'AAAGGGGGGTTTTTTCCC'
+    assert copy.seq == 'AAAGGGGGGTTTTTTGGG'
+
+    ## Test copies of copies.
+
+    copy_of_copy = copies[1].copy()
+    copies[1]['A'].seq = 'CCCCCC'
+    assert copies[1].seq.startswith('CCC')
+    assert copy_of_copy.seq.startswith('AAA')
+    assert copies[2].seq.startswith('AAA')
+
+    ## Test that constructs built from a copy share the copy's domains, not 
+    ## the original's.
+
+    alice = Construct('Alice')
+    alice += Domain('A', 'AAAA')
+    alice += Domain('C', 'CCCC')
+    copy = alice.copy()
+    new = copy + Domain('x', 'GG')
+    new['A'].seq = 'TTTT'
+
+    assert alice.seq == 'AAAACCCC'
+    assert copy.seq == 'TTTTCCCC'
+    assert new.seq == 'TTTTCCCCGG'
+
+    ## Test that discarded copies stop being tracked.
+
+    import gc
+
+    a = alice['A']
+    copies = [alice.copy() for i in range(100)]
+    assert len(a._sharers) == 100
+
+    del copies; gc.collect()
+    assert len(a._sharers) == 0
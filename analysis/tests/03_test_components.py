@@ -24,6 +24,46 @@ def test_aptamer():
     assert aptamer('amm').seq == 'UAUAAUCCUAAUGAUAUGGUUUGGGAGCUUCCACCAAGAGCCUUAAACUCUUGAUUA'
     assert aptamer('gua').seq == 'UAUAAUCGCGUGGAUAUGGCACGCAAGUUUCUACCGGGCACCGUAAAUGUCCGACUA'
     assert aptamer('ms2').seq == 'AACAUGAGGACCACCCAUGUU'
+    assert aptamer('g').seq == aptamer('gua').seq
+    assert aptamer('theo', liu=True).seq == 'AUACCACGCGAAAGCGCCUUGGCAG'
+    assert aptamer('theo', 'splitter').seq == 'GAAA'
+    assert aptamer('tet')['aptamer'].kd == 0.00077
+
+    # Each call should return independent domains, even though the templates
+    # are shared.
+    a, b = aptamer('theo'), aptamer('theo')
+    a['aptamer/splitter'].seq = 'UUCG'
+    assert a.seq == 'AUACCAGCCUUCGGGCCCUUGGCAG'
+    assert b.seq == 'AUACCAGCCGAAAGGCCCUUGGCAG'
+    assert aptamer('theo').seq == 'AUACCAGCCGAAAGGCCCUUGGCAG'
+
+    with pytest.raises(NotImplementedError):
+        aptamer('bca')
+
+@pytest.fixture
+def fresh_aptamers():
+    # Aptamers added by one test shouldn't be visible to the others, so put
+    # back the original set afterwards.  Names may parse differently while
+    # the extra aptamers are registered, so forget any validated meanwhile.
+    from sgrna_sensor import usage
+
+    original = APTAMERS.copy()
+    yield APTAMERS
+    APTAMERS.clear()
+    APTAMERS.update(original)
+    usage._validate_name.cache_clear()
+
+def test_add_aptamer(fresh_aptamers):
+    with pytest.raises(AssertionError):
+        add_aptamer(('test mismatch',), ('AAA', 'G', 'UUU'), ('(((', '.'))
+    with pytest.raises(AssertionError):
+        add_aptamer(('test length',), ('AAAGUUU',), ('(((.))',))
+
+    add_aptamer(('test hairpin',), ('GGGAAACCC',), ('(((...)))',), 1.0)
+    assert 'test hairpin' in APTAMERS
+    assert aptamer('test hairpin').seq == 'GGGAAACCC'
+    assert aptamer('test hairpin').constraints == '(((...)))'
+    assert aptamer('test hairpin')['aptamer'].kd == 1.0
 
 def test_spacer():
     with pytest.raises(ValueError):
@@ -35,6 +75,64 @@ def test_spacer():
     assert spacer('vegfa') == 'GGGTGGGGGGAGTTTGCTCC'
     assert spacer('k1') == spacer('klein1') == 'GGGCACGGGCAGCTTGCCCG'
     assert spacer('k2') == spacer('klein2') == 'GTCGCCCTCGAACTTCACCT'
+    assert spacer('d1') == 'GGGAACTCAAGAGCGGAGGG'
+    assert spacer('fol1') == 'TCCACGATGAGGTAACCCCA'
+    assert spacer('g1', 'sa') == spacer('g1', 'sap') == 'AACATCACCATCTAATTCAAC'
+
+    with pytest.raises(ValueError):
+        spacer('rfp', 'not a species')
+
+def test_spacer_registry():
+    registry = SpacerRegistry()
+    registry.add_spacers({'x1': 'ACGTACGTACGTACGTACGT', 'x2': 'TTTTTTTTTTTTTTTTTTTT'})
+    registry.add_alias('x', 'x1')
+    registry.add_spacer('y1', 'ACGUACGUACGUACGUACGU', 'sa')
+
+    assert registry.lookup('x') == registry.lookup('x1') == 'ACGTACGTACGTACGTACGT'
+    assert registry.get('x3') is None
+    assert registry.get('y1', 'sap') == 'ACGUACGUACGUACGUACGU'
+    assert registry.find('acgtacgtacgtacgtacgt') == ['x1', 'y1']
+    assert registry.find('ACGTACGTACGTACGTACGT', 'sa') == ['y1']
+
+    # Redefining a spacer is only allowed if asked for explicitly.
+    registry.add_spacer('x2', 'TTTTTTTTTTTTTTTTTTTT')
+    with pytest.raises(ValueError):
+        registry.add_spacer('x2', 'GGGGGGGGGGGGGGGGGGGG')
+
+    registry.add_spacer('x2', 'GGGGGGGGGGGGGGGGGGGG', overwrite=True)
+    assert registry.find('TTTTTTTTTTTTTTTTTTTT') == []
+    assert registry.find('GGGGGGGGGGGGGGGGGGGG') == ['x2']
+
+    with pytest.raises(ValueError):
+        registry.lookup('x3')
+    with pytest.raises(ValueError):
+        registry.lookup('x1', 'not a species')
+
+@pytest.fixture
+def fresh_spacer_registry():
+    # Spacers registered by one test shouldn't be visible to the others, so
+    # start from (and leave behind) a newly built registry.  The registry
+    # version restarts too, so forget any names validated against this one.
+    from sgrna_sensor import usage
+
+    spacer_registry.cache_clear()
+    yield spacer_registry()
+    spacer_registry.cache_clear()
+    usage._validate_name.cache_clear()
+
+def test_register_spacers(tmp_path, fresh_spacer_registry):
+    table = tmp_path / 'spacers.tsv'
+    table.write_text('''\
+# name\tsequence
+testg1\tGATTACAGATTACAGATTAC
+testg2\tCATTACAGATTACAGATTAC
+''')
+    register_spacers(table)
+
+    assert spacer('testg1') == 'GATTACAGATTACAGATTAC'
+    assert spacer_registry().find('CATTACAGATTACAGATTAC') == ['testg2']
+    assert from_name('testg2 on').dna.startswith('CATTACAGATTACAGATTAC')
+    assert spacer_registry() is fresh_spacer_registry
 
 def test_repeat():
     assert repeat('dummy', 1, "5'") == 'U'
@@ -31,6 +31,14 @@ def test_from_name():
     assert from_name('theo/cb') == cb()
     assert from_name('tet/cb') == cb(ligand='tet')
 
+def test_validate_name():
+    for name in ['wt', 'cb/wo', 'tet/cb', 'rfp rxb 11,1', 'mhf 30', 'us(4)']:
+        validate_name(name)
+
+    for name in ['', 'nosuchdesign', 'aavs', 'rxb', 'on 1 2 3 4 5', 'rxb/999 on', 'mhf/99']:
+        with pytest.raises(ValueError):
+            validate_name(name)
+
 def test_wt_sgrna():
     assert from_name('wt') == 'GUUUUAGAGCUAGAAAUAGCAAGUUAAAAU' 'AAGGCUAGUCCGU' 'UAUCAACUUGAAAAAGUGGCACCGAGUCGGUGC' 'UUUUUU'
 
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import pytest
+import numpy as np
+from sgrna_sensor import *
+
+def test_library_class():
+    library = Library('ARCN')
+
+    assert len(library) == 8
+    assert library.size == library_size('ARCN')
+    assert library.num_degenerate_positions == 2
+    assert list(library) == [
+            'AACA', 'AACC', 'AACG', 'AACT',
+            'AGCA', 'AGCC', 'AGCG', 'AGCT',
+    ]
+
+    for i, seq in enumerate(library):
+        assert library[i] == seq
+        assert library.rank(seq) == i
+        assert seq in library
+
+    assert library[-1] == 'AGCT'
+    assert library.rank('agcu') == 7
+
+    assert 'ACCA' not in library
+    assert 'AACAA' not in library
+
+    with pytest.raises(IndexError):
+        library[8]
+    with pytest.raises(IndexError):
+        library[-9]
+    with pytest.raises(IndexError):
+        library[2**63]
+    with pytest.raises(TypeError):
+        library[1.0]
+    with pytest.raises(ValueError):
+        library.rank('ACCA')
+    with pytest.raises(ValueError):
+        Library('AXG')
+
+def test_library_from_construct():
+    construct = Construct('Alice')
+    construct += Domain('A', 'AAAA')
+    construct += Domain('N', 'NN')
+    construct += Domain('U', 'UUUU')
+
+    library = Library(construct)
+
+    assert len(library) == 16
+    assert library[0] == 'AAAAAATTTT'
+    assert library[15] == 'AAAATTTTTT'
+
+def test_library_chunks():
+    library = Library('NNNNAN')
+    expected = np.array([library.unrank([i])[0] for i in range(len(library))])
+
+    chunks = list(library.iter_chunks(chunk_size=100, packed=False))
+    assert [len(x) for x in chunks] == 10 * [100] + [24]
+    np.testing.assert_array_equal(np.vstack(chunks), expected)
+
+    chunks = list(library.iter_chunks(chunk_size=100, start=50, stop=150))
+    assert [x.shape for x in chunks] == [(100, 2)]
+    np.testing.assert_array_equal(unpack_2bit(chunks[0], 6), expected[50:150])
+
+    np.testing.assert_array_equal(library.rank_codes(expected), range(len(library)))
+
+def test_library_sample():
+    library = Library('ACNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNNGT')
+    assert library.size == 4**40
+
+    codes = library.sample(1000, seed=0)
+    assert codes.shape == (1000, 44)
+    assert (library.rank_codes(codes) >= 0).all()
+
+    # Each base should show up about equally often at each position.
+    counts = np.array([(codes[:, 2:-2] == i).mean() for i in range(4)])
+    np.testing.assert_allclose(counts, 0.25, atol=0.01)
+
+    packed = library.sample(1000, seed=0, packed=True)
+    np.testing.assert_array_equal(unpack_2bit(packed, 44), codes)
+
+    seq = decode_dna(codes[0])[0]
+    assert library[library.rank(seq)] == seq
+    assert library[-1] == 'AC' + 'T' * 40 + 'GT'
+
+    with pytest.raises(IndexError):
+        library[4**40]
+
+def test_pack_2bit():
+    codes = encode_dna('ACGTTGCAA')
+    np.testing.assert_array_equal(codes, [0, 1, 2, 3, 3, 2, 1, 0, 0])
+
+    packed = pack_2bit(codes)
+    assert packed.tolist() == [[0b00011011, 0b11100100, 0b00000000]]
+    np.testing.assert_array_equal(unpack_2bit(packed, 9)[0], codes)
+    assert decode_dna(codes) == ['ACGTTGCAA']
+
+    with pytest.raises(ValueError):
+        encode_dna('ACGN')
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import gzip
+import pytest
+from sgrna_sensor import *
+from sgrna_sensor import fastq
+from conftest import UPSTREAM, DOWNSTREAM, make_design
+
+def make_read(variant, reverse=False, low_quality=False):
+    seq = UPSTREAM + variant + DOWNSTREAM
+    qual = ['I'] * len(seq)
+    if low_quality:
+        qual[len(UPSTREAM) + 1] = '#'
+    if reverse:
+        seq = dna_reverse_complement(seq)
+        qual = qual[::-1]
+    return seq, ''.join(qual)
+
+def write_fastq(path, reads):
+    with gzip.open(path, 'wt') as file:
+        for i, (seq, qual) in enumerate(reads):
+            file.write(f'@read{i}\n{seq}\n+\n{qual}\n')
+    return path
+
+def test_variable_region():
+    region = fastq.VariableRegion(make_design(), flank_length=6)
+
+    assert len(region) == 4
+    assert len(region.library) == 128
+    assert region.upstream == b'CGTTTA'
+    assert region.downstream == b'GCACTG'
+
+    assert region.find(b'CGTTTAACGTGCACTG') == 6
+    assert region.find(b'CGTTTAACGTGCACTT') is None
+    assert region.find(b'ACGTGCACTG') is None
+
+    # The upstream flank occurs by chance before the variable region.
+    assert region.find(b'CGTTTAGGCGTTTAACGTGCACTG') == 14
+    assert region.find(b'CGTTTACGTTTAACGTGCACTG') == 12
+
+    with pytest.raises(ValueError):
+        fastq.VariableRegion(Construct('x') + Domain('A', 'AAAA'))
+
+def test_count_variants(tmp_path):
+    reads_1 = [
+            make_read('ACGT'),
+            make_read('ACGT'),
+            make_read('ACGT'),
+            make_read('ACGT', reverse=True),
+            make_read('TTCA', reverse=True),
+            make_read('TTCA', reverse=True),
+            make_read('ACGT', low_quality=True),
+            make_read('AAAA'),
+            ('ACGTACGTACGTACGTACGT', 'IIIIIIIIIIIIIIIIIIII'),
+    ]
+    reads_2 = [
+            make_read('TTCA'),
+    ]
+    paths = [
+            write_fastq(tmp_path / 'reads_1.fastq.gz', reads_1),
+            write_fastq(tmp_path / 'reads_2.fastq.gz', reads_2),
+    ]
+
+    counts, stats = fastq.count_variants(paths, make_design(), workers=1)
+
+    assert list(counts.columns) == [str(x) for x in paths]
+    assert sorted(counts.index) == ['ACGT', 'TTCA']
+    assert counts.loc['ACGT'].tolist() == [4, 0]
+    assert counts.loc['TTCA'].tolist() == [2, 1]
+
+    # Count tables from different runs can be combined.
+    combined = counts.join(counts.add_suffix(' again'))
+    assert combined.shape == (2, 4)
+
+    assert stats.loc[str(paths[0])].to_dict() == {
+            'reads': 9,
+            'no_flanks': 1,
+            'low_quality': 1,
+            'not_in_library': 1,
+            'counted': 6,
+    }
+    assert stats.loc[str(paths[1])].to_dict() == {
+            'reads': 1,
+            'no_flanks': 0,
+            'low_quality': 0,
+            'not_in_library': 0,
+            'counted': 1,
+    }
+
+def test_iter_fastq(tmp_path):
+    path = tmp_path / 'bad.fastq'
+    path.write_text('@read\nACGT\n+\nIII\n')
+
+    with pytest.raises(ValueError):
+        list(fastq.iter_fastq(path))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import pytest
+import numpy as np
+import pandas as pd
+from sgrna_sensor import enrichment
+from conftest import UPSTREAM, DOWNSTREAM, make_design
+
+def make_counts():
+    return pd.DataFrame(
+            {'pre': [10, 10, 0], 'post': [30, 10, 0]},
+            index=pd.Index(['ACGT', 'TTCA', 'AGGA'], name='variant'),
+    )
+
+def test_calc_enrichment():
+    counts = pd.DataFrame(
+            {'pre': [10, 30, 0], 'post': [20, 10, 10]},
+            index=pd.Index(['ACGT', 'TTCA', 'AGGA'], name='variant'),
+    )
+    df = enrichment.calc_enrichment(counts, 'pre', 'post')
+
+    # Both rounds have the same total (with pseudocounts), so the
+    # enrichments are just the ratios of the counts.
+    ref = np.array([10.5, 30.5, 0.5])
+    sel = np.array([20.5, 10.5, 10.5])
+    err = np.sqrt(1 / ref + 1 / sel) / np.log(2)
+
+    assert list(df.index) == ['ACGT', 'TTCA', 'AGGA']
+    assert df['count_reference'].tolist() == [10, 30, 0]
+    assert df['count_selected'].tolist() == [20, 10, 10]
+    assert df['log2_enrichment'].values == pytest.approx(np.log2(sel / ref))
+    assert df['std_err'].values == pytest.approx(err)
+    assert df['z'].values == pytest.approx(np.log2(sel / ref) / err)
+
+def test_calc_logo():
+    logo = enrichment.calc_logo(make_counts(), make_design(), 'pre', 'post')
+    logo = logo.set_index(['position', 'base'])
+
+    # The S position only has rows for C and G.
+    assert len(logo) == 4 + 4 + 2 + 4
+    assert list(logo.loc[14].index) == ['C', 'G']
+
+    assert logo.loc[(12, 'A'), 'count_reference'] == 10
+    assert logo.loc[(12, 'A'), 'count_selected'] == 30
+    assert logo.loc[(12, 'T'), 'count_reference'] == 10
+    assert logo.loc[(12, 'T'), 'count_selected'] == 10
+    assert logo.loc[(12, 'C'), 'count_reference'] == 0
+
+    # Bases that aren't allowed don't get pseudocounts, so only the C and G
+    # counts go into the frequencies at the S position.
+    ref = np.array([10.5, 10.5])
+    sel = np.array([10.5, 30.5])
+    lfc = np.log2(sel / sel.sum()) - np.log2(ref / ref.sum())
+    assert logo.loc[14, 'log2_enrichment'].values == pytest.approx(lfc)
+    assert np.isfinite(logo['std_err']).all()
+
+def test_calc_logo_empty():
+    counts = make_counts().iloc[:0]
+    logo = enrichment.calc_logo(counts, make_design(), 'pre', 'post')
+
+    assert logo.empty
+    assert list(logo.columns) == enrichment.LOGO_COLS
+
+def test_from_variant():
+    design = make_design()
+    hit = enrichment.from_variant(design, 'ACGT')
+
+    assert hit.name == 'test[ACGT]'
+    assert hit.seq == UPSTREAM + 'ACGT' + DOWNSTREAM
+    assert design.seq == UPSTREAM + 'NNSN' + DOWNSTREAM
+
+    with pytest.raises(ValueError):
+        enrichment.from_variant(design, 'AAAA')
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import os
+import gzip
+import pytest
+import numpy as np
+from sgrna_sensor import *
+from sgrna_sensor import sites
+
+def write_fasta(path, genome):
+    with gzip.open(path, 'wt') as file:
+        for name, seq in genome.items():
+            file.write(f'>{name} description\n')
+            file.write('\n'.join(seq[i:i+60] for i in range(0, len(seq), 60)))
+            file.write('\n')
+    return path
+
+def random_genome(seed, length=20000):
+    rng = np.random.default_rng(seed)
+    seq = list(rng.choice(list('ACGT'), length))
+
+    # Plant a few variants of one spacer, so that there are off-targets with
+    # every number of mismatches.
+    spacer = 'GATTACAGATTACAGATTAC'
+    for i, num_mismatches in enumerate([0, 1, 2, 3, 3, 4]):
+        variant = list(spacer)
+        for j in rng.choice(len(spacer), num_mismatches, replace=False):
+            variant[j] = 'ACGT'[('ACGT'.index(variant[j]) + 1) % 4]
+        pos = 1000 + 3000 * i
+        seq[pos:pos+23] = variant + list('TGG')
+
+    seq = ''.join(seq)
+    return {'chrA': seq[:length//2], 'chrB': seq[length//2:]}
+
+def count_off_targets_brute_force(spacers, query, max_mismatches=3):
+    spacers = np.array([list(x) for x in spacers])
+    mismatches = (spacers != np.array(list(query))).sum(axis=1)
+    return np.bincount(
+            mismatches[mismatches <= max_mismatches],
+            minlength=max_mismatches + 1,
+    )
+
+def test_find_sites():
+    spacer_1 = 'GATTACAGATTACAGATTAC'
+    spacer_2 = 'TATTTCAGATTACATTTTAA'
+    genome = {
+            'chr1': 'AAAA' + spacer_1 + 'TGG' + 'AAAAAAAA' + dna_reverse_complement(spacer_2 + 'AGG') + 'AAAA',
+    }
+    df = sites.find_sites(genome)
+
+    assert list(df.columns) == sites.SITE_COLS
+    assert df.to_dict('records') == [
+            dict(chrom='chr1', strand='+', start=4, end=24, spacer=spacer_1, pam='TGG'),
+            dict(chrom='chr1', strand='-', start=38, end=58, spacer=spacer_2, pam='AGG'),
+    ]
+    assert genome['chr1'][38:58] == dna_reverse_complement(spacer_2)
+
+    with pytest.raises(ValueError):
+        sites.find_sites(genome, 'xx')
+
+def test_count_off_targets(tmp_path):
+    fasta = write_fasta(tmp_path / 'genome.fa.gz', random_genome(0))
+    df = sites.find_sites(fasta)
+    index = sites.load_seed_index(fasta, cache=tmp_path / 'cache')
+
+    assert len(index) == len(df)
+
+    queries = ['GATTACAGATTACAGATTAC'] + list(df['spacer'].sample(20, random_state=0))
+    for query in queries:
+        expected = count_off_targets_brute_force(df['spacer'], query)
+        assert index.count_off_targets(query).tolist() == expected.tolist()
+
+    counts = index.count_off_targets('GATTACAGATTACAGATTAC')
+    assert (counts >= [1, 1, 1, 2]).all()
+
+    with pytest.raises(ValueError):
+        index.count_off_targets('GATTACA')
+
+def test_rank_spacers(tmp_path):
+    fasta = write_fasta(tmp_path / 'genome.fa.gz', random_genome(0))
+    df = sites.find_sites(fasta).head(50)
+    index = sites.load_seed_index(fasta, cache=tmp_path / 'cache')
+
+    ranked = sites.rank_spacers(df, index, workers=1)
+    assert sorted(ranked['spacer']) == sorted(df['spacer'])
+
+def test_load_seed_index_cache(tmp_path):
+    fasta = write_fasta(tmp_path / 'genome.fa.gz', random_genome(0))
+    cache = tmp_path / 'cache'
+
+    index_1 = sites.load_seed_index(fasta, cache=cache)
+    seeds_path = index_1.directory / 'seeds.npy'
+    mtime = seeds_path.stat().st_mtime_ns
+
+    # The index is reused as long as the FASTA file doesn't change.
+    index_2 = sites.load_seed_index(fasta, cache=cache)
+    assert index_2.directory == index_1.directory
+    assert seeds_path.stat().st_mtime_ns == mtime
+
+    # ...and rebuilt when it does.
+    genome = random_genome(1, length=10000)
+    write_fasta(fasta, genome)
+    stat = fasta.stat()
+    os.utime(fasta, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    index_3 = sites.load_seed_index(fasta, cache=cache)
+    df = sites.find_sites(genome)
+
+    assert index_3.directory == index_1.directory
+    assert len(index_3) == len(df)
+    assert len(index_3) != len(index_1)
+
+    query = df['spacer'].iloc[0]
+    expected = count_off_targets_brute_force(df['spacer'], query)
+    assert index_3.count_off_targets(query).tolist() == expected.tolist()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import pytest
+import numpy as np
+from pathlib import Path
+from sgrna_sensor import rule_set_2
+
+DOENCH_SPACERS = Path(rule_set_2.__file__).parent / 'doench_spacers.tsv'
+
+def test_score_spacers():
+    # Scores calculated by the original python2/scikit-learn 0.16 code.
+    rows = [line.split() for line in DOENCH_SPACERS.read_text().splitlines()]
+    seqs = [x[1] for x in rows]
+    expected = np.array([float(x[2]) for x in rows])
+
+    scores = rule_set_2.score_spacers(seqs)
+    assert scores == pytest.approx(expected, abs=5e-13, rel=0)
+
+    # Lower case sequences and sequences that have been scored before give
+    # the same results.
+    scores = rule_set_2.score_spacers([x.lower() for x in seqs])
+    assert scores == pytest.approx(expected, abs=5e-13, rel=0)
+
+def test_score_cache():
+    model = rule_set_2.Model(rule_set_2.load_model().pickle_path, cache_size=4)
+    seqs = [x[1] for x in (
+            line.split() for line in DOENCH_SPACERS.read_text().splitlines())]
+
+    scores = model.score(seqs)
+    assert len(model._cache) == 4
+    assert list(model._cache) == [(x, None, None) for x in seqs[-4:]]
+
+    # Scoring more sequences than fit in the cache still works.
+    assert model.score(seqs[:2] + seqs) == pytest.approx(np.r_[scores[:2], scores])
+    assert len(model._cache) == 4
+
+    # Sequences that are scored again are kept the longest.
+    model.score(seqs[-1:])
+    assert list(model._cache)[-1] == (seqs[-1], None, None)
+
+    model.cache_size = 0
+    model.clear_cache()
+    assert model.score(seqs) == pytest.approx(scores)
+    assert len(model._cache) == 0
+
+    with pytest.raises(ValueError):
+        model.predict(np.zeros((1, 3)))
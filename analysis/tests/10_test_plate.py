@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+import pytest
+import numpy as np
+import pandas as pd
+from sgrna_sensor import plate
+
+def test_compile_layout():
+    layout = {
+            'plate': {'volume': 100, 'ligand': {'name': 'theo'}},
+            'row': {'A': {'volume': 90, 'replicate': 1}},
+            'col': {'1': {'volume': 80}, '2': {'replicate': 2}},
+            'well': {'B3': {'volume': 7}, 'A1': {'note': 'x'}},
+    }
+    df = plate.compile_layout(layout)
+
+    # Wells named explicitly or implied by the row and column blocks, sorted
+    # by position.
+    assert list(df.index) == ['A1', 'A2', 'B3']
+    assert df.loc['B3', ['row', 'col', 'row_0', 'col_0']].tolist() == ['B', '3', 1, 2]
+
+    # More specific blocks take precedence: well, then row, then col, then
+    # plate.
+    assert df['volume'].tolist() == [90, 90, 7]
+    assert df['replicate'].tolist()[:2] == [1, 1]
+    assert np.isnan(df.loc['B3', 'replicate'])
+    assert df['ligand.name'].tolist() == ['theo'] * 3
+    assert df.loc['A1', 'note'] == 'x'
+    assert pd.isnull(df.loc['A2', 'note'])
+
+def test_compile_layout_dtypes():
+    layout = {
+            'plate': {'volume': 100, 'flag': True},
+            'col': {'2': {'volume': 50}},
+            'well': {
+                'C3': {'volume': 7},
+                'A1': {'name': 'x'},
+                'A2': {'dose': 0.5},
+                'C2': {'dose': 1},
+            },
+    }
+    df = plate.compile_layout(layout)
+
+    # Every well has an integer volume, even though the blocks that give it
+    # have different settings.
+    assert df['volume'].dtype == np.int64
+    assert df['volume'].tolist() == [100, 50, 50, 7]
+    assert df['dose'].dtype == np.float64
+    assert df['flag'].dtype == bool
+    assert df['name'].dtype == object
+
+def test_compile_layout_template(tmp_path):
+    (tmp_path / 'template.toml').write_text('''\
+[plate]
+volume = 100
+ligand = 'theo'
+
+[col.1]
+volume = 50
+''')
+    (tmp_path / 'plate.toml').write_text('''\
+template = 'template.toml'
+
+[plate]
+ligand = 'none'
+
+[well.A1]
+[well.A2]
+volume = 10
+''')
+    layout = plate.load_layout(tmp_path / 'plate.toml')
+    df = plate.compile_layout(layout)
+
+    # Settings from the layout itself take precedence over the template's,
+    # even in less specific blocks.
+    assert df['volume'].tolist() == [50, 10]
+    assert df['ligand'].tolist() == ['none', 'none']
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+import pytest
+import numpy as np
+from sgrna_sensor import growth
+
+@pytest.mark.parametrize('model', list(growth.MODELS))
+def test_fit_well(model):
+    rng = np.random.default_rng(0)
+    t = np.arange(0, 600, 10.)
+
+    # A well that grows from OD 0.02 to 1.0, with a 2 h lag.
+    log_od = growth.gompertz(t, np.log(0.02), np.log(1.0 / 0.02), 0.02, 120)
+    od = np.exp(log_od) + rng.normal(0, 0.003, len(t))
+    fit = dict(zip(growth.FIT_COLS, growth.fit_well((t, od), model)))
+
+    assert fit['num_points'] == len(t)
+    assert fit['lag_min'] == pytest.approx(120, abs=20)
+    assert fit['max_growth_rate'] == pytest.approx(0.02, rel=0.1)
+    assert fit['doubling_time_min'] == pytest.approx(np.log(2) / fit['max_growth_rate'])
+    assert fit['carrying_capacity'] == pytest.approx(1.0, rel=0.1)
+
+    # A blank well, which is just noise around a constant OD.
+    od = 0.05 + rng.normal(0, 0.003, len(t))
+    fit = dict(zip(growth.FIT_COLS, growth.fit_well((t, od), model)))
+
+    assert fit['num_points'] == len(t)
+    assert fit['rmse'] > 0
+    for col in ['od0', 'lag_min', 'max_growth_rate', 'doubling_time_min', 'carrying_capacity']:
+        assert np.isnan(fit[col])
+
+def test_fit_well_too_few_points():
+    fit = growth.fit_well(([0, 10, 20, 30], [0.1, 0.2, 0.4, 0.8]))
+    assert fit[0] == 4
+    assert np.isnan(fit[1:]).all()
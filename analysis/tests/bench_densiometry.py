@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""\
+Benchmark the densiometry aggregation functions on a large synthetic data
+set, and make sure they give the same results as the original (much slower)
+groupby/apply implementation.
+
+Usage:
+    bench_densiometry.py [-n <lanes>] [--seed <int>] [--no-reference]
+
+Options:
+    -n --num-lanes <lanes>  [default: 100000]
+        The number of lanes (i.e. reactions with or without ligand) to
+        simulate.  Each lane has two bands.
+
+    --seed <int>  [default: 0]
+        The seed for the random number generator.
+
+    --no-reference
+        Only time the vectorized functions.  The reference implementation
+        takes several minutes for 10⁵ lanes.
+"""
+
+import docopt
+import numpy as np
+import pandas as pd
+from time import perf_counter
+from sgrna_sensor import densiometry
+
+def make_synthetic_data(num_lanes, seed=0):
+    """
+    Simulate one apo and one holo lane for every spacer/design in each
+    experiment.  Dates are shared by several experiments, to exercise the
+    tie-breaking in `calc_mean_change()`.
+    """
+    rng = np.random.RandomState(seed)
+
+    num_expts = 25
+    num_spacers = 50
+    num_designs = max(num_lanes // (2 * num_expts * num_spacers), 1)
+
+    expts = [f'gels/2017{i:04d}_gel.xlsx' for i in range(num_expts)]
+    dates = pd.to_datetime('2017-01-01') + pd.to_timedelta(
+            np.arange(num_expts) // 3, unit='D')
+    long_gel = rng.rand(num_expts) < 0.5
+
+    index = pd.MultiIndex.from_product([
+            range(num_expts),
+            [f'sp{i}' for i in range(num_spacers)],
+            [f'rxb {i},1' for i in range(num_designs)],
+            [0, 10000],
+            [0, 1],
+    ], names=['i', 'spacer', 'design', 'ligand', 'cut'])
+    df = index.to_frame(index=False)
+
+    i = df.pop('i').values
+    cut = df.pop('cut').values.astype(bool)
+    df['expt'] = np.array(expts)[i]
+    df['band'] = np.where(
+            long_gel[i],
+            np.where(cut, 2000, 4000),
+            np.where(cut, 350, 500),
+    )
+    df['pixels'] = rng.randint(1, 50_000, size=len(df))
+    df['date'] = dates[i]
+    df['order'] = rng.randint(0, 1000, size=len(df))
+
+    return df.sample(frac=1, random_state=rng).reset_index(drop=True)
+
+
+# The original implementation, kept as a reference.
+
+def ref_calc_percent_cut(df):
+    return df.\
+            groupby(['spacer', 'design', 'expt', 'ligand']).\
+            apply(ref_percent_cut)
+
+def ref_percent_cut(group):
+    if set(group.band) == {500, 350}:
+        uncut_px = 500 * group[group.band == 500].pixels.iat[0]
+        cut_px = 350 * group[group.band == 350].pixels.iat[0]
+    elif set(group.band) == {4000, 2000}:
+        uncut_px = group[group.band == 4000].pixels.iat[0]
+        cut_px = group[group.band == 2000].pixels.iat[0]
+    else:
+        raise ValueError(f'Unexpected bands:\n{group}')
+
+    return pd.Series({
+        'percent_cut': cut_px / (uncut_px + cut_px),
+        'date': min(group.date),
+        'order': min(group.order),
+    })
+
+def ref_calc_percent_change(df):
+    return ref_calc_percent_cut(df).\
+            groupby(['spacer', 'design', 'expt']).\
+            apply(ref_percent_change)
+
+def ref_percent_change(group):
+    group = group.reset_index()
+    apo_percent = group[group.ligand == 0].percent_cut.iat[0]
+    holo_percent = group[group.ligand == 10000].percent_cut.iat[0]
+    return pd.Series({
+        'apo_percent': apo_percent,
+        'holo_percent': holo_percent,
+        'percent_change': holo_percent - apo_percent,
+        'date': min(group.date),
+        'order': min(group.order),
+    })
+
+def ref_calc_mean_change(df):
+    return ref_calc_percent_change(df).\
+            groupby(['spacer', 'design']).\
+            apply(ref_mean_change).reset_index()
+
+def ref_mean_change(group):
+    earliest = group.date.idxmin()
+
+    def most_extreme(x):
+        a, b = min(x), max(x)
+        return a if abs(a) > abs(b) else b
+
+    def least_extreme(x):
+        a, b = min(x), max(x)
+        return a if abs(a) < abs(b) else b
+
+    return pd.Series({
+        'earliest_date': group.date.loc[earliest],
+        'earliest_order': group.order.loc[earliest],
+
+        'mean_change': group.percent_change.mean(),
+        'min_change': least_extreme(group.percent_change),
+        'max_change': most_extreme(group.percent_change),
+        'std_change': group.percent_change.std(),
+
+        'mean_apo': group.apo_percent.mean(),
+        'min_apo': least_extreme(group.apo_percent),
+        'max_apo': most_extreme(group.apo_percent),
+        'std_apo': group.apo_percent.std(),
+
+        'mean_holo': group.holo_percent.mean(),
+        'min_holo': least_extreme(group.holo_percent),
+        'max_holo': most_extreme(group.holo_percent),
+        'std_holo': group.holo_percent.std(),
+
+        'num_replicates': len(group),
+    })
+
+
+def time_it(f, *args):
+    start = perf_counter()
+    result = f(*args)
+    return result, perf_counter() - start
+
+def check_equal(expected, actual):
+    # The reference implementation builds each row from a Series of mixed 
+    # types, so its columns come back as objects.  The means and standard 
+    # deviations are summed in a different order by groupby(), so they can 
+    # differ in the last bit.  Everything else should be exactly the same.
+    expected = expected.infer_objects()
+    stats = [x for x in expected if x.startswith(('mean_', 'std_'))]
+
+    pd.testing.assert_frame_equal(
+            expected.drop(columns=stats),
+            actual.drop(columns=stats),
+            check_dtype=False,
+            check_exact=True,
+    )
+    pd.testing.assert_frame_equal(
+            expected[stats],
+            actual[stats],
+            rtol=1e-12,
+            atol=1e-15,
+    )
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    df = make_synthetic_data(int(args['--num-lanes']), int(args['--seed']))
+
+    print(f"{len(df) // 2} lanes")
+
+    for name in ['calc_percent_cut', 'calc_percent_change', 'calc_mean_change']:
+        actual, t = time_it(getattr(densiometry, name), df)
+        print(f"{name + ':':21s} {t:8.3f}s", end='', flush=True)
+
+        if not args['--no-reference']:
+            expected, t_ref = time_it(globals()['ref_' + name], df)
+            check_equal(expected, actual)
+            print(f" {t_ref:8.3f}s (reference)  {t_ref / t:5.0f}x", end='')
+
+        print()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""\
+Benchmark the qPCR aggregation functions on a large synthetic data set, and
+make sure they give the same results as the original groupby/apply
+implementation.
+
+Usage:
+    bench_qpcr.py [-n <runs>] [--seed <int>] [--no-reference]
+
+Options:
+    -n --num-runs <runs>  [default: 100]
+        The number of qPCR runs (i.e. 384-well plates) to simulate.
+
+    --seed <int>  [default: 0]
+        The seed for the random number generator.
+
+    --no-reference
+        Only time the vectorized functions.
+"""
+
+import docopt
+import numpy as np
+import pandas as pd
+from time import perf_counter
+from sgrna_sensor import qpcr
+
+ATTRS = ['primers', 'run', 'sgrna', 'ligand', 'time']
+GENES = dict(expt='gfp', ref='16s')
+
+def make_synthetic_data(num_runs, seed=0):
+    """
+    Simulate triplicate reactions for two genes, four sgRNAs, two ligand
+    conditions, and eight timepoints in each run.  About 2% of the Cq values
+    are missing, as if the reactions never crossed the threshold.
+    """
+    rng = np.random.RandomState(seed)
+
+    index = pd.MultiIndex.from_product([
+            ['gfp', '16s'],
+            [f'run_{i}' for i in range(num_runs)],
+            ['on', 'off', 'rxb/11/1', 'mhf/30'],
+            [False, True],
+            [0, 15, 30, 45, 60, 90, 120, 180],
+            range(3),
+    ], names=ATTRS + ['replicate'])
+    df = index.to_frame(index=False)
+
+    df['cq'] = rng.normal(20, 3, size=len(df))
+    df.loc[rng.rand(len(df)) < 0.02, 'cq'] = np.nan
+
+    return df.sample(frac=1, random_state=rng).reset_index(drop=True)
+
+
+# The original implementation, kept as a reference.
+
+def ref_calc_cq(df, attrs):
+
+    def aggregate_cq(df):
+        row = pd.Series(dtype=float)
+        row['n'] = len(df['cq'])
+        row['n_nan'] = df['cq'].isnull().sum()
+        row['cq_mean'] = df['cq'].mean()
+        row['cq_median'] = df['cq'].median()
+        row['cq_min'] = df['cq'].min()
+        row['cq_max'] = df['cq'].max()
+        row['cq_std'] = df['cq'].std()
+        return row
+
+    return df.groupby(attrs).apply(aggregate_cq)
+
+def ref_calc_Δcq(cq, genes):
+    x = cq.loc[genes['expt']]
+    x0 = cq.loc[genes['ref']]
+
+    df = pd.DataFrame(index=x.index)
+    df['Δcq_mean'] = x['cq_mean'] - x0['cq_mean']
+    df['Δcq_median'] = x['cq_median'] - x0['cq_median']
+    df['Δcq_std'] = np.sqrt(x['cq_std']**2 + x0['cq_std']**2)
+
+    df['fold_change'] = 2**(-df['Δcq_mean'])
+    df['fold_change_bound'] = 2**(-df['Δcq_mean'] + df['Δcq_std'])
+    df['fold_change_err'] = df['fold_change_bound'] - df['fold_change']
+
+    return df
+
+
+def time_it(f, *args):
+    start = perf_counter()
+    result = f(*args)
+    return result, perf_counter() - start
+
+def check_equal(expected, actual, rtol=1e-12):
+    # The means and standard deviations are summed in a different order by
+    # groupby(), so they can differ in the last bit.
+    pd.testing.assert_frame_equal(
+            expected, actual,
+            check_dtype=False,
+            rtol=rtol,
+            atol=1e-12,
+    )
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    df = make_synthetic_data(int(args['--num-runs']), int(args['--seed']))
+
+    print(f"{len(df)} wells, {df['run'].nunique()} runs")
+
+    cq, t = time_it(qpcr.calc_cq, df, ATTRS)
+    print(f"{'calc_cq:':12s} {t:8.3f}s", end='', flush=True)
+
+    if not args['--no-reference']:
+        expected, t_ref = time_it(ref_calc_cq, df, ATTRS)
+        check_equal(expected, cq)
+        print(f" {t_ref:8.3f}s (reference)  {t_ref / t:5.0f}x", end='')
+
+    print()
+
+    Δcq, t = time_it(qpcr.calc_Δcq, cq, GENES)
+    print(f"{'calc_Δcq:':12s} {t:8.3f}s", end='', flush=True)
+
+    if not args['--no-reference']:
+        expected, t_ref = time_it(ref_calc_Δcq, cq, GENES)
+        check_equal(expected, Δcq)
+        print(f" {t_ref:8.3f}s (reference)", end='')
+
+    print()
+
+    # With perfect efficiencies, the Pfaffl method should reduce to the
+    # ΔΔCq method.
+    perfect = {k: {'factor': 2} for k in GENES.values()}
+    pfaffl, t = time_it(qpcr.calc_Δcq, cq, GENES, perfect)
+    check_equal(Δcq, pfaffl, rtol=1e-9)
+    print(f"{'Pfaffl:':12s} {t:8.3f}s")
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+
+from sgrna_sensor import *
+
+# A small library shared by the fastq and enrichment tests: four variable
+# positions (one of which can only be C or G) between two fixed flanks.
+UPSTREAM = 'TTGATCCGTTTA'
+DOWNSTREAM = 'GCACTGAGCA'
+
+def make_design():
+    design = Construct('test')
+    design += Domain('5', UPSTREAM)
+    design += Domain('N', 'NNSN')
+    design += Domain('3', DOWNSTREAM)
+    return design
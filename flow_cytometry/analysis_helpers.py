@@ -46,6 +46,8 @@ class AnalyzedWell(fcmcmp.Well):
         self.mode = None
         self.loc = None
         self.linear_loc = None
+        self.boot_locs = None
+        self.boot_linear_locs = None
 
         self._find_measurements()
 
@@ -70,6 +72,20 @@ class AnalyzedWell(fcmcmp.Well):
 
         self._find_distribution(xlim)
 
+    def bootstrap(self, num_resamples=1000, rng=None):
+        # Use the same bandwidth that the KDE picked for the full data set, so 
+        # that the resampled modes are directly comparable to self.mode.
+        bandwidth = self.kde.kernel.factor * np.std(self.measurements, ddof=1)
+
+        self.boot_locs = bootstrap_locations(
+                self.measurements, bandwidth,
+                loc_metric=self.loc_metric,
+                num_resamples=num_resamples,
+                rng=rng,
+        )
+        self.boot_linear_locs = \
+                10**self.boot_locs if self.log_scale else self.boot_locs
+
     def _find_measurements(self):
         # Pick the channel to display based on what the user asked for, or the 
         # properties of the experiment if nothing was asked for.
@@ -169,6 +185,47 @@ class AnalyzedWell(fcmcmp.Well):
         self.y /= np.trapz(self.y, self.x)
         if not self.calc_pdf:
             self.y *= len(self.measurements)
+
+
+_experiment_cache = None
+
+def cache_experiments(enable=True):
+    """
+    Keep the data loaded by load_experiments() in memory, so that it doesn't 
+    have to be parsed again if another plot is made from the same YAML file.  
+    This is meant for sessions that render lots of plots, like 
+    batch_render.py.  Calling this function again clears the cache.
+    """
+    global _experiment_cache
+    _experiment_cache = {} if enable else None
+
+def load_experiments(yml_path):
+    """
+    Load the given experiments, either from the cache (if caching is enabled 
+    and the YAML file hasn't changed) or from disk.  The scripts modify the 
+    experiments they're given in place (e.g. gating, analyzed wells), so each 
+    caller gets its own copy of the cached data.
+    """
+    if _experiment_cache is None:
+        return fcmcmp.load_experiments(yml_path)
+
+    from copy import deepcopy
+    from pathlib import Path
+
+    yml_path = Path(yml_path).resolve()
+    key = yml_path, yml_path.stat().st_mtime
+
+    if key not in _experiment_cache:
+        _experiment_cache[key] = fcmcmp.load_experiments(yml_path)
+
+    return deepcopy(_experiment_cache[key])
+
+def load_experiment(yml_path, experiment_label):
+    for experiment in load_experiments(yml_path):
+        if experiment['label'] == experiment_label:
+            return experiment
+    raise fcmcmp.UsageError("No experiment named '{}'".format(experiment_label))
+
 def analyze_wells(experiments, **kwargs):
     control_expt_kwarg = kwargs.pop('control_expt', None)
 
@@ -207,6 +264,18 @@ def analyze_wells(experiments, **kwargs):
         well.control_expt = label
         well.normalize(loc)
 
+def bootstrap_wells(experiments, num_resamples=1000, seed=None):
+    """
+    Resample the cells in every analyzed well, so that confidence intervals can 
+    be calculated for the fold changes between them.  This must be called after 
+    analyze_wells(), because the resamples are taken from the normalized data.
+    Note that the uncertainty in the normalization factors themselves is not 
+    propagated.
+    """
+    rng = np.random.RandomState(seed)
+    for _, _, well in fcmcmp.yield_wells(experiments):
+        well.bootstrap(num_resamples, rng)
+
 class RelatedWells:
 
     def __init__(self, experiment, condition, reference, i):
@@ -244,6 +313,38 @@ class RelatedWells:
         else:
             return 0, fold_changes
 
+    def calc_fold_change_ci(self, confidence=0.95):
+        fold_change, _ = self.calc_fold_change_with_sign()
+        lower, upper = self.calc_fold_change_ci_with_sign(confidence)
+
+        if 0 < fold_change < 1:
+            lower, upper = 1 / upper, 1 / lower
+
+        return lower, upper
+
+    def calc_fold_change_ci_with_sign(self, confidence=0.95):
+        """
+        Return a percentile confidence interval for the fold change, based on 
+        the resamples generated by AnalyzedWell.bootstrap().  Each resampled 
+        fold change is averaged over the replicates, just like the fold change 
+        itself.
+        """
+        wells = [w for pair in self.zip_wells() for w in pair]
+
+        if not wells:
+            return np.nan, np.nan
+        if any(w.boot_linear_locs is None for w in wells):
+            raise ValueError("no resamples for '{}', call bootstrap_wells() first".format(self.label))
+
+        boot_fold_changes = np.mean([
+            expt.boot_linear_locs / ref.boot_linear_locs
+            for expt, ref in self.zip_wells()
+        ], axis=0)
+
+        alpha = 100 * (1 - confidence) / 2
+        lower, upper = np.percentile(boot_fold_changes, [alpha, 100 - alpha])
+        return lower, upper
+
 def yield_related_wells(experiments, default_reference='apo'):
     i = 0
     for experiment in experiments:
@@ -275,6 +376,71 @@ class CachedGaussianKde:
         i = np.argsort(k)
         return k[i], v[i]
 
+def bootstrap_locations(measurements, bandwidth, loc_metric=None, 
+        num_resamples=1000, num_bins=1024, batch_size=256, rng=None):
+    """
+    Calculate the location (i.e. mode, median, or mean) of many resamples of 
+    the given measurements.
+
+    Refitting a Gaussian KDE to every resample would be far too slow, so the 
+    measurements are instead binned onto a fine grid.  Resampling the cells 
+    with replacement is then equivalent to drawing a multinomial vector of bin 
+    counts, and the KDEs for a whole batch of resamples can be evaluated at 
+    once by convolving those counts with the kernel (via FFT).  The mode of 
+    each resample is refined to sub-bin precision by fitting a parabola to the 
+    highest bin and its neighbors.
+    """
+    rng = rng or np.random.RandomState()
+    x = np.asarray(measurements, dtype=float)
+    n = len(x)
+
+    # Pad the grid so that the kernel doesn't get truncated at the edges.
+    pad = 4 * bandwidth
+    edges = np.linspace(x.min() - pad, x.max() + pad, num_bins + 1)
+    centers = (edges[1:] + edges[:-1]) / 2
+    dx = edges[1] - edges[0]
+    counts, _ = np.histogram(x, bins=edges)
+    pvals = counts / counts.sum()
+
+    # Sample the kernel on the same grid.  The FFT is zero-padded to twice the 
+    # length of the grid, so the convolution doesn't wrap around.
+    num_fft = 2 * num_bins
+    offsets = np.minimum(np.arange(num_fft), num_fft - np.arange(num_fft)) * dx
+    kernel_fft = np.fft.rfft(np.exp(-0.5 * (offsets / bandwidth)**2))
+
+    locs = np.empty(num_resamples)
+
+    for i in range(0, num_resamples, batch_size):
+        j = min(i + batch_size, num_resamples)
+        boot_counts = rng.multinomial(n, pvals, size=j-i)
+
+        if loc_metric == 'mode' or loc_metric is None:
+            density = np.fft.irfft(
+                    np.fft.rfft(boot_counts, num_fft, axis=1) * kernel_fft,
+                    num_fft, axis=1)[:, :num_bins]
+
+            k = np.clip(np.argmax(density, axis=1), 1, num_bins - 2)
+            rows = np.arange(j-i)
+            y0 = density[rows, k-1]
+            y1 = density[rows, k]
+            y2 = density[rows, k+1]
+            curvature = y0 - 2*y1 + y2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                shift = np.where(curvature < 0, 0.5 * (y0 - y2) / curvature, 0)
+            locs[i:j] = centers[k] + shift * dx
+
+        elif loc_metric == 'median':
+            cdf = np.cumsum(boot_counts, axis=1)
+            locs[i:j] = centers[np.argmax(cdf >= n / 2, axis=1)]
+
+        elif loc_metric == 'mean':
+            locs[i:j] = boot_counts @ centers / n
+
+        else:
+            raise ValueError("No such metric '{}'".format(loc_metric))
+
+    return locs
+
 
 class GateLowFluorescence(fcmcmp.GatingStep):
 
@@ -736,6 +902,241 @@ def get_duration(experiments):
 
     return min_time, max_time
 
+def plot_density(axis, x, y, color, xlim=None, ylim=None, bins=250, 
+        alpha=1, colormap=None, zorder=1):
+    """
+    Draw the given cells as a 2D histogram image, rather than as individual 
+    points.  The cost of rendering (and the size of any vector output file) 
+    then depends only on the number of bins, not on the number of cells.
+
+    Pixels are shaded by the log of the number of cells they contain.  By 
+    default this shading is done by varying the transparency of the given 
+    color, which looks much like an overplotted scatter plot.  If a colormap 
+    is given, pixels are instead colored by density.
+    """
+    from matplotlib.colors import to_rgba
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+
+    if xlim is None: xlim = x.min(), x.max()
+    if ylim is None: ylim = y.min(), y.max()
+
+    counts, _, _ = np.histogram2d(x, y, bins=bins, range=[xlim, ylim])
+    density = np.log1p(counts.T)
+    if density.max() > 0:
+        density /= density.max()
+
+    if colormap:
+        image = plt.get_cmap(colormap)(density)
+        image[..., 3] = alpha * (density > 0)
+    else:
+        image = np.zeros(density.shape + (4,))
+        image[...] = to_rgba(color)
+        image[..., 3] = alpha * density
+
+    # Keep whatever aspect ratio the axes already have (e.g. square).
+    return axis.imshow(
+            image,
+            extent=(*xlim, *ylim),
+            origin='lower',
+            aspect=axis.get_aspect(),
+            interpolation='nearest',
+            zorder=zorder,
+    )
+
+class EventRateCounter:
+    """
+    Calculate the number of events per second within a sliding time window.
+
+    The event times must be sorted, which they always are for data straight 
+    from the cytometer.  This means that the number of events in any window 
+    can be found with two binary searches, so the rate can be evaluated at 
+    any number of time points in a single vectorized step.  Events can be 
+    added as they are acquired (e.g. while following an FCS file that's 
+    still being written) without recounting the events seen previously.
+    """
+
+    def __init__(self, time_window=2):
+        self.time_window = time_window
+        self._times = np.empty(1024)
+        self.num_events = 0
+
+    def extend(self, times):
+        times = np.asarray(times, dtype=float)
+        n = self.num_events + len(times)
+
+        # Grow the buffer geometrically, so that adding events one chunk at a 
+        # time takes amortized linear time.
+        if n > len(self._times):
+            buffer = np.empty(max(n, 2 * len(self._times)))
+            buffer[:self.num_events] = self.times
+            self._times = buffer
+
+        self._times[self.num_events:n] = times
+        self.num_events = n
+
+    @property
+    def times(self):
+        return self._times[:self.num_events]
+
+    @property
+    def start_time(self):
+        return self._times[0] if self.num_events else np.nan
+
+    @property
+    def end_time(self):
+        return self._times[self.num_events - 1] if self.num_events else np.nan
+
+    @property
+    def net_rate(self):
+        dt = self.end_time - self.start_time
+        return self.num_events / dt if dt > 0 else 0
+
+    def evaluate(self, time_coord):
+        """
+        Return the number of events per second in the window centered on each 
+        of the given times.  Windows that extend past the first or last event 
+        are truncated, so the rates near the edges aren't biased low.
+        """
+        time_coord = np.asarray(time_coord, dtype=float)
+        rates = np.zeros(time_coord.shape)
+
+        if self.num_events < 2:
+            return rates
+
+        lower = time_coord - self.time_window / 2
+        upper = time_coord + self.time_window / 2
+        counts = \
+                np.searchsorted(self.times, upper, side='right') - \
+                np.searchsorted(self.times, lower, side='left')
+
+        dt = np.minimum(upper, self.end_time) - np.maximum(lower, self.start_time)
+        ok = dt > 0
+        rates[ok] = counts[ok] / dt[ok]
+        return rates
+
+
+class FollowFcs:
+    """
+    Read the events that have been appended to an FCS file since the last time 
+    it was read.
+
+    This makes it possible to monitor a file that the cytometer is still 
+    writing without re-parsing the whole thing every time.  Only complete 
+    events are returned; any partially written event is picked up by the next 
+    call to read().  Only list-mode data with a single numeric type for every 
+    parameter is supported, which covers the files written by BD FACSDiva.
+    """
+
+    def __init__(self, path):
+        from pathlib import Path
+        self.path = Path(path)
+        self.meta = None
+        self.num_events = 0
+
+    @property
+    def channels(self):
+        return [
+                self.meta['$P{}N'.format(i+1)]
+                for i in range(int(self.meta['$PAR']))
+        ]
+
+    @property
+    def timestep(self):
+        return float(self.meta.get('$TIMESTEP', 1))
+
+    def read(self):
+        import pandas as pd
+
+        with self.path.open('rb') as file:
+            data_start, data_end = self._read_header(file)
+
+            if self.meta is None:
+                return pd.DataFrame()
+
+            dtype = self._pick_dtype()
+            file_size = file.seek(0, 2)
+
+            # The end of the data segment may not be filled in until the file 
+            # is finished, so don't trust it past the end of the file.
+            if data_end <= data_start:
+                data_end = file_size
+            else:
+                data_end = min(data_end + 1, file_size)
+
+            num_events = max(data_end - data_start, 0) // dtype.itemsize
+            if num_events <= self.num_events:
+                return pd.DataFrame(columns=self.channels)
+
+            file.seek(data_start + self.num_events * dtype.itemsize)
+            buffer = file.read((num_events - self.num_events) * dtype.itemsize)
+
+        events = np.frombuffer(buffer, dtype=dtype)
+        self.num_events = num_events
+
+        return pd.DataFrame({
+            channel: events[channel].astype(float)
+            for channel in self.channels
+        })
+
+    def _read_header(self, file):
+        header = file.read(58)
+        if len(header) < 58:
+            return 0, 0
+
+        offsets = [int(header[i:i+8].strip() or 0) for i in range(10, 42, 8)]
+        text_start, text_end, data_start, data_end = offsets
+
+        if text_end <= text_start:
+            return 0, 0
+
+        file.seek(text_start)
+        text = file.read(text_end - text_start + 1).decode('latin-1')
+        if len(text) < text_end - text_start + 1:
+            return 0, 0
+
+        self.meta = parse_fcs_text(text)
+
+        # Large files store their offsets in the TEXT segment instead.
+        if not data_start:
+            data_start = int(self.meta.get('$BEGINDATA', 0))
+            data_end = int(self.meta.get('$ENDDATA', 0))
+
+        return data_start, data_end
+
+    def _pick_dtype(self):
+        if self.meta.get('$MODE', 'L') != 'L':
+            raise ValueError("{}: only list-mode data is supported".format(self.path))
+
+        byteorder = '<' if self.meta['$BYTEORD'].startswith('1') else '>'
+        datatype = self.meta['$DATATYPE']
+        bits = {int(self.meta['$P{}B'.format(i+1)]) for i in range(len(self.channels))}
+
+        if datatype == 'F':
+            code = 'f4'
+        elif datatype == 'D':
+            code = 'f8'
+        elif datatype == 'I' and len(bits) == 1 and bits <= {8, 16, 32, 64}:
+            code = 'u{}'.format(bits.pop() // 8)
+        else:
+            raise ValueError("{}: unsupported data type '{}'".format(self.path, datatype))
+
+        return np.dtype([(x, byteorder + code) for x in self.channels])
+
+def parse_fcs_text(text):
+    """
+    Parse the key/value pairs from the TEXT segment of an FCS file.  The first 
+    character is the delimiter, and doubled delimiters are literal.
+    """
+    delimiter = text[0]
+    placeholder = '\0'
+    fields = text[1:].replace(2 * delimiter, placeholder).split(delimiter)
+    fields = [x.replace(placeholder, delimiter) for x in fields]
+    return {k.upper(): v for k, v in zip(fields[0::2], fields[1::2])}
+
 def is_fluorescent_channel(channel):
     return any(
             channel.startswith(x)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""\
+Render lots of plots in a single session, without opening any GUI windows.
+
+Usage:
+    batch_render.py <jobs_path> [options]
+
+Arguments:
+    <jobs_path>
+        Path to a file listing the plots to render, one per line.  Each line
+        should be a command for one of the plotting scripts, exactly as it
+        would be typed in the shell from the directory containing the jobs
+        file.  For example:
+
+            fold_change.py 20170329.yml -o $.svg
+            titration_curve.py 20170329.yml -o $_titration.svg -1
+            scatter_plot.py 20170329.yml rxb/11/1 -o $_scatter.png
+
+        The supported scripts are: fold_change.py, titration_curve.py,
+        scatter_plot.py, bar_chart.py, and ligand_matrix.py.  Every command
+        must specify an output path (-o).  Blank lines and lines beginning with
+        '#' are ignored.
+
+Options:
+    -p --processes <num>
+        The number of worker processes to render plots with.  By default, one
+        process is used for each CPU.  Commands that plot the same YAML file
+        are always rendered by the same process, so that the data only has to
+        be loaded once.
+
+    -v --verbose
+        Print each command as it's rendered.
+"""
+
+# Pick a non-interactive backend before anything else imports pyplot.
+import matplotlib; matplotlib.use('Agg')
+
+import os, sys, shlex, importlib, traceback, docopt, fcmcmp, analysis_helpers
+import matplotlib.pyplot as plt
+from multiprocessing import Pool
+from collections import OrderedDict
+from pathlib import Path
+
+SCRIPTS = {
+        'fold_change.py',
+        'titration_curve.py',
+        'scatter_plot.py',
+        'bar_chart.py',
+        'ligand_matrix.py',
+}
+
+class BatchRender:
+
+    def __init__(self, jobs_path):
+        self.jobs_path = Path(jobs_path).resolve()
+        self.processes = None
+        self.verbose = False
+
+        self.jobs = None
+        self.failures = None
+
+    def render(self):
+        self._read_jobs()
+        self._render_jobs()
+        self._report_failures()
+        return not self.failures
+
+    def _read_jobs(self):
+        """
+        Parse the jobs file and group the commands by the YAML file they plot.
+        """
+        # Interpret relative paths (both the YAML files and the output paths)
+        # relative to the jobs file.
+        os.chdir(self.jobs_path.parent)
+
+        self.jobs = OrderedDict()
+        self.failures = []
+
+        with self.jobs_path.open() as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+
+                try:
+                    key, job = self._parse_job(line)
+                    self.jobs.setdefault(key, []).append(job)
+                except (Exception, SystemExit):
+                    self.failures.append((line, traceback.format_exc()))
+
+    def _parse_job(self, command):
+        script, *argv = shlex.split(command)
+        script = Path(script).name
+
+        if script not in SCRIPTS:
+            raise fcmcmp.UsageError("can't batch render '{}'".format(script))
+
+        # Parse the command with the script's own usage text, so that bad
+        # commands are caught before any rendering starts.
+        module = importlib.import_module(Path(script).stem)
+        args = docopt.docopt(module.__doc__, argv)
+
+        if not args['--output']:
+            raise fcmcmp.UsageError("no output path (-o) given")
+
+        # Commands that don't plot a YAML file (e.g. ligand_matrix.py) are all
+        # grouped together.
+        yml_path = args.get('<yml_path>')
+        key = yml_path and Path(yml_path).resolve()
+
+        return key, (command, script, argv)
+
+    def _render_jobs(self):
+        with Pool(self.processes) as pool:
+            results = pool.imap_unordered(
+                    render_jobs, [(jobs, self.verbose) for jobs in self.jobs.values()])
+            self.failures += [x for failures in results for x in failures]
+
+    def _report_failures(self):
+        for command, error in self.failures:
+            print("Failed to render: {}\n\n{}".format(command, error), file=sys.stderr)
+
+
+def render_jobs(args):
+    """
+    Render each of the given commands in turn.  This is run in a worker
+    process, and each call starts with a fresh cache of loaded experiments.
+    """
+    jobs, verbose = args
+    failures = []
+    analysis_helpers.cache_experiments()
+
+    for command, script, argv in jobs:
+        if verbose:
+            print(command)
+
+        try:
+            module = importlib.import_module(Path(script).stem)
+            module.main(argv)
+
+        except (Exception, SystemExit):
+            failures.append((command, traceback.format_exc()))
+
+        finally:
+            # Free the figures and the processing steps (which fcmcmp keeps
+            # track of globally) made for this plot.
+            plt.close('all')
+            fcmcmp.clear_all_processing_steps()
+
+    analysis_helpers.cache_experiments(False)
+    return failures
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+
+    batch = BatchRender(args['<jobs_path>'])
+    batch.verbose = args['--verbose']
+
+    if args['--processes']:
+        batch.processes = int(args['--processes'])
+
+    sys.exit(0 if batch.render() else 1)
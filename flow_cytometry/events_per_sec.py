@@ -6,6 +6,7 @@ set of experiments.
 
 Usage:
     ./events_per_sec.py <yml_path> [<keyword>] [options]
+    ./events_per_sec.py --follow <fcs_paths>... [options]
 
 Arguments:
     <yml_path>
@@ -19,6 +20,10 @@ Arguments:
         2. The keyword exactly equals the name of the well's condition.
         3. The keyword makes up part of the well's experiment's label.
 
+    <fcs_paths>
+        Paths to FCS files that are still being written by the cytometer (see 
+        --follow).
+
 Options:
     -o --output <path>
         If an output path is specified, the resulting plot is written to that 
@@ -36,12 +41,23 @@ Options:
         number of events per second.  Longer time intervals will give smoother 
         plots, but will lag relative to shorter intervals.
 
+    -f --follow
+        Monitor the event rate of the given FCS files as they are being 
+        acquired, e.g. to watch for clogs or drift during a long sort.  The 
+        plot is updated periodically (see --refresh), and only the events 
+        added since the last update are read from each file.
+
+    -r --refresh <secs>              [default: 5]
+        How often to check for new events when following FCS files (see 
+        --follow).
+
     -v --verbose
         Print out the net event rate for each well.
 """
 
 import docopt, fcmcmp, analysis_helpers
 import numpy as np, matplotlib.pyplot as plt
+from pathlib import Path
 from pprint import pprint
 
 class EventsPerSec:
@@ -59,30 +75,19 @@ class EventsPerSec:
         time_coord = np.linspace(min_time, max_time, num=500)
 
         for experiment, condition, well in sorted(data, key=lambda x: x[2]):
-            times = well.data['Time'] * float(well.meta['$TIMESTEP'])
-            events_per_sec = np.zeros(time_coord.shape)
-
-            for i, x in enumerate(time_coord):
-                time_range = x - self.time_window/2, x + self.time_window/2
-                a, b = np.searchsorted(times, time_range)
-                try:
-                    dt = times.iloc[b] - times.iloc[a]
-                    if dt: events_per_sec[i] = (b - a) / dt
-                except IndexError:
-                    pass
+            counter = analysis_helpers.EventRateCounter(self.time_window)
+            counter.extend(well.data['Time'] * float(well.meta['$TIMESTEP']))
 
             plt.plot(
                     time_coord,
-                    events_per_sec,
+                    counter.evaluate(time_coord),
                     label='{} ({})'.format(well.label, condition),
                     **analysis_helpers.pick_style(experiment)
             )
 
             if self.verbose:
                 label = f"{experiment['label']} {condition} [{well.label}]"
-                net_time = times.iloc[-1] - times.iloc[0]
-                net_rate = len(times) / net_time
-                print(f"{label:40s}\t{net_rate:.2f} evt/sec")
+                print(f"{label:40s}\t{counter.net_rate:.2f} evt/sec")
 
         plt.xlim(min_time, max_time)
         plt.ylim(0, plt.ylim()[1])
@@ -94,16 +99,83 @@ class EventsPerSec:
         if self.show_legend:
             plt.legend(loc='best')
 
+class FollowEventsPerSec:
+
+    def __init__(self, fcs_paths):
+        self.fcs_paths = [Path(x) for x in fcs_paths]
+        self.show_legend = False
+        self.time_window = 1
+        self.refresh = 5
+        self.verbose = False
+
+        self.readers = None
+        self.counters = None
+        self.lines = None
+
+    def follow(self):
+        self.readers = [analysis_helpers.FollowFcs(x) for x in self.fcs_paths]
+        self.counters = [
+                analysis_helpers.EventRateCounter(self.time_window)
+                for x in self.fcs_paths
+        ]
+        self.lines = [
+                plt.plot([], [], label=x.name)[0]
+                for x in self.fcs_paths
+        ]
+
+        plt.xlabel('Collection time (sec)')
+        plt.ylabel('Events/sec')
+
+        if self.show_legend:
+            plt.legend(loc='best')
+
+        # Keep updating until the user closes the window.
+        while plt.get_fignums():
+            self._update()
+            plt.pause(self.refresh)
+
+    def _update(self):
+        for path, reader, counter, line in zip(
+                self.fcs_paths, self.readers, self.counters, self.lines):
+
+            new_events = reader.read()
+            if 'Time' not in new_events:
+                continue
+
+            counter.extend(new_events['Time'] * reader.timestep)
+            time_coord = np.linspace(
+                    counter.start_time, counter.end_time, num=500)
+            events_per_sec = counter.evaluate(time_coord)
+            line.set_data(time_coord, events_per_sec)
+
+            if self.verbose and counter.num_events:
+                print(f"{path.name:40s}\t{events_per_sec[-1]:.2f} evt/sec (now)\t{counter.net_rate:.2f} evt/sec (net)")
+
+        axes = plt.gca()
+        axes.relim()
+        axes.autoscale_view()
+        axes.set_ylim(0, axes.get_ylim()[1])
+
 
 if __name__ == '__main__':
     args = docopt.docopt(__doc__)
-    experiments = fcmcmp.load_experiments(args['<yml_path>'])
-
-    analysis = EventsPerSec(experiments)
-    analysis.keyword = args['<keyword>']
-    analysis.show_legend = args['--show-legend']
-    analysis.time_window = float(args['--time-window'])
-    analysis.verbose = args['--verbose']
 
-    with analysis_helpers.plot_or_savefig(args['--output'], args['<yml_path>']):
-        analysis.plot()
+    if args['--follow']:
+        analysis = FollowEventsPerSec(args['<fcs_paths>'])
+        analysis.show_legend = args['--show-legend']
+        analysis.time_window = float(args['--time-window'])
+        analysis.refresh = float(args['--refresh'])
+        analysis.verbose = args['--verbose']
+        analysis.follow()
+
+    else:
+        experiments = fcmcmp.load_experiments(args['<yml_path>'])
+
+        analysis = EventsPerSec(experiments)
+        analysis.keyword = args['<keyword>']
+        analysis.show_legend = args['--show-legend']
+        analysis.time_window = float(args['--time-window'])
+        analysis.verbose = args['--verbose']
+
+        with analysis_helpers.plot_or_savefig(args['--output'], args['<yml_path>']):
+            analysis.plot()
@@ -98,6 +98,21 @@ Options:
     -S --show-signs
         Allow the fold change bars to go below 1.
 
+    -B --bootstrap <resamples>
+        Estimate a confidence interval for each fold change by resampling the 
+        cells in each well the given number of times (e.g. 1000).  When this 
+        option is given, the error bars show the confidence intervals rather 
+        than the standard deviations between replicates, and the intervals are 
+        included in the exported dataframe (see --export-dataframe).
+
+    --confidence <level>                [default: 0.95]
+        The confidence level to use for the bootstrapped confidence intervals 
+        (see --bootstrap).
+
+    --seed <int>
+        Seed the random number generator used to resample the cells, so that 
+        the bootstrapped confidence intervals are reproducible.
+
     -f --fold-change-xlim <xmax>
         Set the extent of the x-axis for the fold-change plot.  By default this 
         axis is automatically scaled to fit the data, but this option is useful 
@@ -162,6 +177,9 @@ class FoldChange:
         self.log_toggle = None
         self.pdf = None
         self.show_signs = None
+        self.bootstrap = None
+        self.confidence = 0.95
+        self.seed = None
         self.loc_metric = None
         self.output_size = None
         self.title = None
@@ -184,6 +202,7 @@ class FoldChange:
         self._setup_figure()
         self._setup_axes()
         self._analyze_wells()
+        self._bootstrap_wells()
         self._pick_xlim()
         self._estimate_distributions()
         self._rescale_distributions()
@@ -257,6 +276,16 @@ class FoldChange:
                 self.reference_condition,
         ))
 
+    def _bootstrap_wells(self):
+        if not self.bootstrap:
+            return
+
+        analysis_helpers.bootstrap_wells(
+                self.experiments,
+                num_resamples=self.bootstrap,
+                seed=self.seed,
+        )
+
     def _yield_wells(self):
         yield from fcmcmp.yield_wells(self.experiments)
 
@@ -378,11 +407,8 @@ class FoldChange:
         # calculating error bars in the right way.  I think it might be best to
         # do some sort of resampling technique.  That would allow me to
         # incorporate knowledge of the underlying distributions into the
-        # standard deviation.
-        if self.show_signs:
-            fold_change, fold_changes = comparison.calc_fold_change_with_sign()
-        else:
-            fold_change, fold_changes = comparison.calc_fold_change()
+        # standard deviation.  The --bootstrap option does this.
+        fold_change, fold_changes = self._get_fold_change(comparison)
 
         # If there isn't enough data to calculate a fold change, bail out here.
         if fold_changes.size == 0:
@@ -394,6 +420,12 @@ class FoldChange:
         # or as the user zooms in).
         color = analysis_helpers.pick_color(comparison.experiment)
 
+        if self.bootstrap:
+            lower, upper = self._get_fold_change_ci(comparison)
+            xerr = [[fold_change - lower], [upper - fold_change]]
+        else:
+            xerr = fold_changes.std()
+
         self.axes[1].plot(
                 [0, fold_change], [i, i],
                 color=color,
@@ -402,14 +434,28 @@ class FoldChange:
         )
         self.axes[1].errorbar(
                 fold_change, i,
-                xerr=fold_changes.std(),
+                xerr=xerr,
                 ecolor=color,
                 capsize=self.fold_change_bar_width / 2,
         )
 
         if self.verbose:
             print("  Fold change:", fold_change)
-            print("  Error bar:", fold_changes.std())
+            print("  Error bar:", xerr)
+
+    def _get_fold_change(self, comparison):
+        if self.show_signs:
+            return comparison.calc_fold_change_with_sign()
+        else:
+            return comparison.calc_fold_change()
+
+    def _get_fold_change_ci(self, comparison):
+        if not self.bootstrap:
+            return np.nan, np.nan
+        if self.show_signs:
+            return comparison.calc_fold_change_ci_with_sign(self.confidence)
+        else:
+            return comparison.calc_fold_change_ci(self.confidence)
 
     def _plot_distribution(self, i, comparison, well, is_reference):
         """
@@ -486,11 +532,14 @@ class FoldChange:
                    "Spacer",
                    "Aptamer_Ligand",
                    "Assayed_Ligand",
-                   "Fold_Change"
+                   "Fold_Change",
+                   "Fold_Change_CI_Lower",
+                   "Fold_Change_CI_Upper",
                    ]
 
         for comparison in self.comparisons:
             label_components = re.split("_|-", self._get_label(comparison))
+            ci_lower, ci_upper = self._get_fold_change_ci(comparison)
             # print(label_components)
             if len(label_components) == 2:
                 for fold_change in self._get_fold_change(comparison)[1]:
@@ -498,7 +547,9 @@ class FoldChange:
                                                   "Spacer": label_components[0].split('.')[0],
                                                   "Aptamer_Ligand": "None",
                                                   "Assayed_Ligand": label_components[1],
-                                                  "Fold_Change": fold_change
+                                                  "Fold_Change": fold_change,
+                                                  "Fold_Change_CI_Lower": ci_lower,
+                                                  "Fold_Change_CI_Upper": ci_upper,
                                                   }
                                             )
                     # print (temp_series)
@@ -509,7 +560,9 @@ class FoldChange:
                                                   "Spacer": label_components[1],
                                                   "Aptamer_Ligand": "THEO",
                                                   "Assayed_Ligand": label_components[2],
-                                                  "Fold_Change": fold_change
+                                                  "Fold_Change": fold_change,
+                                                  "Fold_Change_CI_Lower": ci_lower,
+                                                  "Fold_Change_CI_Upper": ci_upper,
                                                   }
                                             )
                     # print (temp_series)
@@ -521,7 +574,9 @@ class FoldChange:
                                                   "Spacer": label_components[1],
                                                   "Aptamer_Ligand": label_components[2],
                                                   "Assayed_Ligand": label_components[3],
-                                                  "Fold_Change": fold_change
+                                                  "Fold_Change": fold_change,
+                                                  "Fold_Change_CI_Lower": ci_lower,
+                                                  "Fold_Change_CI_Upper": ci_upper,
                                                   }
                                             )
                     # print (temp_series)
@@ -529,11 +584,11 @@ class FoldChange:
 
         df.to_csv("Fold_Change_df-LATEST.csv")
 
-if __name__ == '__main__':
+def main(argv=None):
     import docopt
 
-    args = docopt.docopt(__doc__)
-    experiments = fcmcmp.load_experiments(args['<yml_path>'])
+    args = docopt.docopt(__doc__, argv)
+    experiments = analysis_helpers.load_experiments(args['<yml_path>'])
 
     shared_steps = analysis_helpers.SharedProcessingSteps(args['--verbose'])
     shared_steps.early_event_threshold = float(args['--time-gate'])
@@ -550,6 +605,7 @@ if __name__ == '__main__':
     analysis.log_toggle = args['--log-toggle']
     analysis.pdf = args['--pdf']
     analysis.show_signs = args['--show-signs']
+    analysis.confidence = float(args['--confidence'])
     analysis.loc_metric = args['--loc-metric']
     analysis.title = args['--title']
     analysis.trace_quality = int(args['--trace-quality'])
@@ -559,6 +615,10 @@ if __name__ == '__main__':
         analysis.show_indices = nonstdlib.indices_from_str(args['--indices'], start=1)
     if args['--output-size']:
         analysis.output_size = [float(x) for x in args['--output-size'].split('x')]
+    if args['--bootstrap']:
+        analysis.bootstrap = int(args['--bootstrap'])
+    if args['--seed']:
+        analysis.seed = int(args['--seed'])
     if args['--fold-change-xlim']:
         analysis.fold_change_xlim = float(args['--fold-change-xlim'])
     if args['--distribution-xlim']:
@@ -570,3 +630,7 @@ if __name__ == '__main__':
 
     if args['--export-dataframe']:
         analysis.export_df()
+
+
+if __name__ == '__main__':
+    main()
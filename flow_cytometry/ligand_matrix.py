@@ -218,10 +218,10 @@ def parse_label(label):
     raise ValueError(f"couldn't parse '{label}'")
 
 
-if __name__ == "__main__":
+def main(argv=None):
     import docopt
 
-    args = docopt.docopt(__doc__)
+    args = docopt.docopt(__doc__, argv)
     root = os.path.dirname(__file__)
     yml_path = (
         'data/'
@@ -232,7 +232,7 @@ if __name__ == "__main__":
             '20170214-Ligand_Screen-Replicate_9-COLUMNS/'
                 'Replicates_1-3_7-9_Working.yaml'
     )
-    experiments = fcmcmp.load_experiments(os.path.join(root, yml_path))
+    experiments = analysis_helpers.load_experiments(os.path.join(root, yml_path))
 
     shared_steps = analysis_helpers.SharedProcessingSteps(args['--verbose'])
     shared_steps.early_event_threshold = float(args['--time-gate'])
@@ -247,3 +247,7 @@ if __name__ == "__main__":
 
     with analysis_helpers.plot_or_savefig(args['--output'], '20170214_ligand_matrix'):
         analysis.plot()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+
+"""\
+Keep a running summary of a flow cytometry experiment while the data is still
+being acquired, e.g. during a directed-evolution sort.
+
+Usage:
+    monitor_sort.py <yml_path> [options]
+
+Arguments:
+    <yml_path>
+        Path to a YAML file specifying which wells and which plates should be
+        compared with each other, in the same format used by fold_change.py.
+        The wells don't need to exist yet.  Instead, the plate directory is
+        watched for new *.fcs files, and each well is analyzed as soon as its
+        file is completely written.  Wells that are still being acquired are
+        reported with their current event rate.
+
+Options:
+    -s --state <path>                   [default: $.monitor.json]
+        Where to write the running summary, as JSON.  Dollar signs ($) in the
+        path are replaced by the base name of the YAML file, minus the '.yml'
+        suffix.  The file is rewritten (atomically) whenever new data is
+        analyzed, so it's safe to watch from other programs.
+
+    -i --interval <secs>                [default: 5]
+        How often to check the plate directory for new data.  A file is
+        considered to be completely written once its size stops changing
+        between two checks.
+
+    -1 --once
+        Analyze whatever data is already present (assuming that every file is
+        complete), write the summary, and exit.
+
+    -c --channel <channel>
+        The channel to analyze.  By default, this is deduced from the YAML
+        file, see fold_change.py.
+
+    -n --normalize-by <channel>
+        Normalize the channel of interest (see --channel) by the given channel.
+        By default the data is normalized by GFP-A if the channel of interest
+        is RFP-A and vice versa.
+
+    -N --no-normalize
+        Analyze raw, unnormalized data.
+
+    -m --loc-metric <median|mean|mode>
+        Specify which metric should be used to determine the "centers" of the
+        cell distributions for the purpose of calculating the fold change in
+        signal.  By default the mode is used for this calculation.
+
+    -w --time-window <secs>             [default: 2]
+        How long of a time interval to consider when calculating the current
+        event rate of wells that are still being acquired.
+
+    -t --time-gate <secs>               [default: 0]
+        Exclude the first cells recorded from each well if you suspect that
+        they may be contaminated with cells from the previous well.
+
+    -z --size-gate <percentile>         [default: 0]
+        Exclude the smallest cells from the analysis.  The given percentile
+        specifies how many cells are excluded.
+
+    -x --expression-gate <signal>       [default: 1e3]
+        Exclude cells where the signal on the fluorescence control channel is
+        less than the given value.
+
+    -v --verbose
+        Print out information on all the processing steps.
+
+Note that experiments are not normalized by control experiments (i.e. the
+`control_expt` field is ignored), because those wells may not have been
+acquired yet.
+"""
+
+import os, json, time, yaml, docopt, fcmcmp, fcsparser, analysis_helpers
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile
+
+class SortMonitor:
+
+    def __init__(self, yml_path):
+        # Settings configured by the user.
+        self.yml_path = Path(yml_path)
+        self.state_path = None
+        self.interval = 5
+        self.channel = None
+        self.control_channel = None
+        self.loc_metric = None
+        self.time_window = 2
+        self.time_gate = 0
+        self.size_gate = 0
+        self.expression_gate = 1e3
+        self.verbose = False
+
+        # Internal state.
+        self.layout = None
+        self.layout_mtime = None
+        self.plates = None
+        self.files = {}
+        self.summaries = OrderedDict()
+
+    def monitor(self):
+        try:
+            while True:
+                self.update()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+
+    def update(self, assume_complete=False):
+        """
+        Look for new data, analyze any experiments that have new wells, and
+        write out the new summary.  Return true if anything changed.
+
+        Experiments are only reanalyzed when one of their wells changes status
+        or finishes being acquired.  Wells that are still being acquired just
+        have their event counts and rates refreshed.
+        """
+        self._read_layout()
+        changed_wells, acquiring_wells = self._scan_files(assume_complete)
+
+        for experiment in self.layout:
+            wells = {
+                    label
+                    for labels in experiment['wells'].values()
+                    for label in labels
+            }
+            if wells & changed_wells or experiment['label'] not in self.summaries:
+                self.summaries[experiment['label']] = \
+                        self._summarize_experiment(experiment)
+            elif wells & acquiring_wells:
+                self._refresh_event_rates(self.summaries[experiment['label']])
+
+        if changed_wells or acquiring_wells:
+            self._write_state()
+            self._print_summary()
+
+        return bool(changed_wells or acquiring_wells)
+
+    def _read_layout(self):
+        """
+        Read the YAML file, if it has changed since it was last read.  The file
+        has the same format used by fcmcmp.load_experiments(), but here the
+        wells are left as labels until their data appears.
+        """
+        mtime = self.yml_path.stat().st_mtime
+        if mtime == self.layout_mtime:
+            return
+
+        with self.yml_path.open() as file:
+            documents = [x for x in yaml.safe_load_all(file) if x]
+
+        def str_to_path(s):
+            return Path(s) if Path(s).is_absolute() else self.yml_path.parent/s
+
+        if documents and 'plates' in documents[0]:
+            self.plates = {
+                    k: str_to_path(v)
+                    for k, v in documents.pop(0)['plates'].items()
+            }
+        elif documents and 'plate' in documents[0]:
+            self.plates = {None: str_to_path(documents.pop(0)['plate'])}
+        else:
+            self.plates = {None: self.yml_path.parent / self.yml_path.stem}
+
+        for experiment in documents:
+            if 'from' in experiment:
+                raise fcmcmp.UsageError("External references ('from') aren't supported when monitoring a sort.")
+            if 'label' not in experiment or 'wells' not in experiment:
+                raise fcmcmp.UsageError("The following experiment is missing a label or wells:\n\n{}".format(yaml.dump(experiment)))
+
+        self.layout = documents
+        self.layout_mtime = mtime
+        self.summaries.clear()
+
+    def _scan_files(self, assume_complete=False):
+        """
+        Find the *.fcs file for each well, and load any that have finished
+        being written.  Return the labels of the wells that changed status or
+        finished being acquired, and the labels of the wells that are still
+        being acquired and have new events.
+        """
+        changed = set()
+        acquiring = set()
+        paths = {
+                plate: list(plate_path.glob('**/*.fcs'))
+                for plate, plate_path in self.plates.items()
+                if plate_path.is_dir()
+        }
+
+        for experiment in self.layout:
+            for labels in experiment['wells'].values():
+                for label in labels:
+                    if label in changed or label in acquiring:
+                        continue
+
+                    well_file = self.files.setdefault(label, WellFile(label))
+                    well_file.find(paths)
+
+                    data_changed, rate_changed = \
+                            well_file.update(assume_complete, self.time_window)
+
+                    if data_changed:
+                        changed.add(label)
+                    elif rate_changed:
+                        acquiring.add(label)
+
+        return changed, acquiring
+
+    def _summarize_experiment(self, experiment):
+        reference = experiment.get('reference', 'apo')
+        summary = OrderedDict([
+            ('label', experiment['label']),
+            ('reference', reference),
+            ('wells', []),
+            ('fold_changes', OrderedDict()),
+        ])
+
+        for condition, labels in experiment['wells'].items():
+            for i, label in enumerate(labels):
+                well_file = self.files[label]
+                summary['wells'].append(OrderedDict([
+                    ('condition', condition),
+                    ('replicate', i + 1),
+                    ('well', label),
+                    ('path', str(well_file.path) if well_file.path else None),
+                    ('status', well_file.status),
+                    ('events', well_file.num_events),
+                    ('events_per_sec', well_file.events_per_sec),
+                    ('loc', None),
+                ]))
+
+        try:
+            analyzed = self._analyze_experiment(experiment)
+        except Exception as error:
+            summary['error'] = str(error)
+            return summary
+
+        for row in summary['wells']:
+            well = analyzed.get((row['condition'], row['replicate'] - 1))
+            if well is not None:
+                row['loc'] = well.linear_loc
+
+        # Calculate fold changes from whichever replicates have data for both
+        # the reference and the condition.
+        for condition, labels in experiment['wells'].items():
+            if condition == reference or reference not in experiment['wells']:
+                continue
+
+            pairs = [
+                    (analyzed[reference, i], analyzed[condition, i])
+                    for i in range(len(labels))
+                    if (reference, i) in analyzed and (condition, i) in analyzed
+            ]
+            if not pairs:
+                continue
+
+            comparison = analysis_helpers.RelatedWells({
+                    'label': experiment['label'],
+                    'wells': {
+                        reference: [ref for ref, _ in pairs],
+                        condition: [expt for _, expt in pairs],
+                    },
+                }, condition, reference, 0)
+
+            fold_change, fold_changes = comparison.calc_fold_change_with_sign()
+            summary['fold_changes'][condition] = OrderedDict([
+                ('fold_change', fold_change),
+                ('replicates', list(fold_changes)),
+            ])
+
+        return summary
+
+    def _refresh_event_rates(self, summary):
+        for row in summary['wells']:
+            well_file = self.files[row['well']]
+            row['events'] = well_file.num_events
+            row['events_per_sec'] = well_file.events_per_sec
+
+    def _analyze_experiment(self, experiment):
+        """
+        Gate and analyze the wells from the given experiment that have been
+        completely acquired.  Return a dictionary mapping (condition, replicate)
+        tuples to analyzed wells.
+        """
+        indices = {}
+        wells = OrderedDict()
+
+        for condition, labels in experiment['wells'].items():
+            wells[condition] = []
+            for i, label in enumerate(labels):
+                well = self.files[label].copy_well()
+                if well is not None:
+                    indices[condition, len(wells[condition])] = condition, i
+                    wells[condition].append(well)
+
+        if not indices:
+            return {}
+
+        # Work on a copy of the experiment with only the wells that have data,
+        # because the processing steps modify the wells in place.
+        experiments = [dict(experiment, wells=wells)]
+
+        try:
+            shared_steps = analysis_helpers.SharedProcessingSteps(self.verbose)
+            shared_steps.early_event_threshold = self.time_gate
+            shared_steps.small_cell_threshold = self.size_gate
+            shared_steps.low_fluorescence_threshold = self.expression_gate
+            shared_steps.process(experiments)
+
+            analysis_helpers.analyze_wells(
+                    experiments,
+                    channel=self.channel,
+                    control_channel=self.control_channel,
+                    loc_metric=self.loc_metric,
+                    control_expt=False,
+            )
+        finally:
+            fcmcmp.clear_all_processing_steps()
+
+        return {
+                indices[condition, j]: well
+                for condition, analyzed_wells in wells.items()
+                for j, well in enumerate(analyzed_wells)
+        }
+
+    def _write_state(self):
+        state = OrderedDict([
+            ('yml_path', str(self.yml_path)),
+            ('updated', time.strftime('%Y-%m-%d %H:%M:%S')),
+            ('experiments', list(self.summaries.values())),
+        ])
+
+        # Write to a temporary file and then rename it, so that anyone reading
+        # the state file never sees a partially written summary.
+        state_path = Path(self.state_path)
+        with NamedTemporaryFile('w', dir=str(state_path.parent),
+                prefix=state_path.name, delete=False) as file:
+            json.dump(state, file, indent=2, default=json_default)
+
+        os.replace(file.name, str(state_path))
+
+    def _print_summary(self):
+        print(time.strftime('%H:%M:%S'))
+
+        for summary in self.summaries.values():
+            status = '  '.join(
+                    '{}:{}'.format(x['well'], x['status'][0])
+                    for x in summary['wells'])
+            fold_changes = '  '.join(
+                    '{}={:.2f}'.format(k, v['fold_change'])
+                    for k, v in summary['fold_changes'].items())
+            error = summary.get('error', '')
+            print(f"  {summary['label']:30s}  {fold_changes:20s}  {status}  {error}")
+
+
+class WellFile:
+    """
+    Keep track of the *.fcs file for a single well, as it's being acquired.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.path = None
+        self.size = None
+        self.status = 'waiting'
+        self.well = None
+        self.reader = None
+        self.counter = None
+        self.events_per_sec = None
+
+    @property
+    def num_events(self):
+        if self.well is not None:
+            return len(self.well.data)
+        if self.counter is not None:
+            return self.counter.num_events
+        return 0
+
+    def find(self, paths):
+        plate, well = fcmcmp.parse_well_label(self.label)
+        pattern = '_{}_'.format(well)
+        matches = [x for x in paths.get(plate, []) if pattern in x.name]
+
+        if len(matches) > 1:
+            raise fcmcmp.UsageError("Multiple *.fcs files found for well '{}'".format(self.label))
+        if matches and matches[0] != self.path:
+            self.path = matches[0]
+            self.size = None
+            self.well = self.reader = self.counter = None
+
+    def update(self, assume_complete=False, time_window=2):
+        """
+        Check if the file has changed, and load it if it's done being written.
+        Return two booleans: whether the status or the completed data for
+        this well changed (so any analysis that uses it is out of date), and
+        whether new events were read while the well is still being acquired
+        (so only its event count and rate are out of date).
+        """
+        if self.path is None:
+            return False, False
+
+        size = self.path.stat().st_size
+
+        # The file is complete once its size stops changing.
+        if size == self.size or assume_complete:
+            if self.status == 'complete' and self.size == size:
+                return False, False
+
+            meta, data = fcsparser.parse(str(self.path))
+            self.well = fcmcmp.Well(self.label, meta, data)
+            self.size = size
+            self.status = 'complete'
+
+            counter = analysis_helpers.EventRateCounter()
+            counter.extend(data['Time'] * float(meta.get('$TIMESTEP', 1)))
+            self.events_per_sec = counter.net_rate
+            self.reader = self.counter = None
+            return True, False
+
+        # Otherwise the file is still being acquired, so just read the new
+        # events to keep track of the event rate.
+        status_changed = self.status != 'acquiring'
+        self.size = size
+        self.status = 'acquiring'
+        self.well = None
+
+        if self.reader is None:
+            self.reader = analysis_helpers.FollowFcs(self.path)
+            self.counter = analysis_helpers.EventRateCounter(time_window)
+
+        try:
+            new_events = self.reader.read()
+        except ValueError:
+            return status_changed, False
+
+        if len(new_events) == 0 or 'Time' not in new_events:
+            return status_changed, False
+
+        self.counter.extend(new_events['Time'] * self.reader.timestep)
+        recent = self.counter.end_time - time_window / 2
+        self.events_per_sec = self.counter.evaluate([recent])[0]
+
+        return status_changed, True
+
+    def copy_well(self):
+        if self.well is None:
+            return None
+        return fcmcmp.Well(self.well.label, self.well.meta, self.well.data.copy())
+
+
+def json_default(x):
+    if isinstance(x, np.generic):
+        return x.item()
+    raise TypeError(repr(x))
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+
+    monitor = SortMonitor(args['<yml_path>'])
+    monitor.state_path = args['--state'].replace('$', monitor.yml_path.stem)
+    monitor.interval = float(args['--interval'])
+    monitor.channel = args['--channel']
+    monitor.control_channel = args['--normalize-by'] or not args['--no-normalize']
+    monitor.loc_metric = args['--loc-metric']
+    monitor.time_window = float(args['--time-window'])
+    monitor.time_gate = float(args['--time-gate'])
+    monitor.size_gate = float(args['--size-gate'])
+    monitor.expression_gate = float(args['--expression-gate'])
+    monitor.verbose = args['--verbose']
+
+    if args['--once']:
+        monitor.update(assume_complete=True)
+    else:
+        monitor.monitor()
@@ -60,7 +60,8 @@ Options:
 
     -a --cell-alpha <value>             [default: 0.5]
         The transparency level of the points representing cells in the scatter 
-        plot.  Values must be between 0 and 1.
+        plot.  Values must be between 0 and 1.  With --density, this is the 
+        opacity of the most crowded pixels.
 
     --histogram-bins <num>              [default: 50]
         The number of bins to use in each dimension when calculating the 
@@ -78,6 +79,21 @@ Options:
         zooming back out.  This parameter tells the algorithm how much to zoom 
         in, but I've found that it doesn't have much effect on the results.
 
+    -D --density
+        Draw the cells as a 2D histogram image rather than as individual 
+        points.  Each pixel is shaded according to the (log-scaled) number of 
+        cells it contains.  This makes rendering much faster, and keeps vector 
+        output files small, for wells with lots of cells.
+
+    --density-bins <num>                [default: 250]
+        The number of pixels to use in each dimension when drawing the cells as 
+        a histogram image (see --density).
+
+    --color-by-density
+        When drawing the cells as a histogram image (see --density), color each 
+        pixel by the number of cells it contains, instead of just making pixels 
+        with fewer cells more transparent.
+
     --force-vector
         If the scatter plots would be exported to a vector file format like PDF 
         or SVG (either via the command-line or the GUI), force ``matplotlib`` 
@@ -118,6 +134,9 @@ class ScatterPlot(analysis_helpers.ExperimentPlot):
         self.contour_steps = None
         self.cell_alpha = None
         self.rasterize_cells = None
+        self.show_density = None
+        self.density_bins = None
+        self.color_by_density = None
 
         # Internally used plot attributes.
         self.histograms = None
@@ -185,7 +204,7 @@ class ScatterPlot(analysis_helpers.ExperimentPlot):
             self.axes[0,0].yaxis.set_major_locator(MultipleLocator())
 
     def _create_histograms(self):
-        self.histograms = {x: [] for x in experiment['wells']}
+        self.histograms = {x: [] for x in self.experiment['wells']}
 
         for condition in self.experiment['wells']:
             self.histograms[condition] = []
@@ -232,6 +251,21 @@ class ScatterPlot(analysis_helpers.ExperimentPlot):
         axis = self.axes[row, col]
         well = self._get_well(row, col)
 
+        if self.show_density:
+            analysis_helpers.plot_density(
+                    axis,
+                    well.data[self.x_channel],
+                    well.data[self.y_channel],
+                    color=analysis_helpers.pick_color(self.experiment),
+                    xlim=(self.min_coord, self.max_coord),
+                    ylim=(self.min_coord, self.max_coord),
+                    bins=self.density_bins,
+                    alpha=1 if self.cell_alpha is None else self.cell_alpha,
+                    colormap='viridis' if self.color_by_density else None,
+                    zorder=1,
+            )
+            return
+
         axis.plot(
                 well.data[self.x_channel],
                 well.data[self.y_channel],
@@ -260,9 +294,9 @@ class ScatterPlot(analysis_helpers.ExperimentPlot):
 
 
 
-if __name__ == '__main__':
-    args = docopt.docopt(__doc__)
-    experiment = fcmcmp.load_experiment(args['<yml_path>'], args['<experiment>'])
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv)
+    experiment = analysis_helpers.load_experiment(args['<yml_path>'], args['<experiment>'])
 
     shared_steps = analysis_helpers.SharedProcessingSteps(args['--verbose'])
     shared_steps.early_event_threshold = float(args['--time-gate'])
@@ -283,6 +317,9 @@ if __name__ == '__main__':
     analysis.contour_steps = int(args['--contour-steps'])
     analysis.cell_alpha = float(args['--cell-alpha'])
     analysis.rasterize_cells = not args['--force-vector']
+    analysis.show_density = args['--density']
+    analysis.density_bins = int(args['--density-bins'])
+    analysis.color_by_density = args['--color-by-density']
 
     if args['--output-size']:
         analysis.output_size = map(float, args['--output-size'].split('x'))
@@ -290,3 +327,7 @@ if __name__ == '__main__':
     with analysis_helpers.plot_or_savefig(
             args['--output'], args['<yml_path>'], args['--inkscape']):
         analysis.plot()
+
+
+if __name__ == '__main__':
+    main()
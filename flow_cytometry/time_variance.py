@@ -32,7 +32,23 @@ Options:
 
     -a --alpha <value>                  [default: 0.2]
         The transparency level of the points representing cells in the scatter 
-        plot.  Values must be between 0 and 1.
+        plot.  Values must be between 0 and 1.  With --density, this is the 
+        opacity of the most crowded pixels.
+
+    -D --density
+        Draw the cells as a 2D histogram image rather than as individual 
+        points.  Each pixel is shaded according to the (log-scaled) number of 
+        cells it contains.  This makes rendering much faster, and keeps vector 
+        output files small, for wells with lots of cells.
+
+    --density-bins <num>                [default: 250]
+        The number of pixels to use in each dimension when drawing the cells as 
+        a histogram image (see --density).
+
+    --color-by-density
+        When drawing the cells as a histogram image (see --density), color each 
+        pixel by the number of cells it contains, instead of just making pixels 
+        with fewer cells more transparent.
 
     --force-vector
         If the scatter plots would be exported to a vector file format like PDF 
@@ -56,6 +72,9 @@ class TimeChannel(analysis_helpers.ExperimentPlot):
         self.channel = None
         self.alpha = None
         self.force_vector = None
+        self.show_density = None
+        self.density_bins = None
+        self.color_by_density = None
 
     def plot(self):
         self._create_axes()
@@ -81,6 +100,18 @@ class TimeChannel(analysis_helpers.ExperimentPlot):
         channel = analysis_helpers.pick_channel(experiment, self.channel)
         color = analysis_helpers.pick_color(self.experiment)
 
+        if self.show_density:
+            analysis_helpers.plot_density(
+                    axis,
+                    well.data['Time'] / 100,
+                    well.data[channel],
+                    color=color,
+                    bins=self.density_bins,
+                    alpha=1 if self.alpha is None else self.alpha,
+                    colormap='viridis' if self.color_by_density else None,
+            )
+            return
+
         axis.plot(
                 well.data['Time'] / 100,
                 well.data[channel],
@@ -108,6 +139,9 @@ if __name__ == '__main__':
     analysis.channel = args['--channel']
     analysis.alpha = float(args['--alpha'])
     analysis.force_vector = args['--force-vector']
+    analysis.show_density = args['--density']
+    analysis.density_bins = int(args['--density-bins'])
+    analysis.color_by_density = args['--color-by-density']
 
     with analysis_helpers.plot_or_savefig(args['--output'], args['<yml_path>']):
         analysis.plot()
@@ -379,10 +379,10 @@ class MinorSymLogLocator(Locator):
 
 
 
-if __name__ == '__main__':
+def main(argv=None):
     import docopt
-    args = docopt.docopt(__doc__)
-    experiments = fcmcmp.load_experiments(args['<yml_path>'])
+    args = docopt.docopt(__doc__, argv)
+    experiments = analysis_helpers.load_experiments(args['<yml_path>'])
 
     shared_steps = analysis_helpers.SharedProcessingSteps(args['--verbose'])
     shared_steps.early_event_threshold = float(args['--time-gate'])
@@ -407,3 +407,6 @@ if __name__ == '__main__':
             args['--output'], args['<yml_path>'], args['--inkscape']):
         analysis.plot()
 
+
+if __name__ == '__main__':
+    main()
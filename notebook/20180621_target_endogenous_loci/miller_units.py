@@ -126,10 +126,8 @@ Configuration:
         The volume of cells (in µL) added to the reaction.
 """
 
-import re
 import sys
 import docopt
-import toml
 import itertools
 import textwrap
 import numpy as np
@@ -140,7 +138,8 @@ import sgrna_sensor
 
 from pathlib import Path
 from color_me import ucsf
-from sgrna_sensor.plate_reader import BiotekExperiment
+from sgrna_sensor import beta_gal
+from sgrna_sensor.plate import load_layout
 from sgrna_sensor.style import pick_color, pick_style, pick_dot_colors
 from sgrna_sensor.style import FoldChangeLocator
 from nonstdlib import inf, nan
@@ -149,61 +148,42 @@ pd.set_option('display.max_rows', 500)
 
 class Reaction:
 
-    def __init__(self, expt, well):
-        self.expt = expt
-        self.meta = expt['well'][well]
+    def __init__(self, plate, well):
+        self.plate = plate
+        self.expt = plate.layout
+        self.meta = plate.wells.loc[well].dropna().to_dict()
         self.well = well
         self.sgrna = self.meta['sgrna']
         self.spacer = self.meta['spacer']
         self.ligand = self.meta['ligand']
         self.apo_holo = 'holo' if self.ligand else 'apo'
         self.keys = (
-                expt.get('primary_key', 'spacer'),
-                expt.get('secondary_key', 'sgrna'),
+                self.expt.get('primary_key', 'spacer'),
+                self.expt.get('secondary_key', 'sgrna'),
         )
         self.key = tuple(self.meta[x] for x in self.keys)
         self.label = self.meta.get('label', 
                 ' '.join(self.meta[x] for x in self.keys))
 
-        df = expt['data'].kinetic[420]\
-                .query('well == @well').reset_index(drop=True)
-        self.t_min = self.raw_t_min = df['minutes']
-        self.a420 = self.raw_a420 = df['read']
-        self.od600 = self.raw_od600 = expt['data'].reads[600][well]
-        self.vol_mL = self.meta['culture_volume_uL'] / 1000
-
-        # If a blank well was given, subtract it from the absorbance 
-        # measurements.
-        self.a420_blank_well = self._blank_well('a420')
-        self.od600_blank_well = self._blank_well('od600')
-        self.a420_blank = np.zeros(len(self.a420))
-        self.od600_blank = 0
-
-        if self.a420_blank_well:
-            self.a420_blank = df[self.a420_blank_well]
-            self.a420 -= self.a420_blank
-        if self.od600_blank_well:
-            self.od600_blank = expt['data'].reads[600][self.od600_blank_well]
-            self.od600 -= self.od600_blank
-
-        self.i_min = i = self._first_timepoint()
-        self.i_max = j = self._last_timepoint()
-        self.fit_t_min = self.t_min[i:j]
-        self.fit_a420 = self.a420[i:j]
-
-        try:
-            self.miller, self.fit = miller_units(
-                    self.fit_t_min,
-                    self.fit_a420,
-                    self.od600,
-                    self.vol_mL,
-            )
-        except Exception as e:
-            print(f"Failed to fit line for well {well}: i_min={i}; i_max={j}")
-            self.miller, self.fit = nan, (nan, nan)
+        # The blanks have already been subtracted, and the lines have already 
+        # been fit (for every well at once) by `beta_gal.load_plates()`.
+        fit = plate.fits.loc[well]
+        self.t_min = pd.Series(plate.minutes)
+        self.a420 = plate.a420[well]
+        self.raw_a420 = plate.raw_a420[well]
+        self.od600 = fit['od600']
+        self.raw_od600 = plate.raw_od600[well]
+        self.vol_mL = fit['vol_mL']
+        self.i_min = int(fit['i_min'])
+        self.i_max = int(fit['i_max'])
+        self.fit = fit['slope'], fit['intercept']
+        self.miller = fit['miller']
+
+        if np.isnan(self.miller):
+            print(f"Failed to fit line for well {well}: i_min={self.i_min}; i_max={self.i_max}")
 
     def __repr__(self):
-        return f'<Reaction well={self.well} miller={self.miller:.1f} date={self.expt["data"].date.strftime("%Y-%m-%d")}>'
+        return f'<Reaction well={self.well} miller={self.miller:.1f} date={self.plate.date.strftime("%Y-%m-%d")}>'
 
     def __str__(self):
         from pprint import pformat
@@ -231,148 +211,16 @@ class Reaction:
                 fit=self.fit,
         ))
 
-    def _first_timepoint(self):
-        # Some traces curve upwards in the early timepoints, perhaps as cell 
-        # lysis continues.  Here we decide the first timepoint to include.
-        min_time = self.meta['min_time']
-        return abs(self.t_min - min_time).idxmin()
-
-    def _last_timepoint(self):
-        # Some traces curve downwards once A420 gets too high, presumably as 
-        # the substrate begins to be limiting.  The user can also specify the 
-        # latest timepoint they want to include.
-
-        i = self.i_min  # Don't count points before the time cutoff.
-        max_a420 = self.meta['max_a420']
-        max_t = self.meta.get('max_time', self.t_min.iloc[-1])
-        return max(i+2, min(
-                abs( self.a420.iloc[i:] - max_a420).idxmin(),
-                abs(self.t_min.iloc[i:] - max_t   ).idxmin(),
-        ))
-
-    def _blank_well(self, channel):
-        blank_well = self.meta.get(f'{channel}_blank', self.meta.get('blank'))
-
-        if blank_well is None:
-            return None
-
-        row_col_pat = re.compile('^([A-H])?([0-9]{1,2})?$')
-        blank_match = row_col_pat.match(blank_well)
-        well_match = row_col_pat.match(self.well)
-
-        if not blank_match:
-            raise ValueError(f"blank well '{blank_well}' doesn't seem like a well.")
-        if not well_match:
-            raise ValueError(f"well '{self.well}' doesn't seem like a well.")
-
-        blank_row, blank_col = blank_match.groups()
-        well_row, well_col = well_match.groups()
-
-        if blank_row and blank_col:
-            return blank_row + blank_col
-
-        elif blank_row and not blank_col:
-            return blank_row + well_col
-
-        elif not blank_row and blank_col:
-            return well_row + blank_col
-
-        else:
-            raise AssertionError()
-
     def linear_fit(self, x):
         return np.polyval(self.fit, x)
 
-def load_expt(toml_path):
-
-    def recursive_merge(expt, defaults, overwrite=False):
-        for key, default in defaults.items():
-            if isinstance(default, dict):
-                expt.setdefault(key, {})
-                recursive_merge(expt[key], default)
-            else:
-                if overwrite or key not in expt:
-                    expt[key] = default
-
-    def do_load_paths(toml_path):
-        toml_path = Path(toml_path).resolve()
-        expt = toml.load(str(toml_path))
-        expt['toml_path'] = toml_path
-
-        # Resolve the path the actual data.
-        if 'xlsx_path' in expt:
-            expt['xlsx_path'] = toml_path.parent / expt['xlsx_path']
-        else:
-            default_xlsx = toml_path.parent / f'{toml_path.stem}.xlsx'
-            if default_xlsx.exists():
-                expt['xlsx_path'] = default_xlsx
-
-        if 'xlsx_path' in expt:
-            expt['data'] = BiotekExperiment(str(expt['xlsx_path']))
-
-        # Include a remote file if one is specified.  
-        if 'template' in expt:
-            expt['template'] = toml_path.parent / expt['template']
-            template = do_load_paths(expt['template'])
-            recursive_merge(expt, template)
-
-        return expt
-
-    expt = do_load_paths(toml_path)
-
-    # Complain if `xlsx_path` isn't defined.
-
-    # It's ok for individual files to not include `xlsx_path`, because it might 
-    # be filled in by default, or implied from a template file.  But by the 
-    # time we get here, we need to know where the data is.
-
-    if 'xlsx_path' not in expt:
-        raise ValueError(f"no xlsx path specified or inferred in '{toml_path}'")
-
-    # Apply any row or column defaults.
-    if 'well' not in expt:
-        expt['well'] = {}
-
-    rows = expt.get('row', {})
-    cols = expt.get('col', {})
-
-        # Create new wells implied by the 'row' and 'col' blocks.
-    for row, col in itertools.product(rows, cols):
-        expt['well'].setdefault(f'{row}{col}', {})
-
-        # Update any existing wells.
-    for well in expt.get('well', {}):
-        row, col = well[:1], well[1:]
-        recursive_merge(expt['well'][well], rows.get(row, {}))
-        recursive_merge(expt['well'][well], cols.get(col, {}))
-
-    # Apply any plate-wide defaults.
-    recursive_merge(
-            expt.setdefault('plate', {}),
-            dict(
-                culture_volume_uL=100,
-                min_time=0,
-                max_a420=1.9,
-            )
-    )
-    for well in expt.get('well', {}):
-        recursive_merge(expt['well'][well], expt['plate'])
-
-    # If the experiment has any notes, print them out.
-    if 'notes' in expt:
-        print(toml_path)
-        print(expt['notes'].strip())
-        print()
-
-    return expt
-
-def load_reactions(expts):
+def load_reactions(plates):
     from natsort import natsorted
     rxns = []
 
-    for expt in expts:
-        for well in natsorted(expt['well']):
-            rxn = Reaction(expt, well)
+    for plate in plates:
+        for well in natsorted(plate.wells.index):
+            rxn = Reaction(plate, well)
             rxns.append(rxn)
 
     return rxns
@@ -396,11 +244,6 @@ def load_keys(rxns):
 def iter_reactions(rxns):
     yield from enumerate(rxns)
 
-def miller_units(t_min, a420, od600, vol_mL):
-    m, b = np.polyfit(t_min, a420, 1)
-    path_cm = 0.25
-    return 1000 * m * path_cm / (od600 * vol_mL), (m, b)
-
 def plot_fits(rxns, stem, subtract_intercept=False, figure_mode=False):
     rows, cols = load_keys(rxns)
 
@@ -697,21 +540,22 @@ if __name__ == '__main__':
         toml_paths = [sorted(all_toml_paths)[-1]]
         print(toml_paths[0])
 
-    expts = [load_expt(x) for x in toml_paths]
-
     if args['--parse-only']:
-        pprint(expts)
+        from pprint import pprint
+        for toml_path in toml_paths:
+            pprint(load_layout(toml_path))
         sys.exit()
 
     if args['--output']:
         out = args['--output']
-    elif len(expts) == 1:
-        out = expts[0]['toml_path'].stem
+    elif len(toml_paths) == 1:
+        out = Path(toml_paths[0]).stem
     else:
         print("Error: need to specify --output if there are multiple inputs.")
         sys.exit(1)
 
-    rxns = load_reactions(expts)
+    plates = beta_gal.load_plates(toml_paths)
+    rxns = load_reactions(plates)
 
     if not args['--bars-only']:
         plot_fits(rxns, out, args['--subtract-intercept'], args['--figure-mode'])
@@ -69,11 +69,8 @@ def parse_library(library, size=None):
     return library_name, library_size
 
 def evaluate_coverage(library_size, num_transformants):
-    from unique_variants import unique_items
-    num_unique_transformants = unique_items(library_size, num_transformants)
-    percent_coverage = num_unique_transformants / library_size
-    fold_coverage = num_transformants / library_size
-    return num_unique_transformants, percent_coverage, fold_coverage
+    from library_coverage import evaluate_coverage
+    return tuple(float(x) for x in evaluate_coverage(library_size, num_transformants))
 
 
 class TransformationTable:
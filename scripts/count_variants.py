@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""\
+Count how many times each library member was sequenced in one or more sorted
+populations.
+
+The randomized region of each read is located using the constant sequences
+that flank it in the given design, and only the degenerate positions are
+checked against the quality cutoff.  The FASTQ files can be gzipped, and are
+streamed rather than loaded into memory, so they can be as big as you like.
+Each file is processed by a separate process.
+
+Usage:
+    count_variants.py <design> <fastq>... [options]
+
+Arguments:
+    <design>
+        The name of the library design, e.g. 'rb/4/5'.  This is passed to
+        `sgrna_sensor.from_name()`, so any name that works with the
+        `sgrna_sensor` command will work here.
+
+    <fastq>
+        The FASTQ files to count variants in, e.g. one for each sort round.
+
+Options:
+    -o --output <tsv>
+        Save the counts to the given path, with one row for each variant and
+        one column for each FASTQ file.  By default, the counts are printed to
+        stdout.
+
+    -q --min-quality <phred>  [default: 20]
+        Discard reads where any of the degenerate positions have a quality
+        score lower than this.
+
+    -f --flank-length <nt>  [default: 10]
+        How many constant bases on either side of the randomized region must
+        match exactly for the region to be found.
+
+    -j --jobs <n>
+        How many files to process at once.  By default, one for each CPU.
+"""
+
+import sys
+import docopt
+from sgrna_sensor import fastq
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+
+    counts, stats = fastq.count_variants(
+            args['<fastq>'],
+            args['<design>'],
+            min_quality=int(args['--min-quality']),
+            flank_length=int(args['--flank-length']),
+            workers=int(args['--jobs']) if args['--jobs'] else None,
+    )
+
+    print(stats.to_string(), file=sys.stderr)
+    counts.to_csv(args['--output'] or sys.stdout, sep='\t')
@@ -1,13 +1,108 @@
+#!/usr/bin/env python3
+
+"""\
+Find spacers that target a sequence of interest, and rank them by how many
+other sites in the genome they could also target.
+
+Both strands of every sequence in the genome are searched for the given
+species' PAM.  The genome is then indexed by the PAM-proximal seed of every
+site, so that off-targets with a few mismatches anywhere in the spacer can be
+counted without comparing each spacer to the whole genome.  The index is
+cached, so only the first search of each genome is slow.
+
+Usage:
+    find_pams.py <genome> [<target>] [options]
+
+Arguments:
+    <genome>
+        A FASTA file (which may be gzipped) containing the genome to search
+        for off-targets.
+
+    <target>
+        The region to find spacers for.  This can be either the name of one of
+        the sequences in the genome, a region of one of those sequences (e.g.
+        'chrI:1000-2000'), or a DNA sequence.  By default, every site in the
+        genome is ranked.
+
+        Regions are 0-based and half-open, like python slices and BED files:
+        'chrI:1000-2000' means bases 1000 to 1999 counting from 0 (i.e. not the
+        1-based, inclusive coordinates shown by most genome browsers).  Only
+        spacers that lie entirely within the region are found.  The 'start'
+        and 'end' columns of the output use the same convention.
+
+Options:
+    -s --species <name>  [default: sp]
+        The species of Cas9 to find sites for ('sp' or 'sa').
+
+    -m --max-mismatches <n>  [default: 3]
+        Count off-targets with up to this many mismatches to the spacer.
+
+    -n --num-spacers <n>
+        Only show this many of the best spacers.
+
+    -o --output <tsv>
+        Save the ranked spacers to the given path.  By default, they're printed
+        to stdout.
+
+    -j --jobs <n>
+        How many processes to use when counting off-targets.  By default, one
+        for each CPU.
+
+    --no-cache
+        Build the off-target index in a temporary directory, rather than
+        reusing (or saving) a cached one.
+"""
+
 import re
+import sys
+import docopt
+from sgrna_sensor import sites
+
+def find_target_sites(genome_path, target, species):
+    genome = sites.load_fasta(genome_path)
+
+    if target is None:
+        return sites.find_sites(genome, species)
+
+    if target in genome:
+        return sites.find_sites({target: genome[target]}, species)
+
+    region = re.fullmatch(r'(.+):([0-9,]+)-([0-9,]+)', target)
+    if region and region.group(1) in genome:
+        chrom = region.group(1)
+        start = int(region.group(2).replace(',', ''))
+        end = int(region.group(3).replace(',', ''))
+
+        df = sites.find_sites({chrom: genome[chrom][start:end]}, species)
+        df['start'] += start
+        df['end'] += start
+        return df
+
+    if re.fullmatch('[ACGTUacgtu]+', target):
+        return sites.find_sites({'target': target.upper().replace('U', 'T')}, species)
+
+    raise ValueError(f"'{target}' is not a sequence in '{genome_path}', a region of one, or a DNA sequence.")
 
-rfp = "gcgagtagcgaagacgttatcaaagagttcatgcgtttcaaagttcgtatggaaggttccgttaacggtcacgagttcgaaatcgaaggtgaaggtgaaggtcgtccgtacgaaggtacccagaccgctaaactgaaagttaccaaaggtggtccgctgccgttcgcttgggacatcctgtccccgcagttccagtacggttccaaagcttacgttaaacacccggctgacatcccggactacctgaaactgtccttcccggaaggtttcaaatgggaacgtgttatgaacttcgaagacggtggtgttgttaccgttacccaggactcctccctgcaagacggtgagttcatctacaaagttaaactgcgtggtaccaacttcccgtccgacggtccggttatgcagaaaaaaaccatgggttgggaagcttccaccgaacgtatgtacccggaagacggtgctctgaaaggtgaaatcaaaatgcgtctgaaactgaaagacggtggtcactacgacgctgaagttaaaaccacctacatggctaaaaaaccggttcagctgccgggtgcttacaaaaccgacatcaaactggacatcacctcccacaacgaagactacaccatcgttgaacagtacgaacgtgctgaaggtcgtcactccaccggtgcttaa"
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    species = args['--species']
+    max_mismatches = int(args['--max-mismatches'])
 
-spacers = re.findall('cc.{18}.cc', rfp)
+    targets = find_target_sites(args['<genome>'], args['<target>'], species)
+    if targets.empty:
+        print("No spacers found.", file=sys.stderr)
+        sys.exit(1)
 
-if not spacers:
-    print "No spacers found."
+    index = sites.load_seed_index(
+            args['<genome>'], species, cache=not args['--no-cache'])
 
-for spacer in spacers:
-    print spacer, 729 + rfp.find(spacer)
+    ranked = sites.rank_spacers(
+            targets, index,
+            max_mismatches=max_mismatches,
+            workers=int(args['--jobs']) if args['--jobs'] else None,
+    )
 
+    if args['--num-spacers']:
+        ranked = ranked.head(int(args['--num-spacers']))
 
+    ranked.to_csv(args['--output'] or sys.stdout, sep='\t', index=False)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""\
+Array-valued versions of the library coverage calculations used by
+'unique_variants.py', 'count_transformants.py', and 'debrief_screen.py'.
+
+Every function accepts numpy arrays (or anything that can be broadcast
+together) and returns arrays of the broadcast shape, so whole grids of
+parameters can be evaluated at once.  The probability of picking a library
+member is calculated with `log1p()` and `expm1()`, so the results stay
+accurate even for libraries with 4²⁰ or more members, where ``(1 - 1/N)**k``
+rounds to 1.
+"""
+
+import functools
+import numpy as np
+from collections import namedtuple
+
+# Sorting efficiencies (cells actually sorted / events detected) measured at
+# different event rates on the BD FACSAria II, as (event rate, efficiency)
+# pairs.  Some event rates were measured more than once.
+SORT_EFFICIENCIES = [
+    (47668, 0.08), # 20160331_optimize_sorting_speed
+    (26166, 0.42),
+    ( 9575, 0.73),
+    ( 3098, 0.90),
+    (49921, 0.06),
+    (26267, 0.39),
+    ( 9961, 0.72),
+    ( 3233, 0.90),
+    (53380, 0.10),
+    (30071, 0.49),
+    (10233, 0.81),
+    ( 2917, 0.91),
+    (53380, 0.16),
+    (30071, 0.57),
+    (10233, 0.84),
+    ( 2917, 0.94),
+    ( 1135, 0.96), # 20160414_screen_rb
+    ( 1348, 0.96),
+]
+
+ProtocolGrid = namedtuple(
+        'ProtocolGrid', 'steps unique_items fraction_picked fold_coverage')
+
+def fraction_picked(num_items, num_picked):
+    """
+    The fraction of a library with the given number of (equally abundant)
+    members expected to be picked at least once after picking the given
+    number of individuals, i.e. ``1 - (1 - 1/N)**k``.
+    """
+    num_items = np.asarray(num_items, dtype=float)
+    num_picked = np.asarray(num_picked, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = -np.expm1(num_picked * np.log1p(-1 / num_items))
+
+    return np.where(num_items > 1, fraction, 1.0)
+
+def unique_items(num_items, num_picked):
+    """
+    The number of unique library members expected to be picked.
+    """
+    return np.asarray(num_items, dtype=float) * fraction_picked(num_items, num_picked)
+
+def evaluate_coverage(library_size, num_transformants):
+    """
+    Return the number of unique transformants, the fraction of the library
+    they cover, and the fold coverage of the library.
+    """
+    library_size = np.asarray(library_size, dtype=float)
+    num_unique = unique_items(library_size, num_transformants)
+    return num_unique, num_unique / library_size, num_transformants / library_size
+
+@functools.lru_cache()
+def sort_efficiency_fit():
+    """
+    Fit a line to the measured sorting efficiencies.  The fit is only done
+    once, then reused.
+    """
+    import scipy.stats
+
+    event_rates, efficiencies = np.array(SORT_EFFICIENCIES).T
+    m, b, _, _, _ = scipy.stats.linregress(event_rates, efficiencies)
+    return m, b
+
+def sort_efficiency(event_rate):
+    """
+    Predict the efficiency of the sort, meaning the number of cells that are
+    actually charged and sorted divided by the number of events that are just
+    detected.
+    """
+    event_rate = np.asarray(event_rate, dtype=float)
+
+    if (event_rate < 0).any():
+        raise ValueError('The event rate must be positive, not {}.'.format(event_rate))
+
+    m, b = sort_efficiency_fit()
+    return np.maximum(m * event_rate + b, 0)
+
+def items_sorted_by_counts(num_processed, efficiency, survival_rate=0.6):
+    return np.asarray(num_processed, dtype=float) * efficiency * survival_rate
+
+def items_sorted_by_time(sort_time_min, event_rate=10000, survival_rate=0.6):
+    """
+    Return the number of cells that can be sorted in the given number of
+    minutes, accounting for the fact that not all cells survive sorting and
+    that the sorter will decline to sort cells in certain (usually crowded)
+    conditions.
+    """
+    event_rate = np.asarray(event_rate, dtype=float)
+    true_event_rate = event_rate * sort_efficiency(event_rate) * survival_rate
+    return 60 * np.asarray(sort_time_min, dtype=float) * true_event_rate
+
+def sort_time(num_items, fraction_wanted, event_rate=10000, survival_rate=0.6):
+    """
+    Calculate how many minutes it will take to collect the given fraction of
+    the library, accounting for the fact that some cells will be
+    double-counted and some cells won't survive sorting.
+    """
+    num_items = np.asarray(num_items, dtype=float)
+    fraction_wanted = np.asarray(fraction_wanted, dtype=float)
+
+    with np.errstate(divide='ignore'):
+        num_counted = np.log1p(-fraction_wanted) / np.log1p(-1 / num_items)
+
+    return num_counted / items_sorted_by_time(1, event_rate, survival_rate)
+
+
+def evaluate_protocol(protocol, library_size=None, event_rate=None, survival_rate=0.6):
+    """
+    Calculate how many unique library members remain after each step of the
+    given screen, for every combination of the given parameters.
+
+    The protocol can be a path to a YAML file, or a list of steps as returned
+    by `unique_variants.records_from_yaml()`.  Each parameter can be a single
+    value or a 1D array:
+
+    `library_size`: The number of members in the library.  This replaces the
+        number given by the first step of the protocol (which must be a
+        'unique' step), or, if that step is 'picked', is the library it picks
+        from.  By default, the protocol is used as is.
+
+    `event_rate`: The event rate for sorts specified by time.  By default,
+        the event rate given in the protocol is used.
+
+    `survival_rate`: The fraction of cells that survive sorting.
+
+    The return value is a `ProtocolGrid` with the names of the steps, and
+    arrays of the number of unique members, the fraction of the previous
+    step's members that were kept, and the fold coverage.  Each array has one
+    axis for the steps and one for each parameter, in the order above:
+
+    >>> grid = evaluate_protocol('screen.yml', 4**np.arange(8, 13), [5000, 10000])
+    >>> grid.unique_items.shape
+    (4, 5, 2, 1)
+    """
+    from unique_variants import cast_to_number, records_from_yaml, parse_sort
+
+    if not isinstance(protocol, list):
+        protocol = records_from_yaml(protocol)
+
+    def axis(x, i):
+        shape = [1, 1, 1]
+        shape[i] = -1
+        return np.reshape(np.asarray(x, dtype=float), shape)
+
+    lib = axis(library_size if library_size is not None else np.nan, 0)
+    rate = axis(event_rate if event_rate is not None else np.nan, 1)
+    surv = axis(survival_rate, 2)
+    shape = np.broadcast(lib, rate, surv).shape
+
+    names = []
+    unique, fraction, fold = [], [], []
+    prev = None
+
+    for i, record in enumerate(protocol):
+        names.append(record.get('step', ''))
+
+        if 'unique' in record:
+            if i == 0 and library_size is not None:
+                n = lib
+            else:
+                n = cast_to_number(record['unique'])
+
+            u = np.asarray(n, dtype=float)
+            f = 1.0 if prev is None else u / prev
+            x = 1.0
+
+        elif 'picked' in record:
+            num_picked = cast_to_number(record['picked'])
+            num_items = lib if i == 0 else prev
+
+            if num_items is None or (i == 0 and library_size is None):
+                u, f, x = num_picked, 1.0, 1.0
+            else:
+                u = unique_items(num_items, num_picked)
+                f = fraction_picked(num_items, num_picked)
+                x = num_picked / num_items
+
+        elif 'sorted' in record:
+            if prev is None:
+                raise ValueError("the first step can't be 'sorted'.")
+
+            num_sampled, num_picked = parse_sort(record['sorted'], rate, surv)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                num_items = np.where(
+                        num_sampled > 0, prev * num_picked / num_sampled, 0)
+                u = unique_items(num_items, num_picked)
+                f = fraction_picked(num_items, num_picked)
+                x = num_picked / num_items
+
+        else:
+            raise SyntaxError("Every step must specify 'unique', 'picked', 'sorted', or 'from'.")
+
+        unique.append(np.broadcast_to(u, shape))
+        fraction.append(np.broadcast_to(f, shape))
+        fold.append(np.broadcast_to(x, shape))
+        prev = unique[-1]
+
+    return ProtocolGrid(names, np.array(unique), np.array(fraction), np.array(fold))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""\
+Simulate a library screen many times, to see how many unique library members
+are likely to remain after each step.
+
+This is a Monte Carlo counterpart to 'unique_variants.py', and it understands
+the same arguments and protocol files.  The analytical model in that script
+predicts the average number of unique library members, assuming that every
+member is equally abundant at every step.  This script instead keeps track of
+how many cells carry each library member, so it can show how much the number
+of unique members varies from screen to screen, and it accounts for members
+that end up over- or under-represented after being picked.
+
+Usage:
+    simulate_screen.py <protocol> [options]
+    simulate_screen.py <num_items> <num_picked>... [options]
+
+Arguments:
+    <protocol>
+        A YAML-formatted file describing all the steps in a library screen, in
+        the format expected by 'unique_variants.py'.
+
+    <num_items>
+        The theoretical complexity of the library being picked from.  This can
+        also be the name of a design with degenerate positions.
+
+    <num_picked>
+        The number of individuals you picked from the library.
+
+Options:
+    -n --num-replicates <int>  [default: 1000]
+        How many times to simulate the screen.
+
+    -s --seed <int>
+        The seed for the random number generator.  Specify this to get the same
+        results every time.
+
+    -i --int
+        Report the number of unique library members as full-precision integers.
+        By default, these numbers are rounded and reported using scientific
+        notation.
+"""
+
+import math
+import numpy as np
+
+class Population:
+    """
+    How many cells carry each member of a library.
+
+    Only the distribution of copy numbers is stored, i.e. how many library
+    members are carried by 1 cell, by 2 cells, etc.  Which members those are
+    doesn't matter for counting unique members, and the distribution takes the
+    same amount of memory whether there are thousands of cells or trillions.
+    """
+
+    def __init__(self, histogram):
+        # Map copy numbers to the number of library members with that many
+        # copies.  Members with no copies are dropped.
+        self.histogram = {
+                int(k): int(v)
+                for k, v in histogram.items() if k > 0 and v > 0
+        }
+
+    @classmethod
+    def from_uniform_library(cls, num_members):
+        return cls({1: num_members})
+
+    @property
+    def num_unique(self):
+        return sum(self.histogram.values())
+
+    @property
+    def num_cells(self):
+        return sum(k * v for k, v in self.histogram.items())
+
+    def pick(self, num_picked, rng):
+        """
+        Pick exactly the given number of cells, after growing the population
+        so that each library member is represented in proportion to how many
+        cells carried it before.
+        """
+        copies = list(self.histogram.keys())
+        members = list(self.histogram.values())
+
+        # First decide how many cells are picked from the members with each
+        # copy number, then how those cells are spread between the members.
+        weights = np.array([float(k * n) for k, n in zip(copies, members)])
+        cells = rng.multinomial(num_picked, weights / weights.sum())
+
+        picked = np.zeros(1, dtype=np.int64)
+        for n, k in zip(members, cells):
+            occupancy = _occupancy(rng, int(k), n)
+            if len(picked) < len(occupancy):
+                picked = np.pad(picked, (0, len(occupancy) - len(picked)))
+            picked[:len(occupancy)] += occupancy
+
+        return Population(dict(enumerate(picked)))
+
+    def select(self, fraction, rng):
+        """
+        Keep each library member (with all its cells) with the given
+        probability, as if a gate during a sort let through that fraction of
+        the library.
+        """
+        return Population({
+                k: _binomial(rng, v, fraction)
+                for k, v in self.histogram.items()
+        })
+
+
+def simulate(steps, num_replicates=1000, seed=None):
+    """
+    Simulate the given screen (a list of steps, as returned by
+    `unique_variants.steps_from_yaml()`) the given number of times.  Return an
+    array with a row for each replicate and a column for each step, giving
+    the number of unique library members remaining after that step.
+    """
+    rng = np.random.default_rng(seed)
+    num_unique = np.zeros((num_replicates, len(steps)))
+
+    for i in range(num_replicates):
+        population = None
+
+        for j, step in enumerate(steps):
+            population = simulate_step(step, population, rng)
+            num_unique[i,j] = population.num_unique
+
+    return num_unique
+
+def simulate_step(step, population, rng):
+    from unique_variants import UniqueStep, PickStep, SortStep
+
+    if isinstance(step, UniqueStep):
+        return Population.from_uniform_library(step.unique_items)
+
+    # Cells are sorted from the population, then the gate keeps some fraction
+    # of the library members that were sorted.
+    if isinstance(step, SortStep):
+        sampled = population.pick(step.num_sampled, rng)
+        return sampled.select(step.num_picked / step.num_sampled, rng)
+
+    if isinstance(step, PickStep):
+        if step.num_items is None:
+            return Population.from_uniform_library(step.num_picked)
+        if step.previous_step is None:
+            population = Population.from_uniform_library(step.num_items)
+        return population.pick(step.num_picked, rng)
+
+    raise ValueError(f"can't simulate {step!r}")
+
+def _occupancy(rng, num_cells, num_members):
+    """
+    Spread the given number of cells randomly between the given number of
+    equally abundant library members.  Return how many members got 1 cell, 2
+    cells, etc. (indexed by the number of cells; the first entry is always 0).
+    """
+    from scipy.stats import poisson
+
+    if num_cells == 0:
+        return np.zeros(1, dtype=np.int64)
+
+    # When there are only a few members, it's fastest to draw the number of
+    # cells picked for each member individually.
+    if num_members <= 1000:
+        occupancy = np.bincount(rng.multinomial(
+            num_cells, np.full(num_members, 1 / num_members)))
+        occupancy[0] = 0
+        return occupancy
+
+    # Otherwise, draw how many members get each number of cells all at once,
+    # as if each member got a Poisson distributed number of cells.  Only the
+    # outcomes that have any real chance of happening are considered.
+    mu = num_cells / float(num_members)
+    lo = int(poisson.ppf(1e-15, mu))
+    hi = int(poisson.isf(1e-15, mu)) + 1
+
+    occupancy = np.zeros(hi + 1, dtype=np.int64)
+    occupancy[lo:] = _multinomial(
+            rng, num_members, poisson.pmf(np.arange(lo, hi + 1), mu))
+    occupancy[0] = 0
+
+    # The Poisson draws only pick the right number of cells on average.  Add
+    # or remove cells at random until the total is exact.  This is what makes
+    # the number of cells picked for each member multinomial (rather than
+    # Poisson) distributed: removing a random cell from k+1 multinomial draws,
+    # or adding one to k-1 draws, leaves k multinomial draws.  The cells in
+    # each batch are assumed to land on different members, which is wrong
+    # about once in every 200 batches.
+    cells = np.arange(len(occupancy))
+    total = int(cells @ occupancy)
+    batch = max(1, math.isqrt(num_members) // 10)
+
+    while total != num_cells:
+        n = min(abs(num_cells - total), batch)
+
+        if occupancy[-1]:
+            occupancy = np.pad(occupancy, (0, 1))
+            cells = np.arange(len(occupancy))
+
+        if total < num_cells:
+            empty = num_members - int(occupancy.sum())
+            weights = occupancy.astype(float)
+            weights[0] = empty
+            moves = rng.multinomial(n, weights / weights.sum())
+            moves = np.minimum(moves, np.append(min(empty, n), occupancy[1:]))
+            occupancy -= moves
+            occupancy[1:] += moves[:-1]
+        else:
+            weights = (cells * occupancy).astype(float)
+            moves = rng.multinomial(n, weights / weights.sum())
+            moves = np.minimum(moves, occupancy)
+            occupancy -= moves
+            occupancy[:-1] += moves[1:]
+
+        occupancy[0] = 0
+        total = int(cells @ occupancy)
+
+    return np.trim_zeros(occupancy, 'b')
+
+def _multinomial(rng, n, pvals):
+    # numpy can't draw more than 2⁶³ items at once, which a few libraries
+    # (e.g. 4⁴⁰ members) exceed.  Each of those members is so unlikely to be
+    # picked that the counts are effectively independent Poisson draws; the
+    # total is corrected afterwards by `_occupancy()`.  The first outcome is
+    # always "no cells", which doesn't need to be drawn because members
+    # without any cells are dropped.
+    if n < 2**62:
+        return rng.multinomial(n, pvals / pvals.sum())
+    else:
+        draws = np.zeros(len(pvals), dtype=np.int64)
+        draws[1:] = rng.poisson(float(n) * pvals[1:])
+        return draws
+
+def _binomial(rng, n, p):
+    if n < 2**62:
+        return rng.binomial(n, p)
+    else:
+        return int(round(rng.normal(n * p, np.sqrt(n * p * (1 - p)))))
+
+
+if __name__ == '__main__':
+    import docopt, tabulate
+    from nonstdlib import sci
+    from unique_variants import PickStep, steps_from_yaml
+
+    args = docopt.docopt(__doc__)
+    seed = int(args['--seed']) if args['--seed'] else None
+
+    if args['<num_items>']:
+        protocols = [
+                [PickStep(args['<num_items>'], num_picked)]
+                for num_picked in args['<num_picked>']
+        ]
+    else:
+        protocols = [steps_from_yaml(args['<protocol>'])]
+
+    table = []
+    header = ['step', 'predicted', 'mean', 'std', '5%', 'median', '95%']
+    format = int if args['--int'] else sci
+
+    for steps in protocols:
+        num_unique = simulate(steps, int(args['--num-replicates']), seed)
+
+        for step, x in zip(steps, num_unique.T):
+            table.append([
+                    step.name or '',
+                    format(step.unique_items),
+                    format(x.mean()),
+                    format(x.std()),
+                    *map(format, np.percentile(x, [5, 50, 95])),
+            ])
+
+    print(tabulate.tabulate(table, header, tablefmt='plain'))
@@ -43,18 +43,18 @@ Options:
         optimize conditions to increase cell viability.
 """
 
-import re, numpy as np
+import re
+import numpy as np
+import library_coverage
 from nonstdlib import *
 from pprint import pprint
 inf = float('inf')
 
 def fraction_picked(num_items, num_picked):
-    # I'm not sure I'm handling the "fractional" case correctly...
-    return 1 - ((num_items - 1) / num_items)**num_picked    \
-            if num_items > 1 else 1
+    return float(library_coverage.fraction_picked(num_items, num_picked))
 
 def unique_items(num_items, num_picked):
-    return num_items * fraction_picked(num_items, num_picked)
+    return float(library_coverage.unique_items(num_items, num_picked))
 
 def sort_efficiency(event_rate):
     """
@@ -64,36 +64,7 @@ def sort_efficiency(event_rate):
     rate and sorting efficiency is pretty good, although the efficiency also 
     fluctuates by ~10% depending on how common the desired cells are.
     """
-    import scipy.stats
-
-    if event_rate < 0:
-        raise ValueError('The event rate must be positive, not {}.'.format(event_rate))
-
-    event_rates_to_efficiencies = {
-        47668: 0.08, # 20160331_optimize_sorting_speed
-        26166: 0.42,
-         9575: 0.73,
-         3098: 0.90,
-        49921: 0.06,
-        26267: 0.39,
-         9961: 0.72,
-         3233: 0.90,
-        53380: 0.10,
-        30071: 0.49,
-        10233: 0.81,
-         2917: 0.91,
-        53380: 0.16,
-        30071: 0.57,
-        10233: 0.84,
-         2917: 0.94,
-         1135: 0.96, # 20160414_screen_rb
-         1348: 0.96,
-    }
-
-    event_rates = np.array(list(event_rates_to_efficiencies.keys()))
-    efficiencies = np.array(list(event_rates_to_efficiencies.values()))
-    m, b, _, _, _ = scipy.stats.linregress(event_rates, efficiencies)
-    return max(m * event_rate + b, 0)
+    return float(library_coverage.sort_efficiency(event_rate))
 
 def sort_time(num_items, fraction_wanted, event_rate=10000, survival_rate=0.6):
     """
@@ -101,8 +72,8 @@ def sort_time(num_items, fraction_wanted, event_rate=10000, survival_rate=0.6):
     library, accounting for the fact that some cells will be double-counted 
     and some cells won't survive sorting.
     """
-    counting = np.log(1 - fraction_wanted) / np.log((num_items - 1) / num_items)
-    return int(counting / items_sorted(1, event_rate, survival_rate))
+    return int(library_coverage.sort_time(
+            num_items, fraction_wanted, event_rate, survival_rate))
 
 def items_sorted_by_counts(num_processed, efficiency, survival_rate=0.6):
     return num_processed * efficiency * survival_rate
@@ -113,8 +84,8 @@ def items_sorted_by_time(sort_time, event_rate=10000, survival_rate=0.6):
     accounting for the fact that not all cells survive sorting and that the 
     sorter will decline to sort cells in certain (usually crowded) conditions.
     """
-    true_event_rate = event_rate * sort_efficiency(event_rate) * survival_rate
-    return 60 * cast_to_minutes(sort_time) * true_event_rate
+    return float(library_coverage.items_sorted_by_time(
+            cast_to_minutes(sort_time), event_rate, survival_rate))
 
 def cast_to_number(x):
     try:
@@ -273,15 +244,78 @@ class SortStep(PickStep):
 
 
 
-def steps_from_yaml(path):
+def records_from_yaml(path):
+    """
+    Read the steps of a library screen from the given YAML file, as the
+    dictionaries written in the file.  Steps imported from other files (via
+    'from') are included in place of the step that imports them.
+    """
     import os, yaml
 
     with open(path) as file:
-        records = yaml.load(file)
+        records = yaml.safe_load(file)
 
     steps = []
 
     for record in records:
+        if 'from' in record:
+            import_path = os.path.join(os.path.dirname(path), record['from'])
+            for imported in records_from_yaml(import_path):
+                steps.append(imported)
+                if imported.get('step') == record['step']:
+                    break
+
+        elif {'unique', 'picked', 'sorted'} & set(record):
+            steps.append(record)
+
+        else:
+            raise SyntaxError("Every step must specify 'unique', 'picked', 'sorted', or 'from'.")
+
+    return steps
+
+def parse_sort(spec, event_rate=None, survival_rate=0.6):
+    """
+    Return the number of cells sampled and the number of cells kept by the
+    sort described by the given string, which can be either:
+
+        <num collected> of <num processed> at <efficiency>%
+        <percent kept>% for <time> at <event rate> evt/sec
+
+    If `event_rate` is given, it replaces the event rate of sorts described
+    the second way (unless it's NaN).  The event and survival rates can be
+    arrays, in which case so are the numbers of cells.
+    """
+    count_syntax = re.match('(.*) of (.*) at (.*)%', spec)
+    percent_syntax = re.match('(.*)% for (.*) at (.*) evt/sec', spec)
+
+    if count_syntax:
+        num_collected = cast_to_number(count_syntax.group(1))
+        num_processed = cast_to_number(count_syntax.group(2))
+        efficiency = cast_to_number(count_syntax.group(3)) / 100
+        num_sampled = library_coverage.items_sorted_by_counts(
+                num_processed, efficiency, survival_rate)
+        num_picked = library_coverage.items_sorted_by_counts(
+                num_collected, 1, survival_rate)
+
+    elif percent_syntax:
+        percent_kept = cast_to_number(percent_syntax.group(1)) / 100
+        sort_time = cast_to_minutes(percent_syntax.group(2))
+        step_rate = cast_to_number(percent_syntax.group(3))
+        if event_rate is not None:
+            step_rate = np.where(np.isnan(event_rate), step_rate, event_rate)
+        num_sampled = library_coverage.items_sorted_by_time(
+                sort_time, step_rate, survival_rate)
+        num_picked = percent_kept * num_sampled
+
+    else:
+        raise SyntaxError("can't understand '{}'.".format(spec))
+
+    return num_sampled, num_picked
+
+def steps_from_yaml(path):
+    steps = []
+
+    for record in records_from_yaml(path):
         name = record.get('step', '')
         previous_step = steps[-1] if steps else None
 
@@ -294,38 +328,8 @@ def steps_from_yaml(path):
             step = PickStep(previous_step, num_picked)
 
         elif 'sorted' in record:
-            count_syntax = re.match('(.*) of (.*) at (.*)%', record['sorted'])
-            percent_syntax = re.match('(.*)% for (.*) at (.*) evt/sec', record['sorted'])
-
-            if count_syntax:
-                num_collected = cast_to_number(count_syntax.group(1))
-                num_processed = cast_to_number(count_syntax.group(2))
-                efficiency = cast_to_number(count_syntax.group(3)) / 100
-                num_sampled = items_sorted_by_counts(num_processed, efficiency)
-                num_picked = items_sorted_by_counts(num_collected, 1)
-
-            elif percent_syntax:
-                percent_kept = cast_to_number(percent_syntax.group(1)) / 100
-                sort_time = cast_to_minutes(percent_syntax.group(2))
-                event_rate = cast_to_number(percent_syntax.group(3))
-                num_sampled = items_sorted_by_time(sort_time, event_rate)
-                num_picked = percent_kept * num_sampled
-
-            else:
-                raise SyntaxError("can't understand '{}'.".format(record['sorted']))
-                
-            step = SortStep(previous_step, num_picked, num_sampled) 
-
-        elif 'from' in record:
-            import_path = os.path.join(os.path.dirname(path), record['from'])
-            for step in steps_from_yaml(import_path):
-                if step.name != record['step']:
-                    steps.append(step)
-                else:
-                    break
-
-        else:
-            raise SyntaxError("Every step must specify 'unique', 'picked', 'sorted', or 'from'.")
+            num_sampled, num_picked = parse_sort(record['sorted'])
+            step = SortStep(previous_step, float(num_picked), float(num_sampled))
 
         step.name = name
         steps.append(step)